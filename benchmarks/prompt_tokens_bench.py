@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Бенчмарк: токены промпта на ход vs номер хода — сырая история против скользящего резюме
+
+Запуск: python benchmarks/prompt_tokens_bench.py [turns]
+Сеть не нужна — промпты Interviewer и HiringManager собираются на синтетическом
+диалоге с ответами разной длины; токены оцениваются как в лимитере (estimate_tokens).
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from langchain_core.messages import SystemMessage
+
+from src.config import settings
+from src.prompts.templates import INTERVIEWER_PROMPT, HIRING_MANAGER_PROMPT
+from src.tools.conversation_summary import update_summary, render_context
+from src.utils.rate_limiter import estimate_tokens
+
+SENTENCES = [
+    "В PostgreSQL индексы B-tree подходят для диапазонных запросов и сортировки.",
+    "Для поиска по равенству иногда выгоднее hash-индекс, но он не поддерживает диапазоны.",
+    "Транзакции изолируются по уровням: read committed, repeatable read и serializable.",
+    "В Django я использовал select_related и prefetch_related, чтобы убрать N+1 запросы.",
+    "GIL в CPython мешает параллельному выполнению байткода в потоках, поэтому для CPU-задач берут процессы.",
+    "asyncio хорошо подходит для I/O-bound нагрузки: много сетевых запросов в одном потоке.",
+    "Кэш мы держали в Redis с TTL и инвалидацией по событию изменения записи.",
+    "Честно говоря, тут я не до конца уверен, но попробую рассуждать.",
+    "На прошлом проекте это было узким местом, и мы переписали запрос с оконными функциями.",
+    "Для очередей использовали Celery с RabbitMQ, задачи были идемпотентными.",
+]
+QUESTIONS = [
+    "Расскажи, как устроены индексы в PostgreSQL и когда они не помогают?",
+    "Чем отличаются уровни изоляции транзакций?",
+    "Как бы ты искал и устранял N+1 запросы в Django?",
+    "Что такое GIL и как он влияет на многопоточность?",
+    "Когда стоит использовать asyncio, а когда процессы?",
+    "Как организовать инвалидацию кэша?",
+]
+
+
+def _tokens(prompt):
+    return estimate_tokens([SystemMessage(content=prompt)]) - settings.llm_expected_output_tokens
+
+
+def legacy_interviewer_history(history):
+    lines = []
+    for entry in history[-10:]:
+        role = "Интервьюер" if entry.get("role") == "interviewer" else "Кандидат"
+        lines.append(f"{role}: {entry.get('content', '')}")
+    return "\n".join(lines)
+
+
+def legacy_hiring_summary(history):
+    lines = []
+    for i, entry in enumerate(history[-20:], 1):
+        role = "И" if entry.get("role") == "interviewer" else "К"
+        lines.append(f"{i}. [{role}]: {entry.get('content', '')[:80]}...")
+    return "\n".join(lines)
+
+
+def interviewer_prompt(history_str):
+    return INTERVIEWER_PROMPT.format(
+        candidate_name="Алекс", position="Backend Developer", target_grade="Middle",
+        experience="3 года, Python, Django, PostgreSQL", current_topic="Базы данных",
+        difficulty="medium", action="ask_question", hint_section="", conversation_history=history_str
+    )
+
+
+def hiring_prompt(summary_str):
+    return HIRING_MANAGER_PROMPT.format(
+        candidate_name="Алекс", position="Backend Developer", target_grade="Middle",
+        experience="3 года, Python, Django, PostgreSQL", final_evaluation="{}",
+        conversation_summary=summary_str, false_facts="Нет"
+    )
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    rng = random.Random(7)
+    history, summary = [], None
+
+    print(f"{'turn':>4}{'answer chars':>14}{'interviewer raw':>17}{'rolling':>9}"
+          f"{'hiring raw':>12}{'rolling':>9}{'summary lines':>15}")
+    for turn in range(1, turns + 1):
+        history.append({"role": "interviewer", "content": rng.choice(QUESTIONS)})
+        # Ответы становятся длиннее к середине интервью
+        answer = " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 3 + turn // 4)))
+        history.append({"role": "candidate", "content": answer})
+        summary = update_summary(summary, history)
+
+        raw = _tokens(interviewer_prompt(legacy_interviewer_history(history)))
+        rolling = _tokens(interviewer_prompt(render_context(summary, history)))
+        hm_raw = _tokens(hiring_prompt(legacy_hiring_summary(history)))
+        hm_rolling = _tokens(hiring_prompt(render_context(summary, history)))
+        if turn <= 5 or turn % 5 == 0:
+            print(f"{turn:>4}{len(answer):>14}{raw:>17}{rolling:>9}{hm_raw:>12}{hm_rolling:>9}"
+                  f"{len(summary.lines):>15}")
+
+
+if __name__ == "__main__":
+    main()
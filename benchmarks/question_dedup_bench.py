@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Калибровка порога дедупликации вопросов на размеченных парах
+
+Запуск: python benchmarks/question_dedup_bench.py
+Сеть не нужна. Печатает похожесть каждой пары и число ошибок для разных порогов;
+код возврата 1, если текущий settings.question_dedup_threshold ошибается хоть на одной паре.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from src.config import settings
+from src.tools.question_index import QuestionIndex
+
+# (новый вопрос, уже заданный вопрос, повтор ли это)
+PAIRS = [
+    # повторы (перефразировки)
+    ("В чём разница между процессами и потоками?", "Чем отличаются процессы от потоков?", True),
+    ("В чём разница между процессами и потоками?", "Чем процесс отличается от потока?", True),
+    ("Какие типы индексов есть в PostgreSQL?", "Какие индексы бывают в PostgreSQL?", True),
+    ("Какие виды индексов ты знаешь в PostgreSQL?", "Какие типы индексов есть в PostgreSQL?", True),
+    ("Как работает GIL в Python?", "Расскажи, как устроен GIL в Python?", True),
+    ("Что такое GIL и зачем он нужен?", "Объясни, что такое GIL и для чего он нужен?", True),
+    ("Как устроен сборщик мусора в Python?", "Расскажи, как работает сборка мусора в Python?", True),
+    ("Какие уровни изоляции транзакций ты знаешь?", "Расскажи про уровни изоляции транзакций.", True),
+    ("Чем отличается list от tuple в Python?", "В чём разница между list и tuple?", True),
+    ("Как решить проблему N+1 запросов в Django ORM?", "Как бороться с N+1 запросами в Django?", True),
+    ("Что такое декораторы в Python и как они работают?", "Расскажи, как работают декораторы в Python?", True),
+    ("Как работает event loop в asyncio?", "Объясни устройство event loop в asyncio.", True),
+    ("Что такое индекс в базе данных?", "Расскажи, что такое индексы в базах данных?", True),
+    ("Чем отличаются REST и GraphQL?", "В чём разница между GraphQL и REST?", True),
+    # разные вопросы
+    ("Какие типы индексов есть в PostgreSQL?", "Какие типы данных есть в PostgreSQL?", False),
+    ("Какие типы индексов есть в PostgreSQL?", "Как работают индексы в PostgreSQL?", False),
+    ("Какие типы индексов есть в PostgreSQL?", "Какие уровни изоляции транзакций есть в PostgreSQL?", False),
+    ("Какие типы индексов есть в PostgreSQL?", "Какие типы JOIN есть в SQL?", False),
+    ("Как работает GIL в Python?", "Как работает сборщик мусора в Python?", False),
+    ("Чем отличаются процессы от потоков?", "Чем отличаются потоки от корутин?", False),
+    ("Что такое декораторы в Python?", "Что такое генераторы в Python?", False),
+    ("Как работает event loop в asyncio?", "Как отменить задачу в asyncio?", False),
+    ("Чем отличается list от tuple в Python?", "Чем отличается list от set в Python?", False),
+    ("Как решить проблему N+1 запросов в Django ORM?", "Как работают миграции в Django?", False),
+    ("Какие уровни изоляции транзакций ты знаешь?", "Что такое deadlock и как его избежать?", False),
+    ("Что такое индекс в базе данных?", "Когда индекс в базе данных не помогает?", False),
+    ("Как устроен dict в Python?", "Как устроен list в Python?", False),
+    ("Расскажи про принципы SOLID.", "Расскажи про паттерн Singleton.", False),
+]
+
+
+def scores():
+    result = []
+    for question, asked, duplicate in PAIRS:
+        index = QuestionIndex()
+        index.add(asked)
+        result.append((index.most_similar(question)[0], duplicate, question, asked))
+    return result
+
+
+def errors(scored, threshold):
+    return sum((score >= threshold) != duplicate for score, duplicate, _, _ in scored)
+
+
+def main():
+    scored = scores()
+    for score, duplicate, question, asked in sorted(scored):
+        print(f"{score:.2f} {'DUP' if duplicate else '   '} {question} | {asked}")
+
+    print()
+    print("Порог  Ошибок")
+    for threshold in [x / 100 for x in range(40, 95, 5)]:
+        print(f"{threshold:5.2f}  {errors(scored, threshold):6d}")
+
+    current = errors(scored, settings.question_dedup_threshold)
+    print(f"\nТекущий порог {settings.question_dedup_threshold}: ошибок {current} из {len(scored)}")
+    return 1 if current else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
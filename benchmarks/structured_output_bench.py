@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Микро-бенчмарк: сборка structured-output runnable на каждый вызов vs кэш
+
+Запуск: python benchmarks/structured_output_bench.py [iterations]
+Сеть не нужна — измеряется только CPU-работа по сборке runnable.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from src.models.output_schemas import (
+    InterviewPlanOutput, AnswerAnalysisOutput, FactCheckOutput,
+    EvaluationOutput, QuestionHandlerOutput, FinalFeedbackOutput
+)
+from src.utils.llm_pool import get_llm, get_structured_llm
+
+SCHEMAS = [
+    InterviewPlanOutput, AnswerAnalysisOutput, FactCheckOutput,
+    EvaluationOutput, QuestionHandlerOutput, FinalFeedbackOutput,
+]
+
+
+def _per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    llm = get_llm()
+
+    print(f"{'schema':<24}{'uncached, us':>14}{'cached, us':>12}{'speedup':>10}")
+    for schema in SCHEMAS:
+        get_structured_llm(schema)  # первый вызов заполняет кэш
+        before = _per_call_us(lambda: llm.with_structured_output(schema), iterations)
+        after = _per_call_us(lambda: get_structured_llm(schema), iterations)
+        print(f"{schema.__name__:<24}{before:>14.1f}{after:>12.2f}{before / after:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
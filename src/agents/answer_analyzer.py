@@ -2,9 +2,11 @@
 """Анализатор ответов кандидата"""
 
 from src.agents.base import BaseAgent
+from src.config import settings
 from src.prompts.templates import ANSWER_ANALYZER_PROMPT
 from src.models.schemas import AnswerAnalysis
 from src.models.output_schemas import AnswerAnalysisOutput
+from src.tools.answer_classifier import get_answer_classifier, label_from_analysis, ANSWER_LABELS
 
 
 
@@ -39,6 +41,17 @@ class AnswerAnalyzerAgent(BaseAgent):
                     current_topic = t.name
                     break
         
+        # Очевидные случаи решает локальный классификатор, остальное — LLM
+        decision, shadow = None, False
+        if settings.answer_classifier_enabled:
+            classifier = get_answer_classifier()
+            decision = classifier.classify(user_msg, context=f"{last_question} {current_topic}",
+                                           labels=ANSWER_LABELS)
+            shadow = decision.local and classifier.should_shadow()
+            if decision.local and not shadow:
+                classifier.record(decision)
+                return self._result(classifier.build_analysis(decision, user_msg), decision)
+        
         prompt = ANSWER_ANALYZER_PROMPT.format(
             position=profile.position if profile else "Developer",
             target_grade=profile.target_grade if profile else "Junior",
@@ -60,10 +73,17 @@ class AnswerAnalyzerAgent(BaseAgent):
                 candidate_question=res.candidate_question,
                 reasoning=res.reasoning
             )
+            if decision:
+                classifier.record(decision, llm_label=label_from_analysis(analysis), shadow=shadow)
         except Exception as e:
             print(f"Error in {self.name}: {e}")
             analysis = self._fallback(user_msg)
+            if decision:
+                classifier.record(decision, shadow=shadow)
         
+        return self._result(analysis, decision)
+    
+    def _result(self, analysis, decision=None):
         thoughts = {
             "answer_analyzer": {
                 "quality": analysis.quality,
@@ -71,13 +91,17 @@ class AnswerAnalyzerAgent(BaseAgent):
                 "off_topic": analysis.off_topic,
                 "needs_fact_check": analysis.needs_fact_check,
                 "suspicious_claims": analysis.suspicious_claims,
-                "reasoning": analysis.reasoning
+                "reasoning": analysis.reasoning,
+                "fast_path": {
+                    "label": decision.label,
+                    "confidence": decision.confidence,
+                } if decision else None
             }
         }
         
         return {"answer_analysis": analysis, "internal_thoughts": thoughts}
     
-
+    
     def _fallback(self, msg):
         """Fallback анализ по эвристикам"""
         has_question = "?" in msg
@@ -1,16 +1,23 @@
 # -*- coding: utf-8 -*-
 """Базовый класс для агентов"""
 
+import asyncio
 import json
 import re
 from abc import ABC, abstractmethod
 from typing import TypeVar
 
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.constants import TAG_NOSTREAM
 from pydantic import BaseModel
 
 from src.config import settings
+from src.utils.llm_pool import get_llm, get_structured_llm
+from src.utils.response_cache import get_response_cache, make_cache_key
+from src.utils.rate_limiter import (
+    get_rate_limiter, estimate_tokens, is_rate_limit_error,
+    is_transient_error, retry_after_seconds
+)
 
 T = TypeVar('T', bound=BaseModel)
 
@@ -19,22 +26,21 @@ T = TypeVar('T', bound=BaseModel)
 class BaseAgent(ABC):
     """Базовый класс агентов"""
     
+    # Агенты с часто повторяющимися промптами включают кэш ответов
+    use_response_cache = False
+    
     def __init__(self, model=None, temperature=None):
         self.model_name = model or settings.openai_model
         self.temperature = temperature or settings.temperature
-        
-        llm_kwargs = {
-            "model": self.model_name,
-            "temperature": self.temperature,
-            "api_key": settings.openai_api_key,
-            "max_tokens": settings.max_tokens,
-        }
-        
-        # Прокси если настроен
-        if settings.openai_base_url:
-            llm_kwargs["base_url"] = settings.openai_base_url
-        
-        self.llm = ChatOpenAI(**llm_kwargs)
+    
+    @property
+    def llm(self):
+        # Клиент общий для всех агентов — один пул соединений на процесс
+        return get_llm(self.model_name, self.temperature)
+    
+    def _structured_llm(self, schema):
+        """Закэшированный runnable со structured output для схемы"""
+        return get_structured_llm(schema, self.model_name, self.temperature)
     
     @property
     @abstractmethod
@@ -45,22 +51,99 @@ class BaseAgent(ABC):
     async def run(self, state):
         pass
     
-    async def _call_llm(self, system_prompt, user_prompt=""):
-        """Простой вызов LLM"""
+    async def _invoke(self, runnable, msgs):
+        """Вызов через общий лимитер с повторами при 429 и временных ошибках"""
+        limiter = get_rate_limiter()
+        tokens = estimate_tokens(msgs)
+        
+        for attempt in range(settings.llm_max_retries + 1):
+            try:
+                async with limiter.slot(tokens):
+                    result = await runnable.ainvoke(msgs)
+                limiter.on_success()
+                return result
+            except Exception as e:
+                if attempt >= settings.llm_max_retries:
+                    raise
+                if is_rate_limit_error(e):
+                    limiter.on_rate_limited(retry_after_seconds(e))
+                    print(f"{self.name}: rate limited, retry {attempt + 1}")
+                elif is_transient_error(e):
+                    await asyncio.sleep(min(2 ** attempt * 0.5, 8.0))
+                else:
+                    raise
+    
+    def _cache_enabled(self, cache):
+        if not settings.llm_cache_enabled:
+            return False
+        return self.use_response_cache if cache is None else cache
+    
+    async def _call_llm(self, system_prompt, user_prompt="", cache=None, stream=True):
+        """Простой вызов LLM; stream=False скрывает токены из потоковой выдачи графа"""
         msgs = [SystemMessage(content=system_prompt)]
         if user_prompt:
             msgs.append(HumanMessage(content=user_prompt))
-        resp = await self.llm.ainvoke(msgs)
+        
+        key = None
+        if self._cache_enabled(cache):
+            key = make_cache_key(self.model_name, self.temperature, None, msgs)
+            cached = await get_response_cache().aget(key)
+            if cached is not None:
+                return cached
+        
+        llm = self.llm if stream else self.llm.with_config(tags=[TAG_NOSTREAM])
+        resp = await self._invoke(llm, msgs)
+        if key:
+            await get_response_cache().aset(key, resp.content)
         return resp.content
     
 
-    async def _call_structured(self, schema, system_prompt, user_prompt=""):
+    async def _stream_llm(self, system_prompt, stop=None):
+        """Потоковый вызов LLM: токены сразу видны в stream_mode="messages" графа.
+        stop(текст) -> True обрывает генерацию. Возвращает (текст, оборвана ли)"""
+        msgs = [SystemMessage(content=system_prompt)]
+        limiter = get_rate_limiter()
+        text = ""
+        try:
+            async with limiter.slot(estimate_tokens(msgs)):
+                stream = self.llm.astream(msgs)
+                try:
+                    async for chunk in stream:
+                        text += chunk.content if isinstance(chunk.content, str) else ""
+                        if stop and stop(text):
+                            return text, True
+                finally:
+                    await stream.aclose()
+            return text, False
+        except Exception as e:
+            if text:
+                raise
+            # Ошибка до первого токена — обычный вызов с повторами при 429 и временных ошибках
+            if is_rate_limit_error(e):
+                limiter.on_rate_limited(retry_after_seconds(e))
+            return await self._call_llm(system_prompt), False
+        finally:
+            if text:
+                limiter.on_success()
+    
+    async def _call_structured(self, schema, system_prompt, user_prompt="", cache=None):
         """Вызов LLM со структурированным выводом"""
-        structured_llm = self.llm.with_structured_output(schema)
+        structured_llm = self._structured_llm(schema)
         msgs = [SystemMessage(content=system_prompt)]
         if user_prompt:
             msgs.append(HumanMessage(content=user_prompt))
-        return await structured_llm.ainvoke(msgs)
+        
+        key = None
+        if self._cache_enabled(cache):
+            key = make_cache_key(self.model_name, self.temperature, schema, msgs)
+            cached = await get_response_cache().aget(key)
+            if cached is not None:
+                return schema.model_validate(cached)
+        
+        result = await self._invoke(structured_llm, msgs)
+        if key and result is not None:
+            await get_response_cache().aset(key, result.model_dump(mode="json"))
+        return result
     
     def _parse_json(self, response):
         """Парсинг JSON из ответа"""
@@ -3,11 +3,37 @@
 
 import json
 from src.agents.base import BaseAgent
+from src.config import settings
 from src.prompts.templates import EVALUATOR_PROMPT
 from src.models.schemas import EvaluationState, SkillConfirmed, SkillGap, SoftSkills
 from src.models.output_schemas import EvaluationOutput
+from src.tools.conversation_summary import render_context
 
 
+def encode_evaluation(evaluation):
+    """Компактное состояние фиксированного размера: top-N навыков и пробелов без списков evidence"""
+    skills = sorted(evaluation.skills_confirmed, key=lambda s: (s.confidence, len(s.evidence)), reverse=True)
+    severity = {"high": 0, "medium": 1, "low": 2}
+    gaps = sorted(evaluation.skills_gaps, key=lambda g: severity.get(g.severity, 3))
+    max_skills, max_gaps = settings.evaluator_max_skills, settings.evaluator_max_gaps
+    
+    skills_str = "; ".join(f"{s.skill} {s.confidence:.1f} x{len(s.evidence)}" for s in skills[:max_skills])
+    if len(skills) > max_skills:
+        skills_str += f"; ...ещё {len(skills) - max_skills}"
+    gaps_str = "; ".join(f"{g.skill} [{g.severity}]" for g in gaps[:max_gaps])
+    if len(gaps) > max_gaps:
+        gaps_str += f"; ...ещё {len(gaps) - max_gaps}"
+    soft = evaluation.soft_skills
+    
+    return "\n".join([
+        f"Грейд: {evaluation.current_grade_estimate} (уверенность {evaluation.grade_confidence:.2f}, "
+        f"оценённых ходов: {len(evaluation.confidence_history)})",
+        f"Подтверждено: {skills_str or 'нет'}",
+        f"Пробелы: {gaps_str or 'нет'}",
+        f"Soft skills: clarity {soft.clarity:.1f}, honesty {soft.honesty:.1f}, engagement {soft.engagement:.1f}",
+        f"Галлюцинации: {evaluation.hallucinations_detected}, off-topic: {evaluation.off_topic_attempts}",
+    ])
+
 
 class EvaluatorAgent(BaseAgent):
     """Накапливает оценку кандидата"""
@@ -44,7 +70,6 @@ class EvaluatorAgent(BaseAgent):
                     topic = t.name
                     break
         
-        eval_dict = current_eval.model_dump()
         fc_str = json.dumps(fact_check.model_dump(), ensure_ascii=False) if fact_check else "Нет"
         
         prompt = EVALUATOR_PROMPT.format(
@@ -55,13 +80,14 @@ class EvaluatorAgent(BaseAgent):
             user_message=user_msg,
             answer_analysis=json.dumps(analysis.model_dump(), ensure_ascii=False),
             fact_check=fc_str,
-            current_evaluation=json.dumps(eval_dict, ensure_ascii=False),
+            current_evaluation=encode_evaluation(current_eval),
+            conversation_context=render_context(state.get("conversation_summary"), history) or "Нет",
             turn_id=turn_id
         )
         
         try:
             result = await self._call_structured(EvaluationOutput, prompt)
-            new_eval = self._merge(result, current_eval, turn_id)
+            new_eval = self._merge(result, current_eval, turn_id, analysis, fact_check)
             # Добавляем уверенность в историю
             new_eval.confidence_history = current_eval.confidence_history + [result.grade_confidence]
             reasoning = result.reasoning
@@ -81,47 +107,57 @@ class EvaluatorAgent(BaseAgent):
         return {"evaluation": new_eval, "internal_thoughts": thoughts}
     
 
-    def _merge(self, output, current, turn_id):
-        """Слияние оценок"""
+    def _merge(self, output, current, turn_id, analysis=None, fact_check=None):
+        """Применение изменений по ходу к накопленной оценке"""
+        def key(name):
+            return " ".join(name.casefold().split())
+        
         # Навыки
-        confirmed = {s.skill: s for s in current.skills_confirmed}
+        confirmed = {key(s.skill): s for s in current.skills_confirmed}
         for item in output.skills_confirmed:
-            if item.skill in confirmed:
-                old = confirmed[item.skill]
-                confirmed[item.skill] = SkillConfirmed(
-                    skill=item.skill,
+            old = confirmed.get(key(item.skill))
+            if old:
+                confirmed[key(item.skill)] = SkillConfirmed(
+                    skill=old.skill,
                     confidence=max(old.confidence, item.confidence),
                     evidence=old.evidence + [f"turn {turn_id}"]
                 )
             else:
-                confirmed[item.skill] = SkillConfirmed(
+                confirmed[key(item.skill)] = SkillConfirmed(
                     skill=item.skill, confidence=item.confidence,
                     evidence=[f"turn {turn_id}"]
                 )
         
-        # Пробелы
-        gaps = {g.skill: g for g in current.skills_gaps}
+        # Пробелы: новые добавляются, закрытые ответом — снимаются
+        gaps = {key(g.skill): g for g in current.skills_gaps}
         for item in output.skills_gaps:
-            if item.skill not in gaps:
-                gaps[item.skill] = SkillGap(skill=item.skill, severity=item.severity,
-                                           failed_at=f"turn {turn_id}")
+            if key(item.skill) not in gaps:
+                gaps[key(item.skill)] = SkillGap(skill=item.skill, severity=item.severity,
+                                                failed_at=f"turn {turn_id}")
+        for name in output.resolved_gaps:
+            gaps.pop(key(name), None)
+        
+        # Soft skills ответа усредняются по оценённым ходам
+        n = len(current.confidence_history)
+        def avg(old, new):
+            return round((old * n + new) / (n + 1), 3)
         
+        hallucinations, off_topic = self._counters(current, analysis, fact_check)
         return EvaluationState(
             skills_confirmed=list(confirmed.values()),
             skills_gaps=list(gaps.values()),
             soft_skills=SoftSkills(
-                clarity=output.soft_skills.clarity,
-                honesty=output.soft_skills.honesty,
-                engagement=output.soft_skills.engagement
+                clarity=avg(current.soft_skills.clarity, output.soft_skills.clarity),
+                honesty=avg(current.soft_skills.honesty, output.soft_skills.honesty),
+                engagement=avg(current.soft_skills.engagement, output.soft_skills.engagement)
             ),
-            hallucinations_detected=output.hallucinations_detected,
-            off_topic_attempts=output.off_topic_attempts,
+            hallucinations_detected=hallucinations,
+            off_topic_attempts=off_topic,
             current_grade_estimate=output.current_grade_estimate,
             grade_confidence=output.grade_confidence
         )
     
-    def _basic_update(self, current, analysis, fact_check):
-        """Базовое обновление при ошибке"""
+    def _counters(self, current, analysis, fact_check):
         hallucinations = current.hallucinations_detected
         if fact_check and fact_check.verified_false:
             hallucinations += len(fact_check.verified_false)
@@ -129,6 +165,11 @@ class EvaluatorAgent(BaseAgent):
         off_topic = current.off_topic_attempts
         if analysis and analysis.off_topic:
             off_topic += 1
+        return hallucinations, off_topic
+    
+    def _basic_update(self, current, analysis, fact_check):
+        """Базовое обновление при ошибке"""
+        hallucinations, off_topic = self._counters(current, analysis, fact_check)
         
         new_eval = EvaluationState(
             skills_confirmed=current.skills_confirmed,
@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
 """Fact Checker Agent - проверяет факты через веб-поиск"""
 
+import asyncio
+
 from .base import BaseAgent
+from src.config import settings
+from src.models.schemas import FactCheckResult, VerifiedFact, FalseFact, UnverifiedFact
 from src.models.output_schemas import FactCheckOutput
 from src.tools.web_search import create_web_search_tool
-from src.prompts.templates import FACT_CHECKER_PROMPT
+from src.tools.fact_store import get_fact_store, claim_similarity
+from src.tools.fact_rules import get_fact_rules
+from src.prompts.templates import FACT_CHECKER_PROMPT, FACT_CHECKER_NO_SEARCH_PROMPT
 
 
 class FactCheckerAgent(BaseAgent):
@@ -23,41 +29,41 @@ class FactCheckerAgent(BaseAgent):
         if not analysis or not analysis.suspicious_claims:
             return {"fact_check_result": None}
         
-        claims = analysis.suspicious_claims
-        results = []
+        claims = analysis.suspicious_claims[:settings.fact_check_max_claims]
         
-        for claim in claims[:3]:  # Максимум 3 проверки
-            try:
-                search_result = await self.web_search.verify_fact(claim)
-                
-                # Анализируем результаты поиска через LLM
-                verdict = await self._analyze_claim(claim, search_result)
-                results.append(verdict)
-            except Exception as e:
-                print(f"Fact check error for '{claim}': {e}")
-                results.append({
-                    "claim": claim,
-                    "status": "unverified",
-                    "confidence": 0.0,
-                    "correct_info": None,
-                    "source": None,
-                    "reason": str(e)
-                })
+        # Очевидные случаи решают локальные правила, уже проверенные — кэш вердиктов
+        fact_check_result, pending = self._from_rules(claims)
+        from_rules = len(claims) - len(pending)
+        from_store_result, pending = self._from_store(pending)
+        from_store = len(claims) - from_rules - len(pending)
+        fact_check_result.verified_true.extend(from_store_result.verified_true)
+        fact_check_result.verified_false.extend(from_store_result.verified_false)
         
-        # Формируем результат
-        fact_check_result = {
-            "verified_true": [r for r in results if r.get("status") == "verified_true"],
-            "verified_false": [r for r in results if r.get("status") == "verified_false"],
-            "unverified": [r for r in results if r.get("status") == "unverified"]
-        }
+        if pending:
+            if self.web_search.available:
+                # Все поиски одним раундом, затем один LLM-вызов на все утверждения
+                searches = await asyncio.gather(*[self._search(c) for c in pending])
+            else:
+                # Breaker открыт — не ждём таймаутов, сразу проверка без поиска
+                searches = [{"found": False, "results": [], "error": "circuit_open"}] * len(pending)
+            judged = await self._judge(pending, searches)
+            self._remember(judged)
+            fact_check_result.verified_true.extend(judged.verified_true)
+            fact_check_result.verified_false.extend(judged.verified_false)
+            fact_check_result.unverified.extend(judged.unverified)
         
         # Добавляем в internal_thoughts
         thoughts = state.get("internal_thoughts") or {}
         thoughts["fact_checker"] = {
             "claims_checked": len(claims),
-            "verified_true": len(fact_check_result["verified_true"]),
-            "verified_false": len(fact_check_result["verified_false"]),
-            "unverified": len(fact_check_result["unverified"])
+            "from_rules": from_rules,
+            "from_cache": from_store,
+            "search_breaker": self.web_search.breaker.state,
+            "llm_only": sum(f.verification_method == "llm_confident" for f in
+                            fact_check_result.verified_true + fact_check_result.verified_false),
+            "verified_true": len(fact_check_result.verified_true),
+            "verified_false": len(fact_check_result.verified_false),
+            "unverified": len(fact_check_result.unverified)
         }
         
         return {
@@ -65,49 +71,179 @@ class FactCheckerAgent(BaseAgent):
             "internal_thoughts": thoughts
         }
     
-    async def _analyze_claim(self, claim: str, search_result: dict) -> dict:
-        """Анализирует результаты поиска для проверки утверждения"""
+    def _from_rules(self, claims: list):
+        """Решает утверждения по таблице известных фактов, остальные возвращает как pending"""
+        result = FactCheckResult()
+        if not settings.fact_rules_enabled:
+            return result, list(claims)
+        
+        rules = get_fact_rules()
+        pending = []
+        for claim in claims:
+            verdict = rules.check(claim)
+            if not verdict:
+                pending.append(claim)
+            elif verdict["status"] == "verified_true":
+                result.verified_true.append(VerifiedFact(
+                    claim=claim, confidence=verdict["confidence"], source=verdict["source"],
+                    verification_method="local_rules"
+                ))
+            else:
+                result.verified_false.append(FalseFact(
+                    claim=claim, confidence=verdict["confidence"], correct_info=verdict["correct_info"],
+                    source=verdict["source"], verification_method="local_rules"
+                ))
+        return result, pending
+    
+    def _from_store(self, claims: list):
+        """Разделяет утверждения на найденные в кэше вердиктов и требующие проверки"""
+        result = FactCheckResult()
+        if not settings.fact_store_enabled:
+            return result, list(claims)
         
-        if not search_result.get("found") or not search_result.get("results"):
-            return {
-                "claim": claim,
-                "status": "unverified",
-                "confidence": 0.0,
-                "correct_info": None,
-                "source": None,
-                "reason": "no_search_results"
-            }
+        store = get_fact_store()
+        pending = []
+        for claim in claims:
+            verdict = store.get(claim)
+            # Вердикт без поиска перепроверяем, как только поиск снова доступен
+            if not verdict or (verdict.get("recheck") and self.web_search.available):
+                pending.append(claim)
+            elif verdict["status"] == "verified_true":
+                result.verified_true.append(VerifiedFact(
+                    claim=claim, confidence=verdict["confidence"], source=verdict.get("source"),
+                    verification_method=verdict.get("verification_method", "web_search")
+                ))
+            else:
+                result.verified_false.append(FalseFact(
+                    claim=claim, confidence=verdict["confidence"],
+                    correct_info=verdict.get("correct_info") or "", source=verdict.get("source"),
+                    verification_method=verdict.get("verification_method", "web_search")
+                ))
+        return result, pending
+    
+    def _remember(self, result: FactCheckResult):
+        if not settings.fact_store_enabled:
+            return
+        store = get_fact_store()
+        for f in result.verified_true:
+            store.put(f.claim, "verified_true", f.confidence, source=f.source,
+                      verification_method=f.verification_method, **self._store_lifetime(f))
+        for f in result.verified_false:
+            store.put(f.claim, "verified_false", f.confidence, correct_info=f.correct_info,
+                      source=f.source, verification_method=f.verification_method, **self._store_lifetime(f))
+    
+    @staticmethod
+    def _store_lifetime(fact):
+        # Догадка модели без источника не должна жить в кэше как проверенный факт
+        if fact.verification_method == "llm_confident":
+            return {"ttl": settings.fact_store_llm_only_ttl, "recheck": True}
+        return {}
+    
+    async def _search(self, claim: str) -> dict:
+        """Поиск по одному утверждению с таймаутом"""
+        try:
+            return await asyncio.wait_for(
+                self.web_search.verify_fact(claim),
+                timeout=settings.fact_check_search_timeout
+            )
+        except asyncio.TimeoutError:
+            print(f"Fact check search timeout for '{claim}'")
+            return {"found": False, "results": [], "error": "timeout"}
+        except Exception as e:
+            print(f"Fact check search error for '{claim}': {e}")
+            return {"found": False, "results": [], "error": str(e)}
+    
+    async def _judge(self, claims: list, searches: list) -> FactCheckResult:
+        """Структурированные вызовы LLM: один по утверждениям с результатами поиска,
+        второй (без поиска) — по тем, где поиск недоступен
+        """
+        # Диалог в промпт намеренно не идёт: вердикт зависит только от утверждения и источников,
+        # поэтому его можно переиспользовать из fact store для других кандидатов
+        result = FactCheckResult()
         
-        # Формируем контекст из результатов поиска
-        search_context = "\n".join([
-            f"- {r.title}: {r.snippet}" 
-            for r in search_result["results"][:3]
-        ])
+        to_judge, no_search = [], []
+        for claim, search in zip(claims, searches):
+            if search.get("found") and search.get("results"):
+                to_judge.append((claim, search))
+            elif search.get("error"):
+                no_search.append(claim)
+            else:
+                result.unverified.append(UnverifiedFact(claim=claim, reason="no_source_found"))
         
-        prompt = FACT_CHECKER_PROMPT.format(
-            claim=claim,
-            search_results=search_context
-        )
+        calls = []
+        if to_judge:
+            claims_str = "\n".join(f"{i}. {claim}" for i, (claim, _) in enumerate(to_judge, 1))
+            search_context = "\n\n".join(
+                f"[{i}] {claim}:\n" + "\n".join(f"- {r.title}: {r.snippet}" for r in search["results"][:3])
+                for i, (claim, search) in enumerate(to_judge, 1)
+            )
+            prompt = FACT_CHECKER_PROMPT.format(claims=claims_str, search_results=search_context)
+            calls.append(self._verdicts(prompt, [c for c, _ in to_judge]))
+        if no_search:
+            # Поиск недоступен (breaker открыт, таймаут) — оценка только по знаниям модели
+            claims_str = "\n".join(f"{i}. {claim}" for i, claim in enumerate(no_search, 1))
+            prompt = FACT_CHECKER_NO_SEARCH_PROMPT.format(claims=claims_str)
+            calls.append(self._verdicts(prompt, no_search, llm_only=True))
         
+        for part in await asyncio.gather(*calls):
+            result.verified_true.extend(part.verified_true)
+            result.verified_false.extend(part.verified_false)
+            result.unverified.extend(part.unverified)
+        return result
+    
+    async def _verdicts(self, prompt: str, claims: list, llm_only: bool = False) -> FactCheckResult:
+        result = FactCheckResult()
         try:
-            structured_llm = self.llm.with_structured_output(FactCheckOutput)
-            result = await structured_llm.ainvoke(prompt)
-            
-            return {
-                "claim": claim,
-                "status": result.status,
-                "confidence": result.confidence,
-                "correct_info": result.correct_info,
-                "source": result.source,
-                "reason": result.reasoning
-            }
+            output = await self._call_structured(FactCheckOutput, prompt)
         except Exception as e:
             print(f"LLM analysis error: {e}")
-            return {
-                "claim": claim,
-                "status": "unverified",
-                "confidence": 0.0,
-                "correct_info": None,
-                "source": None,
-                "reason": f"llm_error: {e}"
-            }
+            reason = "web_search_unavailable" if llm_only else "llm_uncertain"
+            for claim in claims:
+                result.unverified.append(UnverifiedFact(claim=claim, reason=reason))
+            return result
+        
+        method = {"verification_method": "llm_confident"} if llm_only else {}
+        verdicts = self._match_claims(claims, output)
+        for claim in claims:
+            kind, f = verdicts.get(claim, (None, None))
+            # Вердикт хранится под исходным текстом утверждения, а не под пересказом LLM
+            fields = {**f.model_dump(exclude={"index"}), "claim": claim} if f else {}
+            if kind == "verified_true":
+                result.verified_true.append(VerifiedFact(**{**fields, **method}))
+            elif kind == "verified_false":
+                result.verified_false.append(FalseFact(**{**fields, **method}))
+            elif kind == "unverified":
+                result.unverified.append(UnverifiedFact(**fields))
+            else:
+                # Утверждения, которые LLM пропустил, считаем непроверенными
+                result.unverified.append(UnverifiedFact(claim=claim, reason="llm_uncertain"))
+        
+        return result
+    
+    def _match_claims(self, claims, output):
+        """Вердикты LLM -> исходные утверждения: по номеру в списке, иначе по точному тексту,
+        иначе по Жаккару как в fact store. Одно утверждение — один вердикт (первый)"""
+        facts = [("verified_true", f) for f in output.verified_true] + \
+                [("verified_false", f) for f in output.verified_false] + \
+                [("unverified", f) for f in output.unverified]
+        matched, rest = {}, []
+        for kind, f in facts:
+            claim = claims[f.index - 1] if f.index and 1 <= f.index <= len(claims) else None
+            if claim is not None and claim not in matched:
+                matched[claim] = (kind, f)
+            else:
+                rest.append((kind, f))
+        
+        threshold = get_fact_store().similarity
+        for kind, f in rest:
+            free = [c for c in claims if c not in matched]
+            exact = [c for c in free if self._norm(c) == self._norm(f.claim)]
+            scored = [(claim_similarity(c, f.claim), c) for c in free]
+            score, claim = (1.0, exact[0]) if exact else max(scored, default=(0.0, None))
+            if claim is not None and score >= threshold:
+                matched[claim] = (kind, f)
+        return matched
+    
+    @staticmethod
+    def _norm(text: str) -> str:
+        return " ".join(text.lower().split()).strip(" .!?")
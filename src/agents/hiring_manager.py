@@ -1,14 +1,39 @@
 # -*- coding: utf-8 -*-
 """Hiring Manager - формирует финальный отчёт"""
 
+import asyncio
+import hashlib
 import json
 from src.agents.base import BaseAgent
-from src.prompts.templates import HIRING_MANAGER_PROMPT
+from src.config import settings
+from src.prompts.templates import (
+    HIRING_MANAGER_PROMPT, HIRING_MANAGER_MAP_PROMPT,
+    HIRING_MANAGER_SECTION_PROMPT, HIRING_MANAGER_SECTION_TASKS,
+    REPORT_DRAFT_PROMPT, REPORT_FINALIZE_PROMPT
+)
 from src.models.schemas import (
     FinalFeedback, Decision, TechnicalReview,
-    KnowledgeGap, RoadmapItem, SoftSkills
+    KnowledgeGap, RoadmapItem, SoftSkills, ReportDraft
+)
+from src.models.output_schemas import (
+    FinalFeedbackOutput, TopicFindingsOutput, DecisionOutput,
+    TechnicalReviewOutput, SoftSkillsOutput, RoadmapOutput,
+    ReportDraftOutput, ReportFinalizeOutput
 )
-from src.models.output_schemas import FinalFeedbackOutput
+from src.agents.evaluator import encode_evaluation
+from src.tools.conversation_summary import render_context, compress_entry
+
+
+def evaluation_key(evaluation):
+    """Отпечаток оценки — черновик и предфинальный отчёт валидны только для неё"""
+    if evaluation is None:
+        return ""
+    raw = evaluation.model_dump_json()
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _gap_key(name):
+    return " ".join(name.casefold().split())
 
 
 
@@ -22,32 +47,34 @@ class HiringManagerAgent(BaseAgent):
     async def run(self, state):
         profile = state.get("candidate_profile")
         evaluation = state.get("evaluation")
-        hist = state.get("conversation_history", [])
         
         if not profile:
             return {"last_error": "No candidate profile"}
         
-        # Ложные факты
-        false_facts = []
-        fc = state.get("fact_check_result")
-        if fc and fc.verified_false:
-            for f in fc.verified_false:
-                false_facts.append({"claim": f.claim, "correct_info": f.correct_info})
+        # Черновик собран в фоне по ходу интервью — остаётся только финализировать.
+        # Транскрипт (map-reduce) и секции финализация использует сама
+        draft = state.get("report_draft")
+        if settings.report_draft_enabled and draft is not None and evaluation is not None:
+            feedback = await self.finalize_draft(draft, evaluation, state)
+            return {"final_feedback": feedback, "status": "completed"}
         
         eval_str = json.dumps(evaluation.model_dump(), ensure_ascii=False) if evaluation else "Нет"
-        conv_summary = self._summarize(hist)
-        ff_str = "\n".join([f"- {f['claim']}" for f in false_facts]) or "Нет"
-        
-        prompt = HIRING_MANAGER_PROMPT.format(
+        context = dict(
             candidate_name=profile.name,
             position=profile.position,
             target_grade=profile.target_grade,
             experience=profile.experience,
             final_evaluation=eval_str,
-            conversation_summary=conv_summary,
-            false_facts=ff_str
+            conversation_summary=await self.conversation_context(state),
+            false_facts=self.format_false_facts(state)
         )
         
+        if settings.hiring_report_sections:
+            parts = await self._generate_sections(context, evaluation)
+            feedback = FinalFeedback(**parts, confidence_trend=self._compute_trend(evaluation))
+            return {"final_feedback": feedback, "status": "completed"}
+        
+        prompt = HIRING_MANAGER_PROMPT.format(**context)
         try:
             result = await self._call_structured(FinalFeedbackOutput, prompt)
             feedback = self._convert(result, evaluation)
@@ -58,15 +85,233 @@ class HiringManagerAgent(BaseAgent):
         return {"final_feedback": feedback, "status": "completed"}
     
 
-    def _summarize(self, history):
+    def format_false_facts(self, state):
+        false_facts = []
+        fc = state.get("fact_check_result")
+        if fc and fc.verified_false:
+            for f in fc.verified_false:
+                false_facts.append({"claim": f.claim, "correct_info": f.correct_info})
+        return "\n".join([f"- {f['claim']}" for f in false_facts]) or "Нет"
+    
+    async def conversation_context(self, state):
+        """Интервью для промпта отчёта: длинное — выжимки по темам параллельно (map),
+        короткое — скользящее резюме"""
+        hist = state.get("conversation_history", [])
+        if settings.hiring_map_reduce_min_messages and len(hist) >= settings.hiring_map_reduce_min_messages:
+            return await self._map_topics(state.get("candidate_profile"), hist)
+        return self._summarize(hist, state.get("conversation_summary"))
+    
+    async def update_draft(self, draft, evaluation, state):
+        """Дополняет черновик после оценённого хода: LLM нужна только для новых пробелов"""
+        draft = draft or ReportDraft()
+        profile = state.get("candidate_profile")
+        current = {_gap_key(g.skill): g for g in evaluation.skills_gaps}
+        
+        # Закрытые ответами пробелы уходят из черновика вместе с их пунктами roadmap
+        gaps = [g for g in draft.knowledge_gaps if _gap_key(g.topic) in current]
+        roadmap = {key: items for key, items in draft.roadmap.items() if key in current}
+        known = {_gap_key(g.topic) for g in gaps}
+        new_gaps = [g for key, g in current.items() if key not in known]
+        
+        drafted, new_roadmap = await self._draft_gaps(new_gaps, state)
+        gaps += drafted
+        for key, items in new_roadmap.items():
+            roadmap.setdefault(key, []).extend(items)
+        
+        return ReportDraft(
+            confirmed_skills=[s.skill for s in sorted(evaluation.skills_confirmed,
+                                                      key=lambda s: s.confidence, reverse=True)],
+            knowledge_gaps=gaps,
+            roadmap=roadmap,
+            evaluation_key=evaluation_key(evaluation),
+            updates=draft.updates + 1
+        )
+    
+    async def _draft_gaps(self, new_gaps, state):
+        """Правильные ответы и roadmap для пробелов по последнему ходу:
+        ([KnowledgeGap], {ключ пробела: [RoadmapItem]}), только пробелы из запроса"""
+        profile = state.get("candidate_profile")
+        if not new_gaps or not profile:
+            return [], {}
+        
+        last_question = "Вопрос"
+        for entry in reversed(state.get("conversation_history", [])):
+            if entry.get("role") == "interviewer":
+                last_question = entry.get("content", last_question)
+                break
+        prompt = REPORT_DRAFT_PROMPT.format(
+            position=profile.position,
+            target_grade=profile.target_grade,
+            last_question=last_question,
+            user_message=state.get("current_user_message") or "",
+            new_gaps="\n".join(f"- {g.skill} [{g.severity}]" for g in new_gaps)
+        )
+        try:
+            result = await self._call_structured(ReportDraftOutput, prompt)
+        except Exception as e:
+            # Пробел остаётся без правильного ответа — в черновике его дополнит финализация
+            print(f"Error in {self.name} draft: {e}")
+            return [], {}
+        
+        # Под исходными именами пробелов, по одному ответу на пробел
+        names = {_gap_key(g.skill): g.skill for g in new_gaps}
+        gaps, seen = [], set()
+        for g in result.knowledge_gaps:
+            key = _gap_key(g.topic)
+            if key in names and key not in seen:
+                gaps.append(KnowledgeGap(topic=names[key], correct_answer=g.correct_answer))
+                seen.add(key)
+        return gaps, self._roadmap_by_gap(result, names)
+    
+    async def finalize_draft(self, draft, evaluation, state):
+        """Вердикт + пробелы, которые черновик не успел покрыть. С hiring_report_sections —
+        параллельно секции decision и soft_skills и ответы на пробелы (как в черновике),
+        иначе один небольшой вызов; интервью в промпте — как в полном отчёте (conversation_context)"""
+        key = evaluation_key(evaluation)
+        if draft.final is not None and draft.evaluation_key == key:
+            return draft.final
+        
+        profile = state.get("candidate_profile")
+        false_facts = self.format_false_facts(state)
+        # Черновик мог отстать от оценки: закрытые с тех пор пробелы не попадают в отчёт
+        current = {_gap_key(g.skill) for g in evaluation.skills_gaps}
+        gaps = [g for g in draft.knowledge_gaps if _gap_key(g.topic) in current]
+        roadmap = [r for key, items in draft.roadmap.items() if key in current for r in items]
+        known = {_gap_key(g.topic) for g in gaps}
+        pending = [g for g in evaluation.skills_gaps if _gap_key(g.skill) not in known]
+        draft_str = "\n".join([
+            "Подтверждённые навыки: " + (", ".join(draft.confirmed_skills) or "нет"),
+            "Пробелы: " + ("; ".join(f"{g.topic} — {g.correct_answer}" for g in gaps) or "нет"),
+            "Roadmap: " + (", ".join(r.topic for r in roadmap) or "нет"),
+        ])
+        conv_summary = await self.conversation_context(state)
+        soft_skills = evaluation.soft_skills
+        
+        if settings.hiring_report_sections:
+            context = dict(
+                candidate_name=profile.name,
+                position=profile.position,
+                target_grade=profile.target_grade,
+                experience=profile.experience,
+                final_evaluation=encode_evaluation(evaluation),
+                conversation_summary=f"{conv_summary}\n\nЧЕРНОВИК ОТЧЕТА:\n{draft_str}",
+                false_facts=false_facts
+            )
+            parts, (drafted, new_roadmap) = await asyncio.gather(
+                self._generate_sections(context, evaluation, names=("decision", "soft_skills")),
+                self._draft_gaps(pending, state)
+            )
+            decision, soft_skills = parts["decision"], parts["soft_skills"]
+            answers = {_gap_key(g.topic): g.correct_answer for g in drafted}
+            roadmap += [r for g in pending for r in new_roadmap.get(_gap_key(g.skill), [])]
+        else:
+            prompt = REPORT_FINALIZE_PROMPT.format(
+                position=profile.position,
+                target_grade=profile.target_grade,
+                experience=profile.experience,
+                final_evaluation=encode_evaluation(evaluation),
+                conversation_summary=conv_summary,
+                draft=draft_str,
+                false_facts=false_facts,
+                pending_gaps="\n".join(f"- {g.skill} [{g.severity}]" for g in pending) or "Нет"
+            )
+            try:
+                result = await self._call_structured(ReportFinalizeOutput, prompt)
+                decision = self._convert_decision(result.decision)
+                answers = {_gap_key(g.topic): g.correct_answer for g in result.knowledge_gaps}
+                roadmap += self._convert_roadmap(result)
+            except Exception as e:
+                print(f"Error in {self.name} finalize: {e}")
+                decision = self._fallback_decision(evaluation)
+                answers = {}
+        gaps += [KnowledgeGap(topic=g.skill, correct_answer=answers.get(_gap_key(g.skill), "")) for g in pending]
+        
+        return FinalFeedback(
+            decision=decision,
+            technical_review=TechnicalReview(
+                confirmed_skills=[s.skill for s in sorted(evaluation.skills_confirmed,
+                                                          key=lambda s: s.confidence, reverse=True)],
+                knowledge_gaps=gaps
+            ),
+            soft_skills=soft_skills,
+            roadmap=roadmap,
+            confidence_trend=self._compute_trend(evaluation)
+        )
+    
+    def _roadmap_by_gap(self, output, names):
+        """Пункты roadmap по ключу пробела из запроса: по полю gap, иначе по topic;
+        при единственном пробеле запроса пункт относится к нему"""
+        by_gap = {}
+        for r in output.roadmap:
+            key = next((k for k in (_gap_key(r.gap), _gap_key(r.topic)) if k in names), None)
+            if key is None and len(names) == 1:
+                key = next(iter(names))
+            if key is not None:
+                by_gap.setdefault(key, []).append(RoadmapItem(topic=r.topic, resources=r.resources))
+        return by_gap
+    
+    def _summarize(self, history, summary=None):
         if not history:
             return "Диалог не состоялся"
-        lines = []
-        for i, entry in enumerate(history[-20:], 1):
-            role = "И" if entry.get("role") == "interviewer" else "К"
-            content = entry.get("content", "")[:80]
-            lines.append(f"{i}. [{role}]: {content}...")
-        return "\n".join(lines)
+        return render_context(summary, history)
+    
+    def _chunks(self, history):
+        """Транскрипт по темам (в порядке появления), длинные темы режутся на куски"""
+        by_topic = {}
+        for entry in history:
+            role = "Интервьюер" if entry.get("role") == "interviewer" else "Кандидат"
+            topic = entry.get("topic") or "Знакомство"
+            by_topic.setdefault(topic, []).append(f"{role}: {entry.get('content', '')}")
+        
+        chunks = []
+        limit = settings.hiring_map_chunk_chars
+        for topic, lines in by_topic.items():
+            parts, current, size = [], [], 0
+            for line in lines:
+                if current and size + len(line) > limit:
+                    parts.append(current)
+                    current, size = [], 0
+                current.append(line)
+                size += len(line) + 1
+            if current:
+                parts.append(current)
+            for i, part in enumerate(parts, 1):
+                chunks.append((topic if len(parts) == 1 else f"{topic} (часть {i})", part))
+        return chunks
+    
+    async def _map_chunk(self, profile, topic, lines):
+        prompt = HIRING_MANAGER_MAP_PROMPT.format(
+            position=profile.position,
+            target_grade=profile.target_grade,
+            topic=topic,
+            transcript="\n".join(lines)
+        )
+        try:
+            # Кэш: кусок не меняется между предфинализацией и финалом — map по нему не повторяется
+            findings = await self._call_structured(TopicFindingsOutput, prompt, cache=True)
+        except Exception as e:
+            print(f"Error in {self.name} map ({topic}): {e}")
+            # Без LLM — экстрактивное сжатие реплик куска
+            compressed = [compress_entry({"role": "interviewer" if l.startswith("Интервьюер") else "candidate",
+                                          "content": l.split(": ", 1)[-1]}) for l in lines]
+            return f"## {topic}\n" + "\n".join(compressed)
+        
+        parts = [f"## {topic}"]
+        if findings.summary:
+            parts.append(findings.summary)
+        if findings.confirmed_skills:
+            parts.append("Подтверждено: " + ", ".join(findings.confirmed_skills))
+        for gap in findings.knowledge_gaps:
+            parts.append(f"Пробел: {gap.topic} — правильно: {gap.correct_answer}")
+        if findings.soft_skills_notes:
+            parts.append(f"Soft skills: {findings.soft_skills_notes}")
+        return "\n".join(parts)
+    
+    async def _map_topics(self, profile, history):
+        # Map-вызовы идут через общий лимитер BaseAgent — параллельность ограничена глобально
+        chunks = self._chunks(history)
+        results = await asyncio.gather(*[self._map_chunk(profile, topic, lines) for topic, lines in chunks])
+        return "\n\n".join(results)
     
     def _compute_trend(self, evaluation):
         """Вычисляет тренд уверенности"""
@@ -91,44 +336,100 @@ class HiringManagerAgent(BaseAgent):
             return f"→ стабильно (~{sum(hist)/len(hist):.0%})"
     
 
+    async def _generate_sections(self, context, evaluation, names=None):
+        """Секции отчёта независимы — генерируются параллельно, каждая со своим fallback.
+        names — только эти секции; результат {секция: значение}"""
+        sections = {
+            "decision": (DecisionOutput, self._convert_decision, self._fallback_decision),
+            "technical_review": (TechnicalReviewOutput, self._convert_technical_review,
+                                 self._fallback_technical_review),
+            "soft_skills": (SoftSkillsOutput, self._convert_soft_skills, self._fallback_soft_skills),
+            "roadmap": (RoadmapOutput, self._convert_roadmap, self._fallback_roadmap),
+        }
+        if names:
+            sections = {name: sections[name] for name in names}
+        
+        async def generate(name, schema):
+            prompt = HIRING_MANAGER_SECTION_PROMPT.format(
+                **context, section_task=HIRING_MANAGER_SECTION_TASKS[name]
+            )
+            return await self._call_structured(schema, prompt)
+        
+        results = await asyncio.gather(
+            *[generate(name, schema) for name, (schema, _, _) in sections.items()],
+            return_exceptions=True
+        )
+        
+        parts = {}
+        for (name, (_, convert, fallback)), result in zip(sections.items(), results):
+            if isinstance(result, Exception) or result is None:
+                print(f"Error in {self.name} ({name}): {result}")
+                parts[name] = fallback(evaluation)
+            else:
+                parts[name] = convert(result)
+        
+        return parts
+    
+    def _convert_decision(self, output):
+        return Decision(
+            grade=output.grade,
+            recommendation=output.recommendation,
+            confidence=output.confidence
+        )
+    
+    def _convert_technical_review(self, output):
+        return TechnicalReview(
+            confirmed_skills=output.confirmed_skills,
+            knowledge_gaps=[KnowledgeGap(topic=g.topic, correct_answer=g.correct_answer)
+                           for g in output.knowledge_gaps]
+        )
+    
+    def _convert_soft_skills(self, output):
+        return SoftSkills(
+            clarity=output.clarity,
+            honesty=output.honesty,
+            engagement=output.engagement
+        )
+    
+    def _convert_roadmap(self, output):
+        return [RoadmapItem(topic=r.topic, resources=r.resources) for r in output.roadmap]
+    
     def _convert(self, output, evaluation=None):
         return FinalFeedback(
-            decision=Decision(
-                grade=output.decision.grade,
-                recommendation=output.decision.recommendation,
-                confidence=output.decision.confidence
-            ),
-            technical_review=TechnicalReview(
-                confirmed_skills=output.technical_review.confirmed_skills,
-                knowledge_gaps=[KnowledgeGap(topic=g.topic, correct_answer=g.correct_answer)
-                               for g in output.technical_review.knowledge_gaps]
-            ),
-            soft_skills=SoftSkills(
-                clarity=output.soft_skills.clarity,
-                honesty=output.soft_skills.honesty,
-                engagement=output.soft_skills.engagement
-            ),
-            roadmap=[RoadmapItem(topic=r.topic, resources=r.resources)
-                    for r in output.roadmap],
+            decision=self._convert_decision(output.decision),
+            technical_review=self._convert_technical_review(output.technical_review),
+            soft_skills=self._convert_soft_skills(output.soft_skills),
+            roadmap=self._convert_roadmap(output),
             confidence_trend=self._compute_trend(evaluation)
         )
     
-    def _fallback(self, profile, evaluation):
+    def _fallback_decision(self, evaluation):
         grade = evaluation.current_grade_estimate if evaluation else "Junior"
         recommendation = "Hire"
         
         if evaluation:
             if evaluation.hallucinations_detected > 2 or len(evaluation.skills_gaps) > 3:
                 recommendation = "No Hire"
-        
+        return Decision(grade=grade, recommendation=recommendation, confidence=0.5)
+    
+    def _fallback_technical_review(self, evaluation):
+        return TechnicalReview(
+            confirmed_skills=[s.skill for s in evaluation.skills_confirmed] if evaluation else [],
+            knowledge_gaps=[KnowledgeGap(topic=g.skill, correct_answer="")
+                           for g in evaluation.skills_gaps] if evaluation else []
+        )
+    
+    def _fallback_soft_skills(self, evaluation):
+        return evaluation.soft_skills if evaluation else SoftSkills()
+    
+    def _fallback_roadmap(self, evaluation):
+        return []
+    
+    def _fallback(self, profile, evaluation):
         return FinalFeedback(
-            decision=Decision(grade=grade, recommendation=recommendation, confidence=0.5),
-            technical_review=TechnicalReview(
-                confirmed_skills=[s.skill for s in evaluation.skills_confirmed] if evaluation else [],
-                knowledge_gaps=[KnowledgeGap(topic=g.skill, correct_answer="")
-                               for g in evaluation.skills_gaps] if evaluation else []
-            ),
-            soft_skills=evaluation.soft_skills if evaluation else SoftSkills(),
-            roadmap=[],
+            decision=self._fallback_decision(evaluation),
+            technical_review=self._fallback_technical_review(evaluation),
+            soft_skills=self._fallback_soft_skills(evaluation),
+            roadmap=self._fallback_roadmap(evaluation),
             confidence_trend=self._compute_trend(evaluation)
         )
@@ -1,8 +1,18 @@
 # -*- coding: utf-8 -*-
 """Интервьюер - ведёт диалог с кандидатом"""
 
+from functools import partial
+
+from langgraph.config import get_stream_writer
+
 from src.agents.base import BaseAgent
-from src.prompts.templates import INTERVIEWER_PROMPT, INTERVIEWER_GREETING_PROMPT
+from src.config import settings
+from src.prompts.templates import (
+    INTERVIEWER_PROMPT, INTERVIEWER_GREETING_PROMPT, INTERVIEWER_GREETING_PROFILE_PROMPT
+)
+from src.tools.question_index import get_question_indexes, extract_question, last_sentence
+from src.tools.question_bank import get_question_bank
+from src.tools.conversation_summary import render_context
 
 
 class InterviewerAgent(BaseAgent):
@@ -12,7 +22,13 @@ class InterviewerAgent(BaseAgent):
     def name(self):
         return "Interviewer"
     
-    async def run(self, state):
+    async def run(self, state, stream=True, speculative=False):
+        """stream=False — без токенов в потоке графа. speculative=True — заготовка, которую
+        кандидат может не увидеть: без стрима, а счётчики дедупликации и банка вопросов не
+        применяются, а возвращаются в deferred_effects — их применяет SpeculativeEngine.take,
+        когда заготовку отдали"""
+        stream = stream and not speculative
+        effects = []
         profile = state.get("candidate_profile")
         plan = state.get("interview_plan")
         router = state.get("router_decision")
@@ -23,7 +39,7 @@ class InterviewerAgent(BaseAgent):
             return {"last_error": "No candidate profile"}
         
         hist = state.get("conversation_history", [])
-        history_str = self._format_history(hist)
+        history_str = self._format_history(hist, state.get("conversation_summary"))
         
         # Контекст из роутера или плана
         topic = "Общие вопросы"
@@ -42,17 +58,22 @@ class InterviewerAgent(BaseAgent):
                     topic = t.name
                     break
         
+        # Новый вопрос по теме — из банка; уточнения, подсказки и ответ на вопрос кандидата
+        # генерируются вживую
+        if settings.question_bank_enabled and action in ("ask_question", "change_topic") and not qh_response:
+            banked = self._from_bank(state, topic, difficulty, effects)
+            if banked:
+                if action == "change_topic":
+                    banked = f"Перейдём к теме «{topic}». {banked}"
+                return self._commit({"current_agent_message": banked, "asked_questions": asked_questions + [banked]},
+                                    effects, speculative)
+        
         hint_section = ""
         if hint:
             hint_section = f"- Подсказка: {hint}"
         if qh_response:
             hint_section += f"\n- Ответ на вопрос кандидата: {qh_response}"
         
-        # Добавляем список уже заданных вопросов для дедупликации
-        dedup_section = ""
-        if asked_questions:
-            dedup_section = f"\n\nВАЖНО: Не повторяй уже заданные вопросы:\n" + "\n".join(f"- {q[:80]}..." if len(q) > 80 else f"- {q}" for q in asked_questions[-5:])
-        
         prompt = INTERVIEWER_PROMPT.format(
             candidate_name=profile.name,
             position=profile.position,
@@ -63,21 +84,115 @@ class InterviewerAgent(BaseAgent):
             action=action,
             hint_section=hint_section,
             conversation_history=history_str or "Диалог начинается."
-        ) + dedup_section
+        )
         
-        resp = await self._call_llm(prompt)
-        msg = resp.strip()
+        # Подсказка повторяет вопрос намеренно — её не проверяем
+        if settings.question_dedup_enabled and action != "give_hint":
+            msg = await self._generate_checked(state, prompt, topic, stream, effects)
+        else:
+            msg = self._clean(await self._call_llm(prompt, stream=stream))
+        
+        # Сохраняем вопрос для дедупликации
+        new_asked = asked_questions + [msg]
         
+        return self._commit({"current_agent_message": msg,  "asked_questions": new_asked}, effects, speculative)
+    
+    @staticmethod
+    def _commit(result, effects, speculative):
+        if speculative:
+            return {**result, "deferred_effects": effects}
+        for apply in effects:
+            apply()
+        return result
+    
+    def _clean(self, resp):
+        msg = resp.strip()
         # Защита от JSON в ответе
         if msg.startswith("{") or msg.startswith("```"):
             msg = "Давай продолжим. Расскажи подробнее о своем опыте."
+        return msg
+    
+    async def _generate_checked(self, state, prompt, topic, stream, effects):
+        """Генерация с проверкой по индексу заданных вопросов: при почти-повторе одна
+        перегенерация, затем замена. Реплика стримится; каждый вопрос проверяется, как только
+        допечатан, и на повторе генерация обрывается, а показанное отзывается"""
+        registry = get_question_indexes()
+        index = registry.get(state.get("session_id"), state.get("asked_questions", []))
+        effects.append(partial(registry.record, "checks"))
         
-        # Сохраняем вопрос для дедупликации
-        new_asked = asked_questions + [msg]
+        msg, similar = await self._generate_unique(prompt, index, stream)
+        if similar is None:
+            return msg
+        effects.append(partial(registry.record, "duplicates"))
+        self._retract(stream)
         
-        return {"current_agent_message": msg,  "asked_questions": new_asked}
-
-
+        # В промпт идёт только совпавший вопрос, а не весь список заданных
+        retry_prompt = prompt + f"\n\nВопрос «{extract_question(similar)}» уже был задан. Задай другой вопрос по теме."
+        retry, similar = await self._generate_unique(retry_prompt, index, stream)
+        if similar is None:
+            effects.append(partial(registry.record, "regenerated"))
+            return retry
+        
+        self._retract(stream)
+        effects.append(partial(registry.record, "substituted"))
+        return self._substitute_question(state, topic, effects)
+    
+    async def _generate_unique(self, prompt, index, stream):
+        """(реплика, None) или (отклонённая реплика, похожий заданный вопрос)"""
+        threshold = settings.question_dedup_threshold
+        found = {"question": None, "checked": 0}
+        
+        def duplicate_so_far(text):
+            # Вопрос допечатан, когда после него появился "?" — проверяем только новые
+            end = text.rfind("?")
+            if end < found["checked"]:
+                return False
+            found["checked"] = end + 1
+            score, similar = index.most_similar(last_sentence(text[:end + 1]))
+            if score >= threshold:
+                found["question"] = similar
+                return True
+            return False
+        
+        if stream:
+            text, cut = await self._stream_llm(prompt, stop=duplicate_so_far)
+        else:
+            text, cut = await self._call_llm(prompt, stream=False), False
+        msg = self._clean(text)
+        if cut:
+            return msg, found["question"]
+        score, similar = index.most_similar(msg)
+        return (msg, None) if score < threshold else (msg, similar)
+    
+    @staticmethod
+    def _retract(stream):
+        """Сообщает потребителю потока графа, что показанные токены реплики отменены"""
+        if not stream:
+            return
+        try:
+            get_stream_writer()({"retract": "interviewer"})
+        except RuntimeError:
+            pass  # вне графа (батч-заполнение банка) — отзывать нечего
+    
+    def _from_bank(self, state, topic, difficulty, effects):
+        """Вопрос из банка, не похожий на уже заданные в сессии, или None"""
+        profile = state.get("candidate_profile")
+        index = get_question_indexes().get(state.get("session_id"), state.get("asked_questions", []))
+        bank = get_question_bank()
+        banked = bank.draw(profile.position, profile.target_grade, topic, difficulty, asked=index, record=False)
+        effects.append(partial(bank.record, banked is not None))
+        return banked
+    
+    def _substitute_question(self, state, topic, effects):
+        router = state.get("router_decision")
+        if settings.question_bank_enabled:
+            banked = self._from_bank(state, topic, router.difficulty if router else "medium", effects)
+            if banked:
+                return banked
+        return (f"Давай посмотрим на тему «{topic}» с практической стороны: "
+                f"расскажи о задаче из своего опыта, где это пригодилось, и с какими сложностями ты столкнулся?")
+    
+    
     async def generate_greeting(self, state):
         """Приветствие кандидата"""
         profile = state.get("candidate_profile")
@@ -86,26 +201,25 @@ class InterviewerAgent(BaseAgent):
         if not profile:
             return {"last_error": "No candidate profile"}
         
-        topics_str = "Не определены"
-        if plan and plan.topics:
-            topics_str = ", ".join([t.name for t in plan.topics[:5]])
-        
-        prompt = INTERVIEWER_GREETING_PROMPT.format(
+        profile_fields = dict(
             candidate_name=profile.name,
             position=profile.position,
             target_grade=profile.target_grade,
-            experience=profile.experience,
-            topics=topics_str
+            experience=profile.experience
         )
+        if plan and plan.topics:
+            topics_str = ", ".join([t.name for t in plan.topics[:5]])
+            prompt = INTERVIEWER_GREETING_PROMPT.format(**profile_fields, topics=topics_str)
+        else:
+            # Плана ещё нет (параллельный старт) — приветствие только по профилю
+            prompt = INTERVIEWER_GREETING_PROFILE_PROMPT.format(**profile_fields)
         
-        resp = await self._call_llm(prompt)
+        # Приветствие зависит только от профиля и плана — кэшируется
+        resp = await self._call_llm(prompt, cache=True)
         return {"current_agent_message": resp.strip(), "current_turn_id": 1}
     
-    def _format_history(self, history):
+    def _format_history(self, history, summary=None):
         if not history:
             return ""
-        lines = []
-        for entry in history[-10:]:
-            role = "Интервьюер" if entry.get("role") == "interviewer" else "Кандидат"
-            lines.append(f"{role}: {entry.get('content', '')}")
-        return "\n".join(lines)
+        # Резюме старых реплик + окно последних — промпт не растёт с длиной интервью
+        return render_context(summary, history)
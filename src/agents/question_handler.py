@@ -4,11 +4,14 @@
 from src.agents.base import BaseAgent
 from src.prompts.templates import QUESTION_HANDLER_PROMPT
 from src.models.output_schemas import QuestionHandlerOutput
+from src.tools.conversation_summary import render_context
 
 
 class QuestionHandlerAgent(BaseAgent):
     """Отвечает на вопросы кандидата"""
     
+    use_response_cache = True
+    
     @property
     def name(self):
         return "QuestionHandler"
@@ -34,7 +37,10 @@ class QuestionHandlerAgent(BaseAgent):
         prompt = QUESTION_HANDLER_PROMPT.format(
             candidate_question=question,
             position=profile.position if profile else "Developer",
-            current_topic=topic
+            current_topic=topic,
+            conversation_context=render_context(
+                state.get("conversation_summary"), state.get("conversation_history", [])
+            ) or "Нет"
         )
         
         try:
@@ -2,9 +2,11 @@
 """Планировщик тем интервью"""
 
 from src.agents.base import BaseAgent
+from src.config import settings
 from src.prompts.templates import TOPIC_PLANNER_PROMPT
 from src.models.schemas import InterviewPlan, TopicInfo
 from src.models.output_schemas import InterviewPlanOutput
+from src.utils.plan_cache import get_plan_cache
 
 
 class TopicPlannerAgent(BaseAgent):
@@ -19,6 +21,27 @@ class TopicPlannerAgent(BaseAgent):
         if not profile:
             return {"last_error": "No candidate profile"}
         
+        # Похожие профили получают план из пула вариантов без вызова LLM
+        cache = get_plan_cache() if settings.plan_cache_enabled else None
+        if cache:
+            cached = await cache.get(profile)
+            if cached:
+                plan = InterviewPlan(**{**cached, "position": profile.position})
+                return {"interview_plan": plan, "status": "in_progress"}
+        
+        plan = await self.generate_plan(profile)
+        if plan is None:
+            plan = self._default_plan(profile)
+        elif cache:
+            await cache.add(profile, plan.model_dump())
+        
+        return {"interview_plan": plan, "status": "in_progress"}
+    
+    async def generate_plan(self, profile):
+        """План через LLM или None при ошибке.
+        
+        Кэш ответов LLM здесь не используется: варианты плана для пула должны различаться.
+        """
         prompt = TOPIC_PLANNER_PROMPT.format(
             position=profile.position,
             target_grade=profile.target_grade,
@@ -27,20 +50,19 @@ class TopicPlannerAgent(BaseAgent):
         
         try:
             result = await self._call_structured(InterviewPlanOutput, prompt)
-            topics = [TopicInfo(name=t.name, priority=t.priority,
-                               questions_budget=t.questions_budget, status=t.status)
-                     for t in result.topics]
-            plan = InterviewPlan(
-                position=result.position,
-                target_grade=result.target_grade,
-                topics=topics,
-                total_questions_limit=result.total_questions_limit
-            )
         except Exception as e:
             print(f"Error in {self.name}: {e}")
-            plan = self._default_plan(profile)
+            return None
         
-        return {"interview_plan": plan, "status": "in_progress"}
+        topics = [TopicInfo(name=t.name, priority=t.priority,
+                           questions_budget=t.questions_budget, status=t.status)
+                 for t in result.topics]
+        return InterviewPlan(
+            position=result.position,
+            target_grade=result.target_grade,
+            topics=topics,
+            total_questions_limit=result.total_questions_limit
+        )
     
     def _default_plan(self, profile):
         """Дефолтный план по позиции"""
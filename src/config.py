@@ -21,6 +21,115 @@ class Settings(BaseSettings):
     temperature: float = 0.7
     max_tokens: int = 2000
     
+    # Общий пул HTTP-соединений к LLM
+    llm_pool_size: int = 20
+    llm_keepalive_expiry: float = 60.0
+    llm_request_timeout: float = 60.0
+    llm_warmup: bool = True
+    llm_warmup_connections: int = 4
+    
+    # Глобальный лимит вызовов LLM (на все сессии)
+    llm_rpm_limit: int = 500
+    llm_tpm_limit: int = 200000
+    llm_max_concurrency: int = 16
+    llm_max_retries: int = 4
+    llm_expected_output_tokens: int = 400
+    
+    # Проверка фактов
+    fact_check_max_claims: int = 3
+    fact_check_search_timeout: float = 8.0
+    fact_store_enabled: bool = True
+    fact_store_path: str = ".cache/fact_verdicts.json"
+    fact_store_ttl: float = 30 * 24 * 3600
+    fact_store_similarity: float = 0.85  # 1.0 — только точное совпадение
+    fact_store_save_delay: float = 2.0  # запись на диск пачкой, не чаще раза в N секунд
+    fact_store_llm_only_ttl: float = 3600  # вердикты без поиска: живут недолго и перепроверяются поиском
+    # Локальная предпроверка по таблице известных фактов (пусто — src/data/known_facts.json)
+    fact_rules_enabled: bool = True
+    known_facts_path: str = ""
+    fact_rules_min_confidence: float = 0.9
+    # Локальный классификатор ответов перед AnswerAnalyzer (пусто — src/data/answer_classifier.json)
+    answer_classifier_enabled: bool = True
+    answer_classifier_path: str = ""
+    answer_classifier_threshold: float = 0.9  # ниже — эскалация в LLM
+    answer_classifier_shadow_rate: float = 0.05
+    answer_classifier_log_path: str = ".cache/answer_classifier.jsonl"
+    # Дедупликация вопросов интервьюера по MinHash (оценка Жаккара)
+    question_dedup_enabled: bool = True
+    question_dedup_threshold: float = 0.65  # откалибровано: python benchmarks/question_dedup_bench.py
+    question_dedup_num_perm: int = 128
+    # Банк вопросов: python -m src.tools.question_bank fill ...
+    question_bank_enabled: bool = True
+    question_bank_path: str = ".cache/question_bank.json"
+    # Кэш планов интервью: python -m src.utils.plan_cache warm ...
+    plan_cache_enabled: bool = True
+    plan_cache_variants: int = 3
+    plan_cache_ttl: float = 7 * 24 * 3600
+    plan_cache_path: str = ".cache/plans.sqlite"
+    plan_cache_memory_size: int = 256
+    plan_cache_disk_max_entries: int = 5000
+    # Приветствие генерируется параллельно с планом (только по профилю, без списка тем)
+    parallel_greeting: bool = True
+    # Скользящее резюме диалога: окно последних реплик как есть, старше — сжатые строки и термины
+    summary_window_messages: int = 4
+    summary_message_chars: int = 500  # реплика в окне обрезается до стольких символов
+    summary_line_chars: int = 120
+    summary_max_lines: int = 8
+    summary_max_terms: int = 20
+    # Evaluator получает сжатое состояние оценки фиксированного размера
+    evaluator_max_skills: int = 10
+    evaluator_max_gaps: int = 8
+    # Финальный отчёт HiringManager, по приоритету:
+    # 1. report_draft_enabled и черновик есть — финализация черновика (предфинальный отдаётся без вызовов);
+    # 2. иначе полный отчёт: секциями при hiring_report_sections, иначе одним вызовом.
+    # Map-reduce и секции работают в обоих путях: интервью в промпт идёт выжимками по темам
+    # (с hiring_map_reduce_min_messages реплик), у черновика секциями идут вердикт и soft skills
+    # Map-reduce отчёта: выжимки по темам параллельно, затем итоговый вызов (или секции)
+    hiring_map_reduce_min_messages: int = 16  # короче — скользящее резюме
+    hiring_map_chunk_chars: int = 6000
+    # Секции отчёта (вердикт, технический обзор, soft skills, roadmap) генерируются параллельно
+    hiring_report_sections: bool = True
+    # Черновик отчёта в фоне после каждого оценённого хода; ближе к концу — предфинальный отчёт
+    report_draft_enabled: bool = True
+    report_prefinalize_turns: int = 2  # осталось ходов (по лимиту или плану) — пора предфинализировать
+    # Спекулятивная генерация следующего вопроса, пока кандидат печатает
+    speculation_enabled: bool = True
+    speculation_max_branches: int = 2  # вероятных решений роутера на ход
+    speculation_max_calls_per_session: int = 12
+    
+    # Веб-поиск
+    # Провайдеры по порядку: "duckduckgo", "local" или "local,duckduckgo"
+    search_providers: str = "duckduckgo"
+    search_min_results: int = 1
+    # "tiered" — по очереди; "race" — все провайдеры сразу, первый достаточный ответ побеждает
+    search_strategy: str = "tiered"
+    search_hedge_delay: float = 0.5  # задержка старта для медленных провайдеров в гонке
+    search_slow_factor: float = 3.0
+    search_demote_error_rate: float = 0.5
+    search_demote_min_calls: int = 5
+    search_demote_seconds: float = 120.0
+    # Circuit breaker: после N отказов поиска подряд Fact Checker работает без поиска
+    search_breaker_failures: int = 3
+    search_breaker_reset: float = 30.0
+    search_breaker_half_open_calls: int = 1
+    search_timeout: float = 6.0
+    search_max_workers: int = 8
+    search_cache_size: int = 1024
+    search_cache_ttl: float = 6 * 3600
+    
+    # Локальная база справочных документов
+    knowledge_base_dir: str = "knowledge_base"
+    knowledge_base_index_path: str = ".cache/kb_index.json"
+    knowledge_base_passage_chars: int = 800
+    knowledge_base_check_interval: float = 30.0  # как часто сверять файлы базы с индексом (сек)
+    
+    # Кэш ответов LLM (opt-in)
+    llm_cache_enabled: bool = False
+    llm_cache_path: str = ".cache/llm_responses.sqlite"
+    llm_cache_ttl: float = 7 * 24 * 3600
+    llm_cache_memory_size: int = 512
+    llm_cache_disk_max_entries: int = 20000
+    
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -1,18 +1,27 @@
 # -*- coding: utf-8 -*-
 """Полный граф интервью на LangGraph с conditional edges"""
 
+from collections import OrderedDict
 from typing import Literal
 from langgraph.graph import StateGraph, END
 
-from src.models.state import InterviewState, create_initial_state
+from src.models.state import InterviewState, create_initial_state, merge_turn_logs
 from src.models.schemas import (
-    CandidateProfile, RouterDecision, TurnLog, InternalThoughts, EvaluationState
+    CandidateProfile, RouterDecision, TurnLog, InternalThoughts, EvaluationState, AnswerAnalysis
 )
 from src.agents import (
     TopicPlannerAgent, InterviewerAgent, AnswerAnalyzerAgent,
     FactCheckerAgent, EvaluatorAgent, QuestionHandlerAgent, HiringManagerAgent
 )
 from src.config import settings
+from src.tools.answer_classifier import get_answer_classifier
+from src.tools.conversation_summary import update_summary
+from src.graph.speculation import (
+    get_speculative_engine, SPECULATIVE_ACTIONS, PENDING_ANSWER, decision_key, ordinary_answer
+)
+from src.graph.report_draft import get_report_drafts
+from src.utils.rate_limiter import create_background_task
+from src.agents.hiring_manager import evaluation_key
 
 
 
@@ -26,6 +35,9 @@ class InterviewGraph:
         self.question_handler = QuestionHandlerAgent()
         self.hiring_manager = HiringManagerAgent()
         self.logger = logger
+        # session_id -> фоновая задача Evaluator текущего хода (брошенные сессии вытесняются)
+        self._pending_evaluations = OrderedDict()
+        self.max_pending_sessions = 256
         
         # Добавляем лимит рекурсии чтобы избежать бесконечных циклов
         self.app = self._build_full_graph().compile()
@@ -34,6 +46,14 @@ class InterviewGraph:
     def set_logger(self, logger):
         self.logger = logger
     
+    def end_session(self, session_id):
+        """Снимает фоновую работу сессии: брошена без стоп-слова или вытеснена"""
+        task = self._pending_evaluations.pop(session_id, None)
+        if task and not task.done():
+            task.cancel()
+        get_speculative_engine().discard(session_id)
+        get_report_drafts().discard(session_id)
+    
     def _build_full_graph(self):
         graph = StateGraph(InterviewState)
         
@@ -43,33 +63,40 @@ class InterviewGraph:
         graph.add_node("greeting", self._run_greeting)
         graph.add_node("log_greeting", self._log_greeting)
         graph.add_node("prepare_turn", self._prepare_turn)
+        graph.add_node("join_evaluation", self._join_evaluation)
         graph.add_node("check_stop", self._check_stop)
         graph.add_node("check_limit", self._check_limit)
         graph.add_node("answer_analyzer", self._run_answer_analyzer)
         graph.add_node("fact_checker", self._run_fact_checker)
-        graph.add_node("evaluator", self._run_evaluator)
+        graph.add_node("evaluator", self._spawn_evaluator)
         graph.add_node("question_handler", self._run_question_handler)
+        graph.add_node("join_branches", self._join_branches)
         graph.add_node("router", self._run_router)
         graph.add_node("interviewer", self._run_interviewer)
         graph.add_node("log_turn", self._run_log_turn)
         graph.add_node("update_progress", self._update_topic_progress)
         graph.add_node("hiring_manager", self._run_hiring_manager)
+        graph.add_node("speculate", self._spawn_speculation)
         
         graph.set_entry_point("entry_router")
         
         # Роутинг входа
-        graph.add_conditional_edges("entry_router", self._route_entry, {
-            "init": "topic_planner",
-            "turn": "prepare_turn"
-        })
+        graph.add_conditional_edges(
+            "entry_router", self._route_entry,
+            ["topic_planner", "greeting", "prepare_turn"]
+        )
         
-        # Инициализация
-        graph.add_edge("topic_planner", "greeting")
-        graph.add_edge("greeting", "log_greeting")
-        graph.add_edge("log_greeting", END)
+        # Инициализация: план и приветствие параллельно (один раунд LLM) или по очереди
+        if settings.parallel_greeting:
+            graph.add_edge(["topic_planner", "greeting"], "log_greeting")
+        else:
+            graph.add_edge("topic_planner", "greeting")
+            graph.add_edge("greeting", "log_greeting")
+        graph.add_edge("log_greeting", "speculate")
         
-        # Подготовка хода -> проверка стоп
-        graph.add_edge("prepare_turn", "check_stop")
+        # Подготовка хода -> оценка прошлого хода -> проверка стоп
+        graph.add_edge("prepare_turn", "join_evaluation")
+        graph.add_edge("join_evaluation", "check_stop")
         
         # Стоп или продолжение
         graph.add_conditional_edges("check_stop", self._route_stop, {
@@ -83,21 +110,17 @@ class InterviewGraph:
             "continue": "answer_analyzer"
         })
         
-        # После анализа: нужна ли проверка фактов
-        graph.add_conditional_edges("answer_analyzer", self._route_fact_check, {
-            "check": "fact_checker",
-            "skip": "evaluator"
-        })
-        
-        graph.add_edge("fact_checker", "evaluator")
-        
-        # После оценки: есть ли вопрос кандидата
-        graph.add_conditional_edges("evaluator", self._route_question, {
-            "has_question": "question_handler",
-            "no_question": "router"
-        })
+        # После анализа: Fact Checker и Question Handler параллельно (если нужны)
+        graph.add_conditional_edges(
+            "answer_analyzer", self._route_branches,
+            ["fact_checker", "question_handler", "join_branches"]
+        )
+        graph.add_edge("fact_checker", "join_branches")
+        graph.add_edge("question_handler", "join_branches")
         
-        graph.add_edge("question_handler", "router")
+        # Evaluator стартует в фоне и не держит ответ кандидату
+        graph.add_edge("join_branches", "evaluator")
+        graph.add_edge("evaluator", "router")
         
         # После роутера: завершать или продолжать
         graph.add_conditional_edges("router", self._route_end, {
@@ -107,16 +130,19 @@ class InterviewGraph:
         
         graph.add_edge("interviewer", "log_turn")
         graph.add_edge("log_turn", "update_progress")
-        graph.add_edge("update_progress", END)
+        graph.add_edge("update_progress", "speculate")
+        graph.add_edge("speculate", END)
         
         graph.add_edge("hiring_manager", END)
         
         return graph
     
-    def _route_entry(self, state) -> Literal["init", "turn"]:
-        if state.get("status") == "initializing":
-            return "init"
-        return "turn"
+    def _route_entry(self, state) -> list[str]:
+        if state.get("status") != "initializing":
+            return ["prepare_turn"]
+        if settings.parallel_greeting:
+            return ["topic_planner", "greeting"]
+        return ["topic_planner"]
     
     def _route_stop(self, state) -> Literal["stop", "continue"]:
         if state.get("stop_requested"):
@@ -129,17 +155,15 @@ class InterviewGraph:
             return "limit"
         return "continue"
     
-    def _route_fact_check(self, state) -> Literal["check", "skip"]:
+    def _route_branches(self, state) -> list[str]:
+        """Ветки после анализа ответа; обе зависят только от answer_analysis"""
         analysis = state.get("answer_analysis")
+        branches = []
         if analysis and analysis.needs_fact_check and analysis.suspicious_claims:
-            return "check"
-        return "skip"
-    
-    def _route_question(self, state) -> Literal["has_question", "no_question"]:
-        analysis = state.get("answer_analysis")
+            branches.append("fact_checker")
         if analysis and analysis.candidate_asked_question:
-            return "has_question"
-        return "no_question"
+            branches.append("question_handler")
+        return branches or ["join_branches"]
     
     def _route_end(self, state) -> Literal["end", "continue"]:
         decision = state.get("router_decision")
@@ -148,12 +172,14 @@ class InterviewGraph:
         return "continue"
     
 
+    # Ноды возвращают только изменённые ключи: полный state в ответе
+    # заново прибавлялся бы к turn_logs (редюсер add) и ломал параллельные ветки
+    
     async def _entry_router(self, state):
-        return state
+        return {}
     
     async def _run_topic_planner(self, state):
-        result = await self.topic_planner.run(dict(state))
-        return {**state, **result}
+        return await self.topic_planner.run(dict(state))
     
     async def _run_greeting(self, state):
         result = await self.interviewer.generate_greeting(dict(state))
@@ -161,12 +187,15 @@ class InterviewGraph:
         msg = result.get("current_agent_message", "")
         if msg:
             history = history + [{"role": "interviewer", "content": msg}]
-        return {
-            **state, **result,
+        update = {
+            **result,
             "conversation_history": history,
-            "status": "in_progress",
             "previous_agent_message": msg
         }
+        # При параллельном старте статус выставляет TopicPlanner — ключи веток не пересекаются
+        if not settings.parallel_greeting:
+            update["status"] = "in_progress"
+        return update
     
     async def _log_greeting(self, state):
         return await self._log_turn_internal(state, is_greeting=True)
@@ -175,16 +204,22 @@ class InterviewGraph:
         user_message = state.get("current_user_message", "")
         prev_msg = state.get("current_agent_message", "")
         history = state.get("conversation_history", [])
-        history = history + [{"role": "candidate", "content": user_message}]
+        # Ответ относится к теме последнего вопроса — по темам HiringManager режет транскрипт
+        topic = history[-1].get("topic") if history else None
+        history = history + [{"role": "candidate", "content": user_message, "topic": topic}]
         turn = state.get("current_turn_id", 1)
         
-        # Проверка стоп-слов
-        stop_requested = any(kw in user_message.lower() for kw in ["стоп", "stop", "завершить"])
+        # Проверка стоп-слов: классификатор не путает "стоп" с "stop-the-world" в ответе
+        if settings.answer_classifier_enabled:
+            stop_requested = get_answer_classifier().detect_stop(user_message)
+        else:
+            stop_requested = any(kw in user_message.lower() for kw in ["стоп", "stop", "завершить"])
         
         return {
-            **state,
             "previous_agent_message": prev_msg,
             "conversation_history": history,
+            # Реплики старше окна сжимаются инкрементально, раз в ход
+            "conversation_summary": update_summary(state.get("conversation_summary"), history),
             "current_turn_id": turn + 1,
             "answer_analysis": None,
             "fact_check_result": None,
@@ -195,29 +230,88 @@ class InterviewGraph:
         }
     
     async def _check_stop(self, state):
-        return state
+        return {}
     
     async def _check_limit(self, state):
         turn = state.get("current_turn_id", 1)
         if turn >= settings.total_questions_limit:
-            return {**state, "status": "ending"}
-        return state
+            return {"status": "ending"}
+        return {}
     
     async def _run_answer_analyzer(self, state):
-        result = await self.answer_analyzer.run(dict(state))
-        return {**state, **result}
+        return await self.answer_analyzer.run(dict(state))
     
-    async def _run_fact_checker(self, state):
-        result = await self.fact_checker.run(dict(state))
-        return {**state, **result}
+    async def _run_branch(self, agent, key, state):
+        """Запуск агента в параллельной ветке.
+        
+        Агенту отдаётся пустой словарь мыслей, а его мысли уходят в branch_thoughts
+        под своим ключом — join_branches потом сливает их без потерь.
+        """
+        branch_state = dict(state)
+        branch_state["internal_thoughts"] = {}
+        result = await agent.run(branch_state)
+        thoughts = result.pop("internal_thoughts", None) or {}
+        if thoughts.get(key):
+            result["branch_thoughts"] = {key: thoughts[key]}
+        return result
     
-    async def _run_evaluator(self, state):
-        result = await self.evaluator.run(dict(state))
-        return {**state, **result}
+    async def _run_fact_checker(self, state):
+        return await self._run_branch(self.fact_checker, "fact_checker", state)
     
     async def _run_question_handler(self, state):
-        result = await self.question_handler.run(dict(state))
-        return {**state, **result}
+        return await self._run_branch(self.question_handler, "question_handler", state)
+    
+    async def _join_branches(self, state):
+        thoughts = dict(state.get("internal_thoughts") or {})
+        thoughts.update(state.get("branch_thoughts") or {})
+        return {"internal_thoughts": thoughts, "branch_thoughts": None}
+    
+    async def _spawn_evaluator(self, state):
+        """Запускает Evaluator в фоне — роутер и интервьюер его не ждут.
+        
+        Результат забирает _join_evaluation перед следующим ходом или отчётом.
+        """
+        snapshot = dict(state)
+        # Свой словарь мыслей, чтобы фоновая задача не писала в общий
+        snapshot["internal_thoughts"] = {}
+        session_id = state.get("session_id")
+        task = create_background_task(self.evaluator.run(snapshot))
+        self._pending_evaluations[session_id] = task
+        self._pending_evaluations.move_to_end(session_id)
+        while len(self._pending_evaluations) > self.max_pending_sessions:
+            evicted, _ = next(iter(self._pending_evaluations.items()))
+            self.end_session(evicted)
+        if settings.report_draft_enabled:
+            # Черновик отчёта дополняется сразу за оценкой, тоже в фоне
+            get_report_drafts().schedule(session_id, self.hiring_manager, task, snapshot)
+        return {}
+    
+    async def _join_evaluation(self, state):
+        """Дожидается фоновой оценки прошлого хода и вливает её в состояние"""
+        task = self._pending_evaluations.pop(state.get("session_id"), None)
+        if task is None:
+            return {}
+        
+        try:
+            result = await task
+        except Exception as e:
+            print(f"Background evaluation error: {e}")
+            return {}
+        
+        update = {}
+        if result.get("evaluation") is not None:
+            update["evaluation"] = result["evaluation"]
+        
+        ev_thoughts = (result.get("internal_thoughts") or {}).get("evaluator")
+        if ev_thoughts:
+            # Оценка дописывается в лог хода, к которому относится: редюсер заменит лог по turn_id
+            logs = state.get("turn_logs") or []
+            if logs:
+                thoughts = logs[-1].internal_thoughts.model_copy(update={"evaluator": ev_thoughts})
+                update["turn_logs"] = [logs[-1].model_copy(update={"internal_thoughts": thoughts})]
+            update["last_thoughts"] = {**(state.get("last_thoughts") or {}), "evaluator": ev_thoughts}
+        
+        return update
     
     async def _run_router(self, state):
         decision = self._make_routing_decision(state)
@@ -228,32 +322,77 @@ class InterviewGraph:
             "action": decision.action,
             "reasoning": decision.reasoning
         }
-        return {**state, "router_decision": decision, "internal_thoughts": thoughts}
+        return {"router_decision": decision, "internal_thoughts": thoughts}
     
     async def _run_interviewer(self, state):
-        result = await self.interviewer.run(dict(state))
+        result = None
+        decision = state.get("router_decision")
+        if settings.speculation_enabled and decision:
+            # Заготовка не реагирует на ответ: годится только для обычного ответа по теме,
+            # без встречного вопроса кандидата (его ответ меняет промпт)
+            usable = (decision.action in SPECULATIVE_ACTIONS and not state.get("question_handler_response")
+                      and ordinary_answer(state.get("answer_analysis")))
+            result = await get_speculative_engine().take(
+                state.get("session_id"), decision if usable else None, len(state.get("asked_questions", [])),
+                answer=state.get("current_user_message", "")
+            )
+        if result is None:
+            result = await self.interviewer.run(dict(state))
         history = state.get("conversation_history", [])
         
+        topic = self._current_topic(state)
         qh = state.get("question_handler_response")
         if qh:
-            history = history + [{"role": "interviewer", "content": qh}]
+            history = history + [{"role": "interviewer", "content": qh, "topic": topic}]
         if result.get("current_agent_message"):
-            history = history + [{"role": "interviewer", "content": result["current_agent_message"]}]
+            history = history + [{"role": "interviewer", "content": result["current_agent_message"], "topic": topic}]
         
         return {
-            **state, **result,
+            **result,
             "conversation_history": history,
             "question_handler_response": None,
             "router_decision": None
         }
     
+    def _speculative_decisions(self, state):
+        """Вероятные решения роутера на следующем ходу: его же логика на гипотетических анализах"""
+        hypotheses = [
+            AnswerAnalysis(quality="good", confidence_detected=0.7, completeness=0.7, reasoning=""),
+            AnswerAnalysis(quality="excellent", confidence_detected=0.9, completeness=0.9, reasoning=""),
+            AnswerAnalysis(quality="poor", confidence_detected=0.2, completeness=0.1, off_topic=True, reasoning=""),
+        ]
+        decisions = {}
+        for analysis in hypotheses:
+            decision = self._make_routing_decision({**state, "answer_analysis": analysis})
+            if decision.action in SPECULATIVE_ACTIONS:
+                decisions.setdefault(decision_key(decision), decision)
+        return list(decisions.values())
+    
+    async def _spawn_speculation(self, state):
+        """Пока кандидат печатает, заранее генерирует вопрос для вероятных решений роутера"""
+        if not settings.speculation_enabled or state.get("status") != "in_progress":
+            return {}
+        
+        # Ответа ещё нет — вместо него заглушка, чтобы модель не реагировала на несуществующий ответ
+        pending = {"role": "candidate", "content": PENDING_ANSWER, "topic": self._current_topic(state)}
+        history = state.get("conversation_history", []) + [pending]
+        
+        def job(decision):
+            snapshot = {**state, "router_decision": decision, "question_handler_response": None,
+                        "conversation_history": history}
+            return lambda: self.interviewer.run(snapshot, speculative=True)
+        
+        jobs = [(d, job(d)) for d in self._speculative_decisions(state)]
+        get_speculative_engine().spawn(state.get("session_id"), jobs, len(state.get("asked_questions", [])))
+        return {}
+    
     async def _run_log_turn(self, state):
         return await self._log_turn_internal(state, is_greeting=False)
     
     async def _update_topic_progress(self, state):
         plan = state.get("interview_plan")
         if not plan or not plan.topics:
-            return {**state, "previous_agent_message": state.get("current_agent_message", "")}
+            return {"previous_agent_message": state.get("current_agent_message", "")}
         
         for t in plan.topics:
             if t.status in ["pending", "in_progress"]:
@@ -264,17 +403,25 @@ class InterviewGraph:
                 break
         
         return {
-            **state,
             "interview_plan": plan,
             "previous_agent_message": state.get("current_agent_message", "")
         }
     
     async def _run_hiring_manager(self, state):
+        get_speculative_engine().discard(state.get("session_id"))
+        # Отчёт строится по оценке с учётом последнего хода
+        update = await self._join_evaluation(state)
+        if settings.report_draft_enabled:
+            key = evaluation_key(update.get("evaluation") or state.get("evaluation"))
+            update["report_draft"] = await get_report_drafts().take(state.get("session_id"), key)
+        # Локальное состояние для отчёта и лога сессии — логи сливаются как в редюсере
+        logs = merge_turn_logs(state.get("turn_logs"), update.get("turn_logs"))
+        state = {**state, **update, "turn_logs": logs}
         result = await self.hiring_manager.run(dict(state))
-        new_state = {**state, **result, "status": "completed"}
+        update = {**update, **result, "status": "completed"}
         if self.logger:
-            self.logger.save_session(new_state)
-        return new_state
+            self.logger.save_session({**state, **update, "turn_logs": logs})
+        return update
     
     async def _log_turn_internal(self, state, is_greeting=False):
         thoughts = state.get("internal_thoughts") or {}
@@ -294,21 +441,39 @@ class InterviewGraph:
                 internal_thoughts=InternalThoughts(**thoughts)
             )
         
-        # Возвращаем только новый лог - редюсер add сам добавит к списку
+        # Оценка этого хода ещё считается в фоне — в панели остаётся последняя готовая
+        last_thoughts = dict(thoughts)
+        prev_evaluator = (state.get("last_thoughts") or {}).get("evaluator")
+        if prev_evaluator and not last_thoughts.get("evaluator"):
+            last_thoughts["evaluator"] = prev_evaluator
+        
+        # Возвращаем только новый лог - редюсер сам добавит к списку
         result = {
             "turn_logs": [turn_log],
             "internal_thoughts": None,
-            "last_thoughts": thoughts
+            "last_thoughts": last_thoughts
         }
         
         if self.logger:
             # Для сохранения нужен полный список
             full_logs = state.get("turn_logs", []) + [turn_log]
-            save_state = {**state, "turn_logs": full_logs, "last_thoughts": thoughts}
+            save_state = {**state, "turn_logs": full_logs, "last_thoughts": last_thoughts}
             self.logger.save_session(save_state)
         
         return result
     
+    def _current_topic(self, state):
+        """Тема реплики интервьюера: из решения роутера, иначе первая незакрытая тема плана"""
+        decision = state.get("router_decision")
+        if decision and decision.next_topic:
+            return decision.next_topic
+        plan = state.get("interview_plan")
+        if plan and plan.topics:
+            for t in plan.topics:
+                if t.status in ["pending", "in_progress"]:
+                    return t.name
+        return None
+    
     def _make_routing_decision(self, state):
         analysis = state.get("answer_analysis")
         plan = state.get("interview_plan")
@@ -380,6 +545,36 @@ class InterviewGraph:
         new_state = dict(state)
         new_state["current_user_message"] = user_message
         return await self.app.ainvoke(new_state, config=self.config)
+    
+    async def stream_user_message(self, state, user_message):
+        """Как process_user_message, но отдаёт токены реплики интервьюера по мере генерации.
+        
+        Yields ("token", str) для каждого токена и в конце ("state", final_state).
+        ("retract", None) — показанная часть реплики отменена (вопрос оказался повтором),
+        дальше идут токены новой генерации.
+        """
+        new_state = dict(state)
+        new_state["current_user_message"] = user_message
+        final_state = None
+        
+        async for mode, chunk in self.app.astream(
+            new_state, config=self.config, stream_mode=["messages", "values", "custom"]
+        ):
+            if mode == "values":
+                final_state = chunk
+                continue
+            if mode == "custom":
+                if isinstance(chunk, dict) and chunk.get("retract") == "interviewer":
+                    yield "retract", None
+                continue
+            message, metadata = chunk
+            if metadata.get("langgraph_node") != "interviewer":
+                continue
+            text = message.content if isinstance(message.content, str) else ""
+            if text:
+                yield "token", text
+        
+        yield "state", final_state
 
 
 def create_interview_graph():
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Фоновый черновик финального отчёта
+
+Каждая фоновая оценка хода цепляет за собой обновление черновика (навыки,
+пробелы с правильными ответами, roadmap). Когда до конца интервью остаётся
+settings.report_prefinalize_turns ходов, черновик ещё и предфинализируется —
+после "Стоп" отчёт либо уже готов, либо нужен один небольшой вызов.
+"""
+
+import asyncio
+from collections import OrderedDict
+
+from src.config import settings
+from src.utils.metrics import register_metrics
+from src.utils.rate_limiter import create_background_task
+
+
+def remaining_turns(state):
+    """Сколько ходов осталось: по лимиту вопросов и по бюджету незакрытых тем плана"""
+    remaining = settings.total_questions_limit - state.get("current_turn_id", 1)
+    plan = state.get("interview_plan")
+    if plan and plan.topics:
+        left = sum(max(0, t.questions_budget - t.questions_asked) for t in plan.topics if t.status != "completed")
+        remaining = min(remaining, left)
+    return remaining
+
+
+class ReportDraftPipeline:
+    """Черновики по session_id; обновления одной сессии выполняются строго по очереди"""
+    
+    def __init__(self, max_sessions=256):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> {"draft", "task", "prefinal"}
+        self.scheduled = 0
+        self.updates = 0
+        self.prefinalized = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.prefinal_hits = 0
+        self.finalize_calls = 0
+    
+    def _entry(self, session_id):
+        entry = self._sessions.setdefault(session_id, {"draft": None, "task": None, "prefinal": False})
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            _, evicted = self._sessions.popitem(last=False)
+            self._cancel(evicted)
+        return entry
+    
+    def _cancel(self, entry):
+        task = entry.get("task")
+        if task and not task.done():
+            task.cancel()
+            self.cancelled += 1
+    
+    def schedule(self, session_id, agent, evaluation_task, state):
+        """Ставит обновление черновика за фоновой оценкой хода"""
+        entry = self._entry(session_id)
+        prefinal = remaining_turns(state) <= settings.report_prefinalize_turns
+        entry["task"] = create_background_task(
+            self._update(entry, agent, entry["task"], evaluation_task, state, prefinal)
+        )
+        entry["prefinal"] = prefinal
+        self.scheduled += 1
+    
+    async def _update(self, entry, agent, previous, evaluation_task, state, prefinal):
+        if previous is not None:
+            # Черновик строится поверх предыдущего обновления
+            await asyncio.gather(asyncio.shield(previous), return_exceptions=True)
+        try:
+            # shield: отмена черновика не должна отменять саму оценку хода
+            result = await asyncio.shield(evaluation_task)
+            evaluation = result.get("evaluation")
+            if evaluation is None:
+                return
+            draft = await agent.update_draft(entry["draft"], evaluation, state)
+            self.updates += 1
+            if prefinal:
+                final = await agent.finalize_draft(draft, evaluation, state)
+                draft = draft.model_copy(update={"final": final})
+                self.prefinalized += 1
+            entry["draft"] = draft
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Report draft error: {e}")
+            self.failed += 1
+    
+    async def take(self, session_id, evaluation_key):
+        """Черновик для финализации; незавершённое обновление ждём, только если оно предфинальное"""
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return None
+        
+        task = entry["task"]
+        if task is not None and not task.done():
+            if entry["prefinal"]:
+                await asyncio.gather(task, return_exceptions=True)
+            else:
+                # Финализация сама дополнит пробелы последнего хода — ждать обновление незачем
+                self._cancel(entry)
+        
+        draft = entry["draft"]
+        if draft is not None:
+            if draft.final is not None and draft.evaluation_key == evaluation_key:
+                self.prefinal_hits += 1
+            else:
+                self.finalize_calls += 1
+        return draft
+    
+    def discard(self, session_id):
+        entry = self._sessions.pop(session_id, None)
+        if entry:
+            self._cancel(entry)
+    
+    def stats(self):
+        finals = self.prefinal_hits + self.finalize_calls
+        return {
+            "sessions": len(self._sessions),
+            "scheduled": self.scheduled,
+            "updates": self.updates,
+            "prefinalized": self.prefinalized,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "prefinal_hits": self.prefinal_hits,
+            "finalize_calls": self.finalize_calls,
+            "prefinal_hit_rate": round(self.prefinal_hits / finals, 3) if finals else 0.0,
+        }
+
+
+_pipeline = None
+
+
+def get_report_drafts():
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = ReportDraftPipeline()
+        register_metrics("report_draft", _pipeline.stats)
+    return _pipeline
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Спекулятивная генерация следующего вопроса, пока кандидат печатает ответ
+
+После хода граф прогоняет логику роутера на гипотетических анализах ответа и
+заранее генерирует вопросы для вероятных решений (ask_question, change_topic).
+Заготовка не видит ответа кандидата, поэтому это "голый" следующий вопрос без
+реакции на ответ. Она отдаётся, только если реальное решение совпало, ответ
+обычный (класс "answer", без off-topic и встречного вопроса) и не затрагивает уже
+тему заготовленного вопроса; иначе вопрос генерируется заново.
+"""
+
+from collections import OrderedDict
+
+from src.config import settings
+from src.tools.answer_classifier import label_from_analysis, ESCALATE
+from src.tools.question_index import shingles, extract_question
+from src.utils.metrics import register_metrics
+from src.utils.rate_limiter import create_background_task
+
+
+SPECULATIVE_ACTIONS = ("ask_question", "change_topic")
+
+# Реплика-заглушка вместо ещё не написанного ответа в истории для заготовки
+PENDING_ANSWER = "(ответ ещё печатается — не комментируй его, просто задай следующий вопрос)"
+
+
+def decision_key(decision):
+    return decision.action, decision.next_topic, decision.difficulty
+
+
+def ordinary_answer(analysis):
+    """Ответ, на который не нужна особая реакция интервьюера — заготовку можно отдать"""
+    return analysis is not None and label_from_analysis(analysis) == ESCALATE and not analysis.off_topic
+
+
+def covered_by_answer(question, answer):
+    """Кандидат в ответе уже затронул тему заготовленного вопроса"""
+    terms = {s for s in shingles(extract_question(question)) if s.startswith("w:")}
+    if not terms or not answer:
+        return False
+    return len(terms & shingles(answer)) / len(terms) >= settings.question_dedup_threshold
+
+
+def _consume_error(task):
+    # Ошибка невостребованной заготовки не должна всплывать как "exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+class SpeculativeEngine:
+    """Фоновые задачи-заготовки по session_id с лимитом вызовов на сессию"""
+    
+    def __init__(self, max_sessions=256):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> {"tasks": {key: task}, "asked": int}
+        self._spent = OrderedDict()  # session_id -> запущено заготовок за сессию
+        self.launched = 0
+        self.hits = 0
+        self.misses = 0
+        self.ready_on_hit = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.rejected = 0
+        self.skipped_budget = 0
+    
+    def _touch(self, mapping, session_id, default):
+        value = mapping.setdefault(session_id, default)
+        mapping.move_to_end(session_id)
+        while len(mapping) > self.max_sessions:
+            _, evicted = mapping.popitem(last=False)
+            if mapping is self._sessions:
+                self._cancel(evicted["tasks"].values())
+        return value
+    
+    def _cancel(self, tasks):
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+                self.cancelled += 1
+    
+    def spawn(self, session_id, jobs, asked_count):
+        """jobs: [(RouterDecision, фабрика корутины)] по убыванию вероятности"""
+        self.discard(session_id)
+        spent = self._touch(self._spent, session_id, 0)
+        
+        tasks = {}
+        for decision, factory in jobs[:settings.speculation_max_branches]:
+            if spent >= settings.speculation_max_calls_per_session:
+                self.skipped_budget += 1
+                continue
+            task = create_background_task(factory())
+            task.add_done_callback(_consume_error)
+            tasks[decision_key(decision)] = task
+            spent += 1
+            self.launched += 1
+        
+        self._spent[session_id] = spent
+        if tasks:
+            self._touch(self._sessions, session_id, {"tasks": tasks, "asked": asked_count})
+    
+    async def take(self, session_id, decision, asked_count, answer=""):
+        """Готовый результат Interviewer для решения роутера (None — не подходит ни одна); прочие отменяются"""
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return None
+        
+        task = None
+        if decision is not None and entry["asked"] == asked_count:
+            task = entry["tasks"].pop(decision_key(decision), None)
+        self._cancel(entry["tasks"].values())
+        if task is None:
+            self.misses += 1
+            return None
+        
+        ready = task.done()
+        try:
+            result = await task
+        except Exception as e:
+            print(f"Speculative question error: {e}")
+            self.failed += 1
+            return None
+        if not result.get("current_agent_message"):
+            self.failed += 1
+            return None
+        if covered_by_answer(result["current_agent_message"], answer):
+            self.rejected += 1
+            return None
+        
+        # Счётчики дедупликации и банка вопросов заготовки учитываются, только когда её отдали
+        for apply in result.pop("deferred_effects", ()):
+            apply()
+        self.hits += 1
+        self.ready_on_hit += int(ready)
+        return result
+    
+    def discard(self, session_id):
+        entry = self._sessions.pop(session_id, None)
+        if entry:
+            self._cancel(entry["tasks"].values())
+    
+    def stats(self):
+        decided = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "launched": self.launched,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / decided, 3) if decided else 0.0,
+            "ready_on_hit": self.ready_on_hit,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "skipped_budget": self.skipped_budget,
+        }
+
+
+_engine = None
+
+
+def get_speculative_engine():
+    global _engine
+    if _engine is None:
+        _engine = SpeculativeEngine()
+        register_metrics("speculation", _engine.stats)
+    return _engine
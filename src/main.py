@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import asyncio
 import uuid
 
 import gradio as gr
@@ -8,6 +7,8 @@ from src.config import settings, validate_settings
 from src.models.schemas import CandidateProfile
 from src.graph.interview_graph import create_interview_graph
 from src.utils.logger import InterviewLogger
+from src.utils.llm_pool import llm_registry
+from src.utils.metrics import metrics_snapshot
 
 
 class InterviewApp:
@@ -60,6 +61,31 @@ class InterviewApp:
         finally:
             self.processing.discard(session_id)
     
+    async def process_stream(self, session_id, message):
+        """Потоковая версия process: отдаёт токены реплики, затем итоговое состояние"""
+        state = self.sessions.get(session_id)
+        if not state:
+            raise ValueError(f"Session {session_id} not found")
+        
+        if session_id in self.processing:
+            print(f"Session {session_id} is already processing, skipping")
+            yield "state", state
+            return
+        
+        if state.get("status") == "completed":
+            print(f"Session {session_id} already completed")
+            yield "state", state
+            return
+        
+        try:
+            self.processing.add(session_id)
+            async for kind, payload in self.graph.stream_user_message(state, message):
+                if kind == "state":
+                    self.sessions[session_id] = payload
+                yield kind, payload
+        finally:
+            self.processing.discard(session_id)
+    
     def get_state(self, session_id):
         return self.sessions.get(session_id)
     
@@ -94,6 +120,10 @@ async def start_interview_async(name, position, grade, experience, session_id):
         experience=experience or "Без опыта"
     )
     
+    # Новое интервью в той же вкладке: фоновая работа прежней сессии больше не нужна
+    if session_id:
+        interview_app.graph.end_session(session_id)
+    
     new_session_id = str(uuid.uuid4())[:8]
     
     try:
@@ -110,10 +140,6 @@ async def start_interview_async(name, position, grade, experience, session_id):
         return [], f"Ошибка: {e}", "", "", None
 
 
-def start_interview(name, position, grade, experience, session_id):
-    return asyncio.run(start_interview_async(name, position, grade, experience, session_id))
-
-
 async def send_message_async(message, chat_history, session_id):
     if not session_id:
         return chat_history, "Сначала начните интервью", "", "", session_id
@@ -163,8 +189,63 @@ async def send_message_async(message, chat_history, session_id):
         return chat_history, f"Ошибка: {e}", "", "", session_id
 
 
-def send_message(message, chat_history, session_id):
-    return asyncio.run(send_message_async(message, chat_history, session_id))
+async def send_message_stream(message, chat_history, session_id):
+    """Генератор для Gradio: реплика интервьюера появляется по токенам"""
+    if not session_id:
+        yield chat_history, "Сначала начните интервью", "", "", session_id
+        return
+    
+    if not message.strip():
+        yield chat_history, "Введите сообщение", "", "", session_id
+        return
+    
+    interview_app = get_app()
+    
+    current_state = interview_app.get_state(session_id)
+    if current_state and current_state.get("status") == "completed":
+        yield chat_history, "Интервью уже завершено", interview_app.get_thoughts(session_id), "", session_id
+        return
+    
+    pending = chat_history + [{"role": "user", "content": message}]
+    yield pending, "Думаю...", "", "", session_id
+    
+    try:
+        partial = ""
+        state = None
+        async for kind, payload in interview_app.process_stream(session_id, message):
+            if kind == "token":
+                partial += payload
+                yield pending + [{"role": "assistant", "content": partial}], "Печатает...", "", "", session_id
+            elif kind == "retract":
+                # Вопрос оказался повтором — показанное стираем, дальше печатается новый
+                partial = ""
+                yield pending, "Печатает...", "", "", session_id
+            else:
+                state = payload
+        
+        # Итоговая реплика берётся из состояния — она могла быть заменена после генерации
+        resp = state.get("current_agent_message", "") if state else partial
+        status = state.get("status", "") if state else ""
+        final_feedback = state.get("final_feedback") if state else None
+        
+        chat_history = pending + [{"role": "assistant", "content": resp}]
+        thoughts = interview_app.get_thoughts(session_id)
+        
+        feedback_display = ""
+        if final_feedback:
+            feedback_display = interview_app.format_feedback(final_feedback)
+            if interview_app.logger.current_session_log_path:
+                feedback_display += f"\n\nЛог: {interview_app.logger.current_session_log_path}"
+        
+        status_msg = "Завершено" if status == "completed" else "В процессе"
+        yield chat_history, status_msg, thoughts, feedback_display, session_id
+        
+    except ValueError as e:
+        yield chat_history, str(e), "", "", session_id
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        yield chat_history, f"Ошибка: {e}", "", "", session_id
 
 
 async def stop_interview_async(chat_history, session_id):
@@ -198,9 +279,15 @@ async def stop_interview_async(chat_history, session_id):
         return chat_history, f"Ошибка: {e}", "", "", session_id
 
 
-def stop_interview(chat_history, session_id):
-    return asyncio.run(stop_interview_async(chat_history, session_id))
 
+async def warmup_llm_pool():
+    """Прогрев пула соединений к LLM на event loop Gradio"""
+    if not settings.llm_warmup:
+        return
+    try:
+        await llm_registry.warmup()
+    except Exception as e:
+        print(f"LLM warmup error: {e}")
 
 
 def save_log(session_id):
@@ -262,28 +349,32 @@ def create_ui():
                 
                 gr.Markdown("### Отчёт")
                 feedback_display = gr.Textbox(label="Feedback", lines=20, interactive=False)
+                
+                with gr.Accordion("Метрики", open=False):
+                    metrics_display = gr.JSON(label="Metrics")
+                    metrics_btn = gr.Button("Обновить")
         
         # Обработчики событий
         start_btn.click(
-            fn=start_interview,
+            fn=start_interview_async,
             inputs=[name_input, position_input, grade_dropdown, experience_input, session_state],
             outputs=[chatbot, status_text, thoughts_display, feedback_display, session_state]
         )
         
         send_btn.click(
-            fn=send_message,
+            fn=send_message_stream,
             inputs=[msg_input, chatbot, session_state],
             outputs=[chatbot, status_text, thoughts_display, feedback_display, session_state]
         ).then(fn=lambda: "", outputs=[msg_input])
         
         msg_input.submit(
-            fn=send_message,
+            fn=send_message_stream,
             inputs=[msg_input, chatbot, session_state],
             outputs=[chatbot, status_text, thoughts_display, feedback_display, session_state]
         ).then(fn=lambda: "", outputs=[msg_input])
         
         stop_btn.click(
-            fn=stop_interview,
+            fn=stop_interview_async,
             inputs=[chatbot, session_state],
             outputs=[chatbot, status_text, thoughts_display, feedback_display, session_state]
         )
@@ -294,6 +385,13 @@ def create_ui():
             outputs=[status_text]
         )
         
+        # Доступно и через API (/metrics) для внешнего сбора
+        metrics_btn.click(fn=metrics_snapshot, outputs=[metrics_display], api_name="metrics")
+        
+        # Async-обработчики выполняются на одном event loop Gradio,
+        # поэтому пул соединений к LLM переиспользуется между ходами
+        demo.load(fn=warmup_llm_pool)
+        
         gr.Markdown("""
         ---
         **Подсказки:** Скажите ложное ("Python 4.0 удалит циклы"), задайте вопрос ("Какие задачи?"), уйдите от темы.
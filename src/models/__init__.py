@@ -9,8 +9,10 @@ from .schemas import (
     AnswerAnalysis,
     FactCheckResult,
     EvaluationState,
+    ConversationSummary,
     RouterDecision,
     FinalFeedback,
+    ReportDraft,
     TurnLog,
 )
 
@@ -22,6 +24,9 @@ from .output_schemas import (
     EvaluationOutput,
     QuestionHandlerOutput,
     FinalFeedbackOutput,
+    TopicFindingsOutput,
+    ReportDraftOutput,
+    ReportFinalizeOutput,
 )
 
 __all__ = [
@@ -32,8 +37,10 @@ __all__ = [
     "AnswerAnalysis",
     "FactCheckResult",
     "EvaluationState",
+    "ConversationSummary",
     "RouterDecision",
     "FinalFeedback",
+    "ReportDraft",
     "TurnLog",
     "InterviewPlanOutput",
     "AnswerAnalysisOutput",
@@ -41,4 +48,7 @@ __all__ = [
     "EvaluationOutput",
     "QuestionHandlerOutput",
     "FinalFeedbackOutput",
+    "TopicFindingsOutput",
+    "ReportDraftOutput",
+    "ReportFinalizeOutput",
 ]
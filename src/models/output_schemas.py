@@ -32,6 +32,7 @@ class AnswerAnalysisOutput(BaseModel):
 
 
 class VerifiedFactOutput(BaseModel):
+    index: Optional[int] = Field(default=None, description="Number of the claim in the list")
     claim: str = Field(description="Checked claim")
     confidence: float = Field(ge=0, le=1, description="Confidence")
     source: Optional[str] = Field(default=None, description="Source")
@@ -39,6 +40,7 @@ class VerifiedFactOutput(BaseModel):
 
 
 class FalseFactOutput(BaseModel):
+    index: Optional[int] = Field(default=None, description="Number of the claim in the list")
     claim: str = Field(description="False claim")
     confidence: float = Field(ge=0, le=1, description="Confidence")
     correct_info: str = Field(description="Correct info")
@@ -47,6 +49,7 @@ class FalseFactOutput(BaseModel):
 
 
 class UnverifiedFactOutput(BaseModel):
+    index: Optional[int] = Field(default=None, description="Number of the claim in the list")
     claim: str = Field(description="Unverified claim")
     reason: Literal["web_search_unavailable", "no_source_found", "llm_uncertain"] = Field(description="Reason")
     llm_assessment: Literal["possibly_true", "possibly_false", "unknown"] = Field(default="unknown")
@@ -62,13 +65,11 @@ class FactCheckOutput(BaseModel):
 class SkillConfirmedOutput(BaseModel):
     skill: str = Field(description="Skill name")
     confidence: float = Field(ge=0, le=1, description="Confidence")
-    evidence: list[str] = Field(default_factory=list, description="Evidence")
 
 
 class SkillGapOutput(BaseModel):
     skill: str = Field(description="Skill")
     severity: Literal["low", "medium", "high"] = Field(description="Severity")
-    failed_at: str = Field(description="Turn ID")
 
 
 class SoftSkillsOutput(BaseModel):
@@ -78,11 +79,13 @@ class SoftSkillsOutput(BaseModel):
 
 
 class EvaluationOutput(BaseModel):
-    skills_confirmed: list[SkillConfirmedOutput] = Field(default_factory=list, description="Confirmed")
-    skills_gaps: list[SkillGapOutput] = Field(default_factory=list, description="Gaps")
-    soft_skills: SoftSkillsOutput = Field(description="Soft skills")
-    hallucinations_detected: int = Field(default=0, ge=0, description="Hallucinations count")
-    off_topic_attempts: int = Field(default=0, ge=0, description="Off-topic count")
+    """Изменения оценки по последнему ответу — применяются в EvaluatorAgent._merge"""
+    skills_confirmed: list[SkillConfirmedOutput] = Field(
+        default_factory=list, description="Skills confirmed or strengthened by this answer only"
+    )
+    skills_gaps: list[SkillGapOutput] = Field(default_factory=list, description="New gaps shown by this answer")
+    resolved_gaps: list[str] = Field(default_factory=list, description="Existing gaps this answer closed")
+    soft_skills: SoftSkillsOutput = Field(description="Soft skills in this answer")
     current_grade_estimate: Literal[
         "Junior", "Junior+", "Middle-", "Middle", "Middle+", "Senior-", "Senior"
     ] = Field(description="Grade estimate")
@@ -90,6 +93,15 @@ class EvaluationOutput(BaseModel):
     reasoning: str = Field(default="", description="Reasoning")
 
 
+class QuestionReviewOutput(BaseModel):
+    """Ревью вопроса перед записью в банк"""
+    on_topic: bool = Field(description="Question is about the topic")
+    fits_level: bool = Field(description="Matches grade and difficulty")
+    self_contained: bool = Field(description="Understandable without previous dialogue")
+    correct: bool = Field(description="No factual errors or false premises")
+    reason: str = Field(default="", description="Why the question is rejected")
+
+
 class QuestionHandlerOutput(BaseModel):
     question_detected: str = Field(description="Detected question")
     response: str = Field(description="Response")
@@ -119,8 +131,38 @@ class RoadmapItemOutput(BaseModel):
     resources: list[str] = Field(default_factory=list, description="Resources")
 
 
+class RoadmapOutput(BaseModel):
+    roadmap: list[RoadmapItemOutput] = Field(default_factory=list, description="Roadmap")
+
+
 class FinalFeedbackOutput(BaseModel):
     decision: DecisionOutput = Field(description="Decision")
     technical_review: TechnicalReviewOutput = Field(description="Technical review")
     soft_skills: SoftSkillsOutput = Field(description="Soft skills")
     roadmap: list[RoadmapItemOutput] = Field(default_factory=list, description="Roadmap")
+
+
+class TopicFindingsOutput(BaseModel):
+    """Выжимка по куску транскрипта одной темы (map-шаг отчёта)"""
+    confirmed_skills: list[str] = Field(default_factory=list, description="Skills shown in this chunk")
+    knowledge_gaps: list[KnowledgeGapOutput] = Field(default_factory=list, description="Gaps with correct answers")
+    soft_skills_notes: str = Field(default="", description="Clarity, honesty, engagement observations")
+    summary: str = Field(default="", description="Short summary of the candidate's answers")
+
+
+class GapRoadmapItemOutput(RoadmapItemOutput):
+    """Пункт roadmap с пробелом, который он закрывает — по нему пункт уходит вместе с пробелом"""
+    gap: str = Field(description="Gap name exactly as in the list")
+
+
+class ReportDraftOutput(BaseModel):
+    """Правильные ответы и roadmap только для новых пробелов хода"""
+    knowledge_gaps: list[KnowledgeGapOutput] = Field(default_factory=list, description="Gaps with correct answers")
+    roadmap: list[GapRoadmapItemOutput] = Field(default_factory=list, description="Roadmap items for these gaps")
+
+
+class ReportFinalizeOutput(BaseModel):
+    """Финализация черновика: вердикт + недостающие пробелы последних ходов"""
+    decision: DecisionOutput = Field(description="Decision")
+    knowledge_gaps: list[KnowledgeGapOutput] = Field(default_factory=list, description="Correct answers for listed gaps")
+    roadmap: list[GapRoadmapItemOutput] = Field(default_factory=list, description="Roadmap items for listed gaps")
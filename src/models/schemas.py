@@ -46,7 +46,7 @@ class VerifiedFact(BaseModel):
     claim: str
     confidence: float = Field(ge=0, le=1)
     source: Optional[str] = None
-    verification_method: Literal["web_search", "llm_confident"] = "web_search"
+    verification_method: Literal["web_search", "llm_confident", "local_rules"] = "web_search"
 
 
 class FalseFact(BaseModel):
@@ -54,7 +54,7 @@ class FalseFact(BaseModel):
     confidence: float = Field(ge=0, le=1)
     correct_info: str
     source: Optional[str] = None
-    verification_method: Literal["web_search", "llm_confident"] = "web_search"
+    verification_method: Literal["web_search", "llm_confident", "local_rules"] = "web_search"
 
 
 class UnverifiedFact(BaseModel):
@@ -100,6 +100,14 @@ class EvaluationState(BaseModel):
     confidence_history: list[float] = Field(default_factory=list)  # История уверенности по ходам
 
 
+class ConversationSummary(BaseModel):
+    """Сжатая история диалога старше окна последних реплик"""
+    covered: int = 0  # сколько записей conversation_history уже сжато
+    lines: list[str] = Field(default_factory=list)  # по строке на реплику, самые старые уходят в terms
+    terms: dict[str, int] = Field(default_factory=dict)  # ключевые термины вытесненных строк
+    folded: int = 0  # сколько строк свернуто в terms
+
+
 class RouterDecision(BaseModel):
     next_topic: Optional[str] = None
     difficulty: Literal["easy", "medium", "hard"] = "medium"
@@ -145,6 +153,16 @@ class FinalFeedback(BaseModel):
     confidence_trend: str = ""  # "↗ растёт", "↘ падает", "→ стабильно"
 
 
+class ReportDraft(BaseModel):
+    """Черновик отчёта, обновляемый в фоне после каждого оценённого хода"""
+    confirmed_skills: list[str] = Field(default_factory=list)
+    knowledge_gaps: list[KnowledgeGap] = Field(default_factory=list)  # пробелы с правильными ответами
+    roadmap: dict[str, list[RoadmapItem]] = Field(default_factory=dict)  # ключ пробела -> его пункты roadmap
+    evaluation_key: str = ""  # отпечаток оценки, по которой собран черновик
+    final: Optional[FinalFeedback] = None  # предфинальный отчёт для evaluation_key
+    updates: int = 0
+
+
 class Message(BaseModel):
     role: Literal["interviewer", "candidate"]
     content: str
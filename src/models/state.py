@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 from typing import TypedDict, Annotated, Optional, Literal
-from operator import add
 from langgraph.graph.message import add_messages
 
 from .schemas import (
@@ -9,8 +8,10 @@ from .schemas import (
     AnswerAnalysis,
     FactCheckResult,
     EvaluationState,
+    ConversationSummary,
     RouterDecision,
     FinalFeedback,
+    ReportDraft,
     TurnLog,
     InternalThoughts,
     Message,
@@ -23,6 +24,24 @@ def merge_evaluation(current, new):
 def merge_plan(current, new):
     return new if new is not None else current
 
+def merge_turn_logs(current, new):
+    """Новые логи дописываются; лог с уже известным turn_id заменяет прежний (дописанная оценка)"""
+    logs = list(current or [])
+    index = {log.turn_id: i for i, log in enumerate(logs)}
+    for log in new or []:
+        if log.turn_id in index:
+            logs[index[log.turn_id]] = log
+        else:
+            index[log.turn_id] = len(logs)
+            logs.append(log)
+    return logs
+
+def merge_thoughts(current, new):
+    """Мысли параллельных веток сливаются по ключам; None очищает"""
+    if new is None:
+        return {}
+    return {**(current or {}), **new}
+
 
 class InterviewState(TypedDict, total=False):
     session_id: str
@@ -30,6 +49,7 @@ class InterviewState(TypedDict, total=False):
     interview_plan: Annotated[Optional[InterviewPlan], merge_plan]
     messages: Annotated[list[Message], add_messages]
     conversation_history: list[dict]
+    conversation_summary: Optional[ConversationSummary]  # Сжатая история старше окна
     
     current_turn_id: int
     current_user_message: Optional[str]
@@ -42,12 +62,14 @@ class InterviewState(TypedDict, total=False):
     router_decision: Optional[RouterDecision]
     question_handler_response: Optional[str]
     internal_thoughts: Optional[InternalThoughts]
+    branch_thoughts: Annotated[Optional[dict], merge_thoughts]  # Мысли параллельных веток до join
     last_thoughts: Optional[dict]
     
     status: Literal["initializing", "in_progress", "ending", "completed"]
     stop_requested: bool
     final_feedback: Optional[FinalFeedback]
-    turn_logs: Annotated[list[TurnLog], add]
+    report_draft: Optional[ReportDraft]  # Черновик отчёта на момент финализации
+    turn_logs: Annotated[list[TurnLog], merge_turn_logs]
     last_error: Optional[str]
     asked_questions: list[str]  # Для дедупликации вопросов
 
@@ -60,6 +82,7 @@ def create_initial_state(session_id, candidate_profile):
         interview_plan=None,
         messages=[],
         conversation_history=[],
+        conversation_summary=None,
         current_turn_id=1,
         current_user_message=None,
         current_agent_message=None,
@@ -70,10 +93,12 @@ def create_initial_state(session_id, candidate_profile):
         router_decision=None,
         question_handler_response=None,
         internal_thoughts=None,
+        branch_thoughts=None,
         last_thoughts=None,
         status="initializing",
         stop_requested=False,
         final_feedback=None,
+        report_draft=None,
         turn_logs=[],
         last_error=None,
         asked_questions=[],
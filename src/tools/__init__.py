@@ -1,5 +1,10 @@
 """Tools for the Interview Coach system."""
 
 from .web_search import WebSearchTool, SearchResult
+from .local_search import LocalKnowledgeBaseProvider
+from .fact_store import FactVerdictStore, normalize_claim
+from .fact_rules import FactRuleEngine
+from .answer_classifier import AnswerClassifier
 
-__all__ = ["WebSearchTool", "SearchResult"]
+__all__ = ["WebSearchTool", "SearchResult", "LocalKnowledgeBaseProvider",
+           "FactVerdictStore", "normalize_claim", "FactRuleEngine", "AnswerClassifier"]
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""Быстрый локальный классификатор сообщений кандидата перед AnswerAnalyzer
+
+Лексические признаки -> логистическая оценка по каждой метке. Веса лежат на диске
+(src/data/answer_classifier.json); пока калибровки там нет, уверенность — сырая
+логистическая оценка. Очевидные случаи ("не знаю", чистый вопрос, болтовня не по теме)
+решаются без LLM, остальное эскалируется. Стоп распознаётся отдельно и только как
+команда, а не по весам. Каждое решение пишется в JSONL-лог, по которому подбирается
+Platt-калибровка (по меткам LLM):
+
+    python -m src.tools.answer_classifier calibrate [log_path]
+"""
+
+import json
+import math
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from src.config import settings
+from src.models.schemas import AnswerAnalysis
+from src.tools.local_search import tokenize
+from src.utils.metrics import register_metrics
+
+
+DEFAULT_MODEL_PATH = Path(__file__).resolve().parent.parent / "data" / "answer_classifier.json"
+
+ANSWER_LABELS = ("dont_know", "question", "off_topic")
+LABELS = ANSWER_LABELS + ("stop",)  # стоп ловится раньше, в prepare_turn, правилами detect_stop
+ESCALATE = "answer"
+# Отрицание перед стоп-фразой: "не хочу завершать интервью", "don't end the interview"
+_STOP_NEGATIONS = {"не", "нет", "not", "don", "dont", "never"}
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_LATIN_RE = re.compile(r"[a-z][a-z0-9_+#]*")
+_CODE_RE = re.compile(r"\w[(){}\[\]=<>_.:]+\w|[(){}\[\]=<>]")
+_SENTENCE_RE = re.compile(r"[.!?…]+\s+(?=\S)")
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, x))))
+
+
+def _text(message):
+    return " ".join((message or "").casefold().replace("ё", "е").split())
+
+
+@dataclass
+class Decision:
+    label: str  # одна из LABELS или "answer" (нужна LLM)
+    confidence: float
+    scores: dict = field(default_factory=dict)  # сырые логиты по меткам — для калибровки
+    words: int = 0
+    
+    @property
+    def local(self):
+        return self.label != ESCALATE
+
+
+class AnswerClassifier:
+    """Логистическая модель поверх лексических признаков; уверенность калибруется, если есть калибровка"""
+    
+    def __init__(self, path=None, threshold=None, log_path=None):
+        self.path = Path(path or settings.answer_classifier_path or DEFAULT_MODEL_PATH)
+        model = json.loads(self.path.read_text(encoding="utf-8"))
+        self.version = model["version"]
+        self.lexicons = model["lexicons"]
+        self.weights = model["weights"]
+        self.calibration = model.get("calibration") or {}  # пусто — без калибровки
+        self.threshold = settings.answer_classifier_threshold if threshold is None else threshold
+        log_path = settings.answer_classifier_log_path if log_path is None else log_path
+        self.log_path = Path(log_path) if log_path else None
+        
+        self._patterns = {
+            name: self._compile(words, prefix=(name == "off_topic"))
+            for name, words in self.lexicons.items()
+        }
+        self._stop_commands = set(self.lexicons["stop_commands"])
+        self._stop_fillers = set(self.lexicons["stop_fillers"])
+        self._lexicon_latin = {
+            w for words in self.lexicons.values() for phrase in words for w in _LATIN_RE.findall(phrase)
+        }
+        
+        self.counts = {label: 0 for label in LABELS + (ESCALATE,)}
+        self.shadowed = 0
+        self.agreed = 0
+    
+    @staticmethod
+    def _compile(words, prefix=False):
+        # Стемы тематической болтовни — по префиксу, фразы — целиком
+        tail = "" if prefix else r"(?!\w)"
+        alternatives = "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+        return re.compile(r"(?<!\w)(?:%s)%s" % (alternatives, tail))
+    
+    def features(self, message, context=""):
+        text = _text(message)
+        words = _WORD_RE.findall(text)
+        first = words[0] if words else ""
+        
+        latin = [w for w in _LATIN_RE.findall(text) if w not in self._lexicon_latin]
+        content = set(tokenize(text))
+        context_terms = set(tokenize(context)) if context else set()
+        
+        return {
+            "empty": float(not words),
+            "short": float(len(words) <= 6),
+            "long": float(len(words) > 25),
+            "dk_phrase": float(bool(self._patterns["dont_know"].search(text))),
+            "qmark_end": float(text.rstrip(" )").endswith("?")),
+            "qword_start": float(first in self.lexicons["question_words"]),
+            "q_phrase": float(bool(self._patterns["question"].search(text))),
+            "multi_sentence": float(len(_SENTENCE_RE.split(text)) > 1),
+            "chatter": float(bool(self._patterns["off_topic"].search(text))),
+            "no_overlap": float(bool(context_terms) and not (content & context_terms)),
+            "tech_terms": float(bool(latin or _CODE_RE.search(text))),
+        }, len(words)
+    
+    def classify(self, message, context="", labels=ANSWER_LABELS):
+        feats, n_words = self.features(message, context)
+        scores, probs = {}, {}
+        for label in labels:
+            w = self.weights[label]
+            scores[label] = w.get("bias", 0.0) + sum(w.get(f, 0.0) * v for f, v in feats.items())
+            cal = self.calibration.get(label, {"a": 1.0, "b": 0.0})
+            probs[label] = _sigmoid(cal["a"] * scores[label] + cal["b"])
+        
+        best = max(probs, key=probs.get)
+        # Две уверенные метки сразу — случай неочевидный, отдаём LLM
+        runner_up = max((p for l, p in probs.items() if l != best), default=0.0)
+        if probs[best] < self.threshold or runner_up >= 0.5:
+            label = ESCALATE
+        else:
+            label = best
+        return Decision(label=label, confidence=round(probs[best], 3),
+                        scores={l: round(s, 3) for l, s in scores.items()}, words=n_words)
+    
+    def detect_stop(self, message):
+        """Просьба завершить интервью (проверяется до анализа ответа).
+        
+        Стоп — только если всё сообщение, кроме вежливых слов, является стоп-командой
+        ("Стоп", "Давайте завершим интервью") или в нём есть явная фраза про интервью без
+        отрицания. "Памяти не хватит" и "хочу закончить мысль" — обычные ответы.
+        """
+        text = _text(message)
+        words = [w for w in _WORD_RE.findall(text) if w not in self._stop_fillers]
+        if " ".join(words) not in self._stop_commands and not self._explicit_stop(text):
+            return False
+        self.counts["stop"] += 1
+        self.log(Decision(label="stop", confidence=1.0, words=len(words)), stage="stop")
+        return True
+    
+    def _explicit_stop(self, text):
+        for match in self._patterns["stop_phrases"].finditer(text):
+            before = _WORD_RE.findall(text[:match.start()])[-2:]
+            if not _STOP_NEGATIONS & set(before):
+                return True
+        return False
+    
+    def should_shadow(self):
+        """Доля локальных решений, которые всё равно идут в LLM — для замера точности и калибровки"""
+        return random.random() < settings.answer_classifier_shadow_rate
+    
+    def record(self, decision, llm_label=None, shadow=False):
+        self.counts[decision.label if not shadow else ESCALATE] += 1
+        if shadow:
+            self.shadowed += 1
+            self.agreed += int(llm_label == decision.label)
+        self.log(decision, llm_label=llm_label, shadow=shadow)
+    
+    def log(self, decision, llm_label=None, shadow=False, stage="analyze"):
+        if not self.log_path:
+            return
+        record = {
+            "ts": round(time.time(), 3),
+            "model_version": self.version,
+            "stage": stage,
+            "label": decision.label,
+            "confidence": decision.confidence,
+            "scores": decision.scores,
+            "words": decision.words,
+            "local": decision.local and not shadow,
+            "shadow": shadow,
+            "llm_label": llm_label,
+        }
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.log_path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"Answer classifier log error: {e}")
+    
+    def build_analysis(self, decision, message):
+        """AnswerAnalysis для решённого локально сообщения"""
+        reasoning = f"Локальный классификатор: {decision.label} ({decision.confidence:.0%})"
+        if decision.label == "question":
+            return AnswerAnalysis(
+                quality="partial", confidence_detected=0.5, completeness=0.0,
+                candidate_asked_question=True, candidate_question=message.strip(),
+                reasoning=reasoning
+            )
+        if decision.label == "off_topic":
+            return AnswerAnalysis(
+                quality="poor", confidence_detected=0.5, completeness=0.0,
+                off_topic=True, reasoning=reasoning
+            )
+        return AnswerAnalysis(
+            quality="poor", confidence_detected=0.1, completeness=0.0, reasoning=reasoning
+        )
+    
+    def stats(self):
+        local = sum(self.counts[l] for l in ANSWER_LABELS)
+        total = local + self.counts[ESCALATE]
+        return {
+            "model_version": self.version,
+            "decisions": dict(self.counts),
+            "llm_calls_saved": local,
+            "local_rate": round(local / total, 3) if total else 0.0,
+            "shadow_checked": self.shadowed,
+            "shadow_agreement": round(self.agreed / self.shadowed, 3) if self.shadowed else None,
+            "calibrated": sorted(self.calibration),
+        }
+
+
+def label_from_analysis(analysis):
+    """Метка, которую фактически поставил LLM-анализ (для лога и калибровки)"""
+    if analysis.off_topic:
+        return "off_topic"
+    if analysis.candidate_asked_question and analysis.completeness < 0.3:
+        return "question"
+    if analysis.quality == "poor" and analysis.completeness < 0.2:
+        return "dont_know"
+    return ESCALATE
+
+
+def fit_platt(pairs, iterations=2000, lr=0.05):
+    """Platt scaling: p = sigmoid(a * score + b) по парам (score, is_label)"""
+    a, b = 1.0, 0.0
+    for _ in range(iterations):
+        grad_a = grad_b = 0.0
+        for score, y in pairs:
+            err = _sigmoid(a * score + b) - y
+            grad_a += err * score
+            grad_b += err
+        a -= lr * grad_a / len(pairs)
+        b -= lr * grad_b / len(pairs)
+    return {"a": round(a, 4), "b": round(b, 4)}
+
+
+def calibrate(log_path, model_path, min_samples=30):
+    """Пересчитывает калибровку по решениям, для которых известна метка LLM"""
+    records = []
+    for line in Path(log_path).read_text(encoding="utf-8").splitlines():
+        record = json.loads(line)
+        if record.get("llm_label"):
+            records.append(record)
+    
+    model = json.loads(Path(model_path).read_text(encoding="utf-8"))
+    model.setdefault("calibration", {})
+    for label in ANSWER_LABELS:
+        pairs = [(r["scores"][label], float(r["llm_label"] == label)) for r in records if label in r["scores"]]
+        if len(pairs) < min_samples or len({y for _, y in pairs}) < 2:
+            print(f"{label}: недостаточно данных ({len(pairs)}), калибровка не изменена")
+            continue
+        model["calibration"][label] = fit_platt(pairs)
+        print(f"{label}: {len(pairs)} примеров -> {model['calibration'][label]}")
+    
+    Path(model_path).write_text(json.dumps(model, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+_classifier = None
+
+
+def get_answer_classifier():
+    global _classifier
+    if _classifier is None:
+        _classifier = AnswerClassifier()
+        register_metrics("answer_classifier", _classifier.stats)
+    return _classifier
+
+
+if __name__ == "__main__":
+    # python -m src.tools.answer_classifier calibrate [log_path]
+    # python -m src.tools.answer_classifier "не знаю" "Что такое GIL?" — классифицировать сообщения
+    import sys
+    
+    if sys.argv[1:2] == ["calibrate"]:
+        log = sys.argv[2] if len(sys.argv) > 2 else settings.answer_classifier_log_path
+        calibrate(log, settings.answer_classifier_path or DEFAULT_MODEL_PATH)
+    else:
+        clf = AnswerClassifier(log_path="")
+        for message in sys.argv[1:]:
+            d = clf.classify(message)
+            print(f"{message!r}: {d.label} ({d.confidence}) {d.scores}")
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Скользящее резюме диалога без LLM
+
+Последние settings.summary_window_messages реплик агенты видят как есть,
+более старые сжимаются экстрактивно (вопрос интервьюера, самые содержательные
+предложения ответа) в строку, а вытесненные из резюме строки сворачиваются
+в счётчик ключевых терминов. Размер контекста не растёт с длиной интервью.
+"""
+
+import re
+from collections import Counter
+
+from src.config import settings
+from src.models.schemas import ConversationSummary
+from src.tools.local_search import tokenize, STOPWORDS
+from src.tools.question_index import extract_question
+
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+_TERM_RE = re.compile(r"[a-zа-я][a-zа-я0-9+#._/\-]*[a-zа-я0-9+#]", re.UNICODE)
+_TECH_RE = re.compile(r"[a-z0-9_+#()\[\]{}=<>]")
+
+# Частые слова реплик, не несущие темы
+_GENERIC = set(STOPWORDS) | {
+    "было", "были", "будет", "можно", "нужно", "очень", "если", "когда", "который", "которые", "также",
+    "тоже", "потому", "чтобы", "тогда", "просто", "здесь", "сейчас", "ещё", "еще", "всего", "этого",
+    "этом", "свой", "своей", "меня", "мной", "тебя", "вами", "давай", "расскажи", "расскажите", "вопрос",
+    "ответ", "думаю", "знаю", "например", "хорошо", "отлично", "спасибо", "работает", "работал",
+    "такое", "такой", "такие", "поэтому", "влияет", "берут", "бывает", "стоит", "лучше", "больше",
+}
+
+
+def _role(entry):
+    return "И" if entry.get("role") == "interviewer" else "К"
+
+
+def _clip(text, chars):
+    text = " ".join((text or "").split())
+    if len(text) <= chars:
+        return text
+    cut = text[:chars].rsplit(" ", 1)[0]
+    return (cut or text[:chars]) + "…"
+
+
+def _sentence_score(sentence):
+    # Содержательность: число разных значимых стемов + бонус за технические термины
+    return len(set(tokenize(sentence))) + 2 * bool(_TECH_RE.search(sentence.casefold()))
+
+
+def compress_answer(text, chars):
+    """Самые содержательные предложения ответа в исходном порядке в пределах chars"""
+    sentences = [s.strip() for s in _SENTENCE_RE.split(" ".join((text or "").split())) if s.strip()]
+    if not sentences:
+        return ""
+    ranked = sorted(range(len(sentences)), key=lambda i: _sentence_score(sentences[i]), reverse=True)
+    chosen, used = [], 0
+    for i in ranked:
+        if used + len(sentences[i]) > chars:
+            continue
+        chosen.append(i)
+        used += len(sentences[i]) + 1
+    if not chosen:
+        return _clip(sentences[ranked[0]], chars)
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+def compress_entry(entry, chars=None):
+    chars = chars or settings.summary_line_chars
+    content = entry.get("content", "")
+    if entry.get("role") == "interviewer":
+        text = _clip(extract_question(content) or content, chars)
+    else:
+        text = compress_answer(content, chars)
+    return f"[{_role(entry)}] {text}"
+
+
+def _terms(line):
+    words = _TERM_RE.findall(line.casefold().replace("ё", "е"))
+    terms = [w for w in words if w not in _GENERIC and (len(w) >= 4 or not w.isalpha())]
+    # Технические термины (латиница, цифры) весомее русских слов
+    return terms + [w for w in terms if _TECH_RE.search(w)]
+
+
+def update_summary(summary, history, window=None):
+    """Новое резюме: дожимает записи, вышедшие за окно; старые строки сворачивает в термины"""
+    window = settings.summary_window_messages if window is None else window
+    summary = summary or ConversationSummary()
+    if summary.covered > len(history):
+        summary = ConversationSummary()
+    
+    boundary = len(history) - window
+    if boundary <= summary.covered:
+        return summary
+    
+    lines = summary.lines + [compress_entry(e) for e in history[summary.covered:boundary]]
+    terms = Counter(summary.terms)
+    folded = summary.folded
+    while len(lines) > settings.summary_max_lines:
+        terms.update(_terms(lines.pop(0)))
+        folded += 1
+    
+    # Держим вдвое больше терминов, чем показываем, — редкие вытесняются
+    kept = dict(terms.most_common(settings.summary_max_terms * 2))
+    return ConversationSummary(covered=boundary, lines=lines, terms=kept, folded=folded)
+
+
+def render_summary(summary):
+    if not summary or not (summary.lines or summary.terms):
+        return ""
+    parts = []
+    if summary.terms:
+        top = [t for t, _ in Counter(summary.terms).most_common(settings.summary_max_terms)]
+        parts.append(f"Ранее обсуждалось ({summary.folded} реплик): {', '.join(top)}")
+    if summary.lines:
+        parts.append("Кратко:\n" + "\n".join(summary.lines))
+    return "\n".join(parts)
+
+
+def render_context(summary, history, window=None):
+    """Резюме + последние реплики как есть (обрезанные до summary_message_chars)"""
+    # Резюме из состояния могло отстать на реплики текущего хода — догоняем без LLM
+    summary = update_summary(summary, history, window)
+    lines = []
+    for entry in history[summary.covered:]:
+        role = "Интервьюер" if entry.get("role") == "interviewer" else "Кандидат"
+        lines.append(f"{role}: {_clip(entry.get('content', ''), settings.summary_message_chars)}")
+    
+    head = render_summary(summary)
+    if head and lines:
+        return f"{head}\n\nПоследние реплики:\n" + "\n".join(lines)
+    return head or "\n".join(lines)
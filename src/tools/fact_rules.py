@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""Локальная предпроверка утверждений по таблице известных фактов (src/data/known_facts.json)
+
+Решает очевидные случаи без поиска и LLM: несуществующие версии языков,
+годы релизов известных инструментов, сложность стандартных операций.
+Всё, в чём правила не уверены, возвращается как None и уходит в обычную проверку.
+Составное утверждение ("X вышел в 2024 и убрал GIL") подтверждается, только если
+правила покрывают каждую его часть; ложная часть делает ложным всё утверждение.
+"""
+
+import json
+import re
+from datetime import date
+from pathlib import Path
+
+from src.config import settings
+from src.utils.metrics import register_metrics
+
+
+DEFAULT_FACTS_PATH = Path(__file__).resolve().parent.parent / "data" / "known_facts.json"
+
+# Отрицания и оговорки: правила не разбирают смысл, такие утверждения отдаём LLM
+_HEDGE_RE = re.compile(
+    r"(?<!\w)(не|нет|никогда|вряд|возможно|может|вероятно|планир\w*|слух\w*|"
+    r"not|no|never|maybe|might|may|probably|plan\w*|rumou?r\w*)(?!\w)|n't"
+)
+_CLAUSE_RE = re.compile(r"[,;:()—]|\s-\s|(?<!\d)\.(?!\d)")
+# Границы частей составного утверждения
+_CONJUNCTION_RE = re.compile(
+    r"[,;]|(?<!\w)(?:и|а также|а|но|однако|причем|плюс|and|but|also|while|plus)(?!\w)"
+)
+_YEAR_RE = re.compile(r"(?<!\d)(19[5-9]\d|20\d\d)(?!\d)")
+_RELEASE_RE = re.compile(
+    r"(?<!\w)(вышел|вышл|вышед|выпущ|выпуст|релиз|появил|создан|представлен|впервые|"
+    r"release|created|introduced|appeared|launched|first)"
+)
+_COMPLEXITY_RE = re.compile(r"(?<!\w)[oо]\(([^()]*(?:\([^()]*\)[^()]*)*)\)")
+_WORDS_COMPLEXITY = [
+    ("1", ("константн", "constant time", "за постоянное")),
+    ("logn", ("логарифмич", "logarithmic")),
+    ("nlogn", ("линейно-логарифм", "linearithmic")),
+    ("n", ("линейн", "linear time")),
+    ("n^2", ("квадратич", "quadratic")),
+]
+_WORST_RE = re.compile(r"(?<!\w)(худш\w*|worst)")
+_AVERAGE_RE = re.compile(r"(?<!\w)(средн\w*|average|амортиз\w*|amortized)")
+
+
+def _text(claim):
+    return " ".join(claim.casefold().replace("ё", "е").split())
+
+
+def _has_prefix(text, keyword):
+    return re.search(r"(?<!\w)" + re.escape(keyword), text) is not None
+
+
+def _has_word(text, word):
+    return re.search(r"(?<!\w)%s(?!\w)" % re.escape(word), text) is not None
+
+
+def _version_tuple(version):
+    return tuple(int(p) for p in version.split("."))
+
+
+def normalize_complexity(expr):
+    """'n * log(n)' -> 'nlogn', 'N²' -> 'n^2'"""
+    expr = expr.casefold().replace("²", "^2").replace("·", "").replace("*", "")
+    expr = re.sub(r"log\s*_?\d*\s*\(\s*n\s*\)", "logn", expr)
+    expr = re.sub(r"log\s*_?\d*\s*n", "logn", expr)
+    return re.sub(r"\s+", "", expr)
+
+
+def _fmt_complexity(norm):
+    return "O(" + norm.replace("nlogn", "n log n").replace("logn", "log n") + ")"
+
+
+class FactRuleEngine:
+    """Правила поверх версионированной таблицы фактов. check() -> вердикт (dict) или None"""
+    
+    def __init__(self, path=None):
+        self.path = Path(path or settings.known_facts_path or DEFAULT_FACTS_PATH)
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        self.version = data["version"]
+        self.as_of = date.fromisoformat(data["as_of"])
+        self.languages = data.get("languages", {})
+        self.tools = data.get("tools", {})
+        self.complexity = data.get("complexity", [])
+        self.source = f"known_facts v{self.version}"
+        self.resolved = 0
+        self.passed = 0
+    
+    def check(self, claim):
+        text = _text(claim)
+        verdict = None
+        if not _HEDGE_RE.search(text):
+            verdict = self._check_parts(text)
+        
+        if verdict and verdict["confidence"] >= settings.fact_rules_min_confidence:
+            self.resolved += 1
+            return {**verdict, "source": self.source}
+        self.passed += 1
+        return None
+    
+    def _check_one(self, text):
+        return self._check_version(text) or self._check_release_year(text) or self._check_complexity(text)
+    
+    def _check_parts(self, text):
+        """Вердикт по всему утверждению: непокрытая правилами часть отправляет его в обычную проверку"""
+        parts = [p for p in _CONJUNCTION_RE.split(text) if re.search(r"\w\w", p)]
+        if len(parts) <= 1:
+            return self._check_one(text)
+        
+        verdicts = [self._check_one(p) for p in parts]
+        false = [v for v in verdicts if v and v["status"] == "verified_false"]
+        if false:
+            return max(false, key=lambda v: v["confidence"])
+        if all(verdicts):
+            return min(verdicts, key=lambda v: v["confidence"])
+        return None
+    
+    # --- версии языков -------------------------------------------------------
+    
+    def _mentioned_version(self, text, aliases):
+        # "Python 3.12.1" -> "3.12"
+        pattern = r"(?<!\w)(?:%s)\s*v?(\d+(?:\.\d+)?)(?:\.\d+)?(?!\d)" % "|".join(re.escape(a) for a in aliases)
+        match = re.search(pattern, text)
+        return match.group(1) if match else None
+    
+    def _max_plausible(self, lang):
+        """Самая новая версия, которая могла выйти с момента составления таблицы"""
+        latest = _version_tuple(lang["latest"])
+        months = max(0, (date.today() - self.as_of).days // 30)
+        extra = months * lang["releases_per_year"] // 12 + 1
+        if lang["bumps"] == "major":
+            return (latest[0] + extra,)
+        return (latest[0], latest[1] + extra)
+    
+    def _check_version(self, text):
+        for name, lang in self.languages.items():
+            version = self._mentioned_version(text, lang["aliases"])
+            if not version:
+                continue
+            claimed = _version_tuple(version)
+            latest = _version_tuple(lang["latest"])
+            
+            if lang["bumps"] == "minor":
+                # Регулярные релизы меняют только minor — новый major без анонса не появится
+                nonexistent = claimed[0] > latest[0] or (
+                    claimed[0] == latest[0] and claimed[:2] > self._max_plausible(lang)
+                )
+            else:
+                nonexistent = claimed[:1] > self._max_plausible(lang)
+            if nonexistent:
+                return {
+                    "status": "verified_false",
+                    "confidence": 0.97,
+                    "correct_info": f"{name} {version} не существует: последняя известная версия — "
+                                    f"{name} {lang['latest']} (данные на {self.as_of.isoformat()})",
+                }
+            
+            year = self._release_year_claim(text, lang["aliases"])
+            released = lang.get("released", {}).get(version)
+            if year and released:
+                return self._year_verdict(f"{name} {version}", year, [released])
+            return None
+        return None
+    
+    # --- годы релизов --------------------------------------------------------
+    
+    def _release_year_claim(self, text, aliases):
+        """Год из фразы "<X> вышел в <год>": упоминание, глагол релиза и год в одной клаузе"""
+        years = set()
+        for clause in _CLAUSE_RE.split(text):
+            if _RELEASE_RE.search(clause) and any(_has_word(clause, a) for a in aliases):
+                years.update(_YEAR_RE.findall(clause))
+        return int(years.pop()) if len(years) == 1 else None
+    
+    def _year_verdict(self, name, year, accepted):
+        if year in accepted:
+            return {"status": "verified_true", "confidence": 0.95}
+        # ±1 год — расхождение анонса и релиза, не решаем
+        if min(abs(year - y) for y in accepted) <= 1:
+            return None
+        return {
+            "status": "verified_false",
+            "confidence": 0.93,
+            "correct_info": f"{name} выпущен в {' / '.join(str(y) for y in accepted)}, а не в {year}",
+        }
+    
+    def _check_release_year(self, text):
+        if not _YEAR_RE.search(text):
+            return None
+        mentioned = [(name, tool) for name, tool in self.tools.items()
+                     if any(_has_word(text, a) for a in tool["aliases"])]
+        if len(mentioned) != 1:
+            return None
+        name, tool = mentioned[0]
+        # Год конкретной версии — это не год первого релиза (решается в _check_version)
+        if self._mentioned_version(text, tool["aliases"]):
+            return None
+        year = self._release_year_claim(text, tool["aliases"])
+        return self._year_verdict(name, year, tool["first_release"]) if year else None
+    
+    # --- сложность операций --------------------------------------------------
+    
+    def _claimed_complexity(self, text):
+        found = {normalize_complexity(m) for m in _COMPLEXITY_RE.findall(text)}
+        for norm, words in _WORDS_COMPLEXITY:
+            if any(_has_prefix(text, w) for w in words):
+                found.add(norm)
+        # "nlogn" содержит и "логарифм", и "линейн" — оставляем более точное
+        if "nlogn" in found:
+            found -= {"n", "logn"}
+        return found.pop() if len(found) == 1 else None
+    
+    def _check_complexity(self, text):
+        claimed = self._claimed_complexity(text)
+        if not claimed:
+            return None
+        ops = [op for op in self.complexity
+               if all(any(_has_prefix(text, k) for k in group) for group in op["all_of"])
+               and not any(_has_prefix(text, k) for k in op.get("none_of", []))]
+        if len(ops) != 1:
+            return None
+        op = ops[0]
+        
+        if _WORST_RE.search(text):
+            expected = op["worst"]
+        else:
+            expected = op["average"]
+            # Без уточнения случая худшая оценка не ложна, но и не подтверждение
+            if not _AVERAGE_RE.search(text) and claimed == op["worst"] != op["average"]:
+                return None
+        
+        if claimed == expected:
+            return {"status": "verified_true", "confidence": 0.9}
+        
+        worst = f", в худшем {_fmt_complexity(op['worst'])}" if op["worst"] != op["average"] else ""
+        return {
+            "status": "verified_false",
+            "confidence": 0.9,
+            "correct_info": f"{op['operation']}: в среднем {_fmt_complexity(op['average'])}{worst}, "
+                            f"а не {_fmt_complexity(claimed)}",
+        }
+    
+    def stats(self):
+        checked = self.resolved + self.passed
+        return {
+            "version": self.version,
+            "resolved": self.resolved,
+            "passed_through": self.passed,
+            "resolve_rate": round(self.resolved / checked, 3) if checked else 0.0,
+        }
+
+
+_engine = None
+
+
+def get_fact_rules():
+    global _engine
+    if _engine is None:
+        _engine = FactRuleEngine()
+        register_metrics("fact_rules", _engine.stats)
+    return _engine
+
+
+if __name__ == "__main__":
+    # python -m src.tools.fact_rules "Python 4.0 вышел в 2024" — проверить утверждение правилами
+    import sys
+    
+    engine = get_fact_rules()
+    for claim in sys.argv[1:]:
+        print(f"{claim!r}: {engine.check(claim)}")
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""Кэш вердиктов Fact Checker между сессиями"""
+
+import asyncio
+import atexit
+import json
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from src.config import settings
+from src.utils.metrics import register_metrics
+
+
+_VERSION_RE = re.compile(r"\d+(?:[.,]\d+)+|\d+")
+_PUNCT_RE = re.compile(r"[^\w\s.]")
+# Отрицание меняет смысл на противоположный — такие формулировки не считаются близкими
+_NEGATIONS = {"не", "нет", "ни", "никогда", "нельзя", "без", "not", "no", "never", "without"}
+
+
+def _canon_number(match):
+    parts = match.group(0).replace(",", ".").split(".")
+    parts = [str(int(p)) for p in parts]
+    # "4.0" == "4", "3.12.0" == "3.12"
+    while len(parts) > 1 and parts[-1] == "0":
+        parts.pop()
+    return ".".join(parts)
+
+
+def normalize_claim(text):
+    """Регистр, ё, пунктуация, пробелы и запись чисел/версий приводятся к одному виду"""
+    text = text.casefold().replace("ё", "е").replace("n't", " not")
+    text = _VERSION_RE.sub(_canon_number, text)
+    text = _PUNCT_RE.sub(" ", text)
+    text = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", text)  # точки вне чисел
+    return " ".join(text.split())
+
+
+def _numbers(tokens):
+    return {t for t in tokens if t[0].isdigit()}
+
+
+def _negations(tokens):
+    return tokens & _NEGATIONS
+
+
+def claim_similarity(a, b):
+    """Жаккар токенов нормализованных утверждений; 0, если расходятся числа или отрицания"""
+    ta, tb = set(normalize_claim(a).split()), set(normalize_claim(b).split())
+    if not ta or not tb or _numbers(ta) != _numbers(tb) or _negations(ta) != _negations(tb):
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+class FactVerdictStore:
+    """Вердикты verified_true/verified_false по нормализованному тексту утверждения.
+    
+    Хранится в JSON на диске, записи живут ttl секунд. Почти совпадающие
+    формулировки находятся по Жаккару токенов через инвертированный индекс;
+    числа/версии и отрицания обязаны совпасть. Запись на диск — пачкой в потоке.
+    """
+    
+    def __init__(self, path=None, ttl=None, similarity=None, save_delay=None):
+        self.path = Path(path or settings.fact_store_path)
+        self.ttl = settings.fact_store_ttl if ttl is None else ttl
+        self.similarity = settings.fact_store_similarity if similarity is None else similarity
+        self.save_delay = settings.fact_store_save_delay if save_delay is None else save_delay
+        self._entries = {}
+        self._index = defaultdict(set)  # токен -> ключи утверждений
+        self._dirty = False
+        self._save_task = None
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.saves = 0
+        self._load()
+    
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self._entries = data.get("verdicts", {})
+        except Exception as e:
+            print(f"Fact store load error: {e}")
+            self._entries = {}
+        for key in self._entries:
+            self._index_key(key)
+    
+    def _index_key(self, key):
+        for token in set(key.split()):
+            self._index[token].add(key)
+    
+    def _unindex_key(self, key):
+        for token in set(key.split()):
+            keys = self._index.get(token)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._index[token]
+    
+    def _write(self, payload):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(payload, encoding="utf-8")
+        tmp.replace(self.path)
+        self.saves += 1
+    
+    def _dump(self):
+        self._dirty = False
+        return json.dumps({"verdicts": self._entries}, ensure_ascii=False, indent=2)
+    
+    def flush(self):
+        """Синхронная запись несохранённых изменений (CLI, выход процесса)"""
+        if self._dirty:
+            self._write(self._dump())
+    
+    def _schedule_save(self):
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._save_task is None or self._save_task.done():
+            self._save_task = loop.create_task(self._save_later())
+    
+    async def _save_later(self):
+        # Вердикты одного хода приходят пачкой — пишем их одним файлом
+        await asyncio.sleep(self.save_delay)
+        if not self._dirty:
+            return
+        # Снимок собирается в event loop, на диск пишет поток
+        payload = self._dump()
+        try:
+            await asyncio.to_thread(self._write, payload)
+        except Exception as e:
+            print(f"Fact store save error: {e}")
+            self._dirty = True
+    
+    def _alive(self, entry):
+        return entry["created_at"] + entry.get("ttl", self.ttl) >= time.time()
+    
+    def get(self, claim):
+        """Вердикт (dict) или None"""
+        key = normalize_claim(claim)
+        entry = self._entries.get(key)
+        if entry and self._alive(entry):
+            self.hits += 1
+            entry["hits"] = entry.get("hits", 0) + 1
+            return entry
+        
+        if self.similarity < 1.0:
+            entry = self._find_similar(key)
+            if entry:
+                self.near_hits += 1
+                entry["hits"] = entry.get("hits", 0) + 1
+                return entry
+        
+        self.misses += 1
+        return None
+    
+    def _find_similar(self, key):
+        tokens = set(key.split())
+        if not tokens:
+            return None
+        numbers = _numbers(tokens)
+        negations = _negations(tokens)
+        # Жаккар >= similarity требует не меньше similarity * |tokens| общих токенов
+        overlap = Counter(k for t in tokens for k in self._index.get(t, ()))
+        need = math.ceil(self.similarity * len(tokens))
+        best, best_score = None, 0.0
+        for other_key, common in overlap.items():
+            if common < need:
+                continue
+            entry = self._entries[other_key]
+            if not self._alive(entry):
+                continue
+            other = set(other_key.split())
+            if _numbers(other) != numbers or _negations(other) != negations:
+                continue
+            score = common / len(tokens | other)
+            if score > best_score:
+                best, best_score = entry, score
+        return best if best_score >= self.similarity else None
+    
+    def put(self, claim, status, confidence, correct_info=None, source=None,
+            verification_method="web_search", ttl=None, recheck=False):
+        """recheck — вердикт без источника: отдаётся, только пока перепроверить нечем"""
+        if status not in ("verified_true", "verified_false"):
+            return
+        key = normalize_claim(claim)
+        if key not in self._entries:
+            self._index_key(key)
+        self._entries[key] = {
+            "claim": claim,
+            "status": status,
+            "confidence": confidence,
+            "correct_info": correct_info,
+            "source": source,
+            "verification_method": verification_method,
+            "created_at": time.time(),
+            "ttl": self.ttl if ttl is None else ttl,
+            "recheck": recheck,
+            "hits": 0,
+        }
+        self._schedule_save()
+    
+    def purge_expired(self):
+        expired = [k for k, e in self._entries.items() if not self._alive(e)]
+        for k in expired:
+            del self._entries[k]
+            self._unindex_key(k)
+        if expired:
+            self._schedule_save()
+        return len(expired)
+    
+    def entries(self):
+        return [{"key": k, **e} for k, e in self._entries.items()]
+    
+    def stats(self):
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+            "saves": self.saves,
+        }
+
+
+_store = None
+
+
+def get_fact_store():
+    global _store
+    if _store is None:
+        _store = FactVerdictStore()
+        # Отложенная запись не должна потеряться при выходе
+        atexit.register(_store.flush)
+        register_metrics("fact_verdict_store", _store.stats)
+    return _store
+
+
+if __name__ == "__main__":
+    # python -m src.tools.fact_store — показать сохранённые вердикты
+    store = get_fact_store()
+    store.purge_expired()
+    print(json.dumps({"stats": store.stats(), "verdicts": store.entries()},
+                     ensure_ascii=False, indent=2))
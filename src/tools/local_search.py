@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""Локальный поиск по базе справочных документов (BM25, инвертированный индекс на диске)"""
+
+import asyncio
+import hashlib
+import heapq
+import json
+import math
+import re
+import time
+from collections import Counter
+from pathlib import Path
+
+from src.config import settings
+from src.tools.web_search import BaseSearchProvider, SearchResult
+
+
+DOC_EXTENSIONS = {".md", ".txt", ".rst", ".html", ".htm"}
+
+_TOKEN_RE = re.compile(r"[\w][\w+#.]*\w|\w", re.UNICODE)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+STOPWORDS = {
+    "и", "в", "во", "на", "с", "со", "по", "к", "о", "об", "от", "до", "из", "за", "для", "не",
+    "что", "это", "как", "а", "но", "или", "ли", "же", "то", "так", "его", "ее", "их", "есть",
+    "the", "a", "an", "of", "to", "in", "on", "for", "and", "or", "is", "are", "be", "by",
+    "with", "it", "as", "at", "that", "this", "from", "fact", "check",
+}
+
+
+def tokenize(text):
+    """Токены в нижнем регистре; длинные слова обрезаются до 6 символов (грубый стемминг для RU/EN)"""
+    tokens = []
+    for t in _TOKEN_RE.findall(text.casefold().replace("ё", "е")):
+        t = t.strip(".")
+        if not t or t in STOPWORDS:
+            continue
+        if len(t) > 6 and t.isalpha():
+            t = t[:6]
+        tokens.append(t)
+    return tokens
+
+
+def _split_passages(text, max_chars):
+    """Режет документ на абзацы, склеивая короткие до max_chars"""
+    passages, current = [], ""
+    for para in re.split(r"\n\s*\n", text):
+        para = para.strip()
+        if not para:
+            continue
+        if current and len(current) + len(para) > max_chars:
+            passages.append(current)
+            current = ""
+        current = f"{current}\n\n{para}" if current else para
+    if current:
+        passages.append(current)
+    return passages
+
+
+class BM25Index:
+    """Инвертированный индекс term -> [(doc_id, tf)] со статистикой для BM25"""
+    
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.fingerprint = None
+        self.docs = []  # {"title", "url", "text"}
+        self.doc_len = []
+        self.postings = {}
+        self.avgdl = 0.0
+    
+    @staticmethod
+    def corpus_fingerprint(docs_dir):
+        files = sorted(p for p in Path(docs_dir).rglob("*") if p.suffix.lower() in DOC_EXTENSIONS)
+        h = hashlib.sha256()
+        for p in files:
+            st = p.stat()
+            h.update(f"{p.relative_to(docs_dir)}:{st.st_size}:{int(st.st_mtime)}".encode("utf-8"))
+        return h.hexdigest()
+    
+    def build(self, docs_dir, passage_chars=800):
+        docs_dir = Path(docs_dir)
+        self.fingerprint = self.corpus_fingerprint(docs_dir)
+        self.docs, self.doc_len, self.postings = [], [], {}
+        
+        for path in sorted(docs_dir.rglob("*")):
+            if path.suffix.lower() not in DOC_EXTENSIONS:
+                continue
+            try:
+                text = path.read_text(encoding="utf-8", errors="ignore")
+            except OSError as e:
+                print(f"Local KB read error {path}: {e}")
+                continue
+            if path.suffix.lower() in (".html", ".htm"):
+                text = _TAG_RE.sub(" ", text)
+            
+            rel = str(path.relative_to(docs_dir))
+            for i, passage in enumerate(_split_passages(text, passage_chars)):
+                self._add(f"{path.stem} #{i + 1}", f"kb://{rel}#{i + 1}", passage)
+        
+        self.avgdl = sum(self.doc_len) / len(self.doc_len) if self.doc_len else 0.0
+        return self
+    
+    def _add(self, title, url, text):
+        doc_id = len(self.docs)
+        tokens = tokenize(text)
+        self.docs.append({"title": title, "url": url, "text": text})
+        self.doc_len.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, []).append((doc_id, tf))
+    
+    def search(self, query, max_results=5):
+        """[(score, doc_id, matched_terms)] по убыванию score"""
+        terms = set(tokenize(query))
+        if not terms or not self.docs:
+            return []
+        
+        n = len(self.docs)
+        scores, matched = {}, {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / (self.avgdl or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[doc_id] = matched.get(doc_id, 0) + 1
+        
+        # Релевантным считаем фрагмент, где нашлось хотя бы 2 термина запроса (или единственный)
+        need = min(2, len(terms))
+        top = heapq.nlargest(
+            max_results,
+            ((score, doc_id) for doc_id, score in scores.items() if matched[doc_id] >= need)
+        )
+        return [(score, doc_id, matched[doc_id]) for score, doc_id in top]
+    
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "fingerprint": self.fingerprint,
+            "k1": self.k1, "b": self.b,
+            "docs": self.docs,
+            "doc_len": self.doc_len,
+            "postings": self.postings,
+        }
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+    
+    @classmethod
+    def load(cls, path):
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        index = cls(k1=data["k1"], b=data["b"])
+        index.fingerprint = data["fingerprint"]
+        index.docs = data["docs"]
+        index.doc_len = data["doc_len"]
+        index.postings = {t: [tuple(p) for p in ps] for t, ps in data["postings"].items()}
+        index.avgdl = sum(index.doc_len) / len(index.doc_len) if index.doc_len else 0.0
+        return index
+
+
+class LocalKnowledgeBaseProvider(BaseSearchProvider):
+    """Поиск по локальной базе документов без сети.
+    
+    Индекс загружается или строится при первом поиске в отдельном потоке и
+    сохраняется на диск. Не чаще раза в knowledge_base_check_interval секунд
+    файлы сверяются с отпечатком индекса; при изменениях индекс пересобирается.
+    """
+    
+    def __init__(self, docs_dir=None, index_path=None):
+        self.docs_dir = Path(docs_dir or settings.knowledge_base_dir)
+        self.index_path = Path(index_path or settings.knowledge_base_index_path)
+        self._index = None
+        self._checked_at = 0.0
+        self._lock = None
+    
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self.load_or_build()
+        return self._index
+    
+    def load_or_build(self, force=False):
+        if not self.docs_dir.exists():
+            print(f"Local KB not found: {self.docs_dir}")
+            return BM25Index()
+        
+        fingerprint = BM25Index.corpus_fingerprint(self.docs_dir)
+        if not force and self.index_path.exists():
+            try:
+                index = BM25Index.load(self.index_path)
+                if index.fingerprint == fingerprint:
+                    return index
+            except Exception as e:
+                print(f"Local KB index load error: {e}")
+        
+        index = BM25Index().build(self.docs_dir, passage_chars=settings.knowledge_base_passage_chars)
+        index.save(self.index_path)
+        print(f"Local KB indexed: {len(index.docs)} passages, {len(index.postings)} terms")
+        return index
+    
+    def _refresh(self):
+        """Текущий индекс, если файлы не менялись, иначе загрузка/пересборка"""
+        if self._index is not None:
+            if not self.docs_dir.exists():
+                return self._index if self._index.fingerprint is None else BM25Index()
+            if self._index.fingerprint == BM25Index.corpus_fingerprint(self.docs_dir):
+                return self._index
+        return self.load_or_build()
+    
+    async def _current_index(self):
+        # Чтение файлов и сборка индекса — в потоке: event loop и таймауты поиска не блокируются
+        fresh = time.monotonic() - self._checked_at < settings.knowledge_base_check_interval
+        if self._index is not None and fresh:
+            return self._index
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._index is None or time.monotonic() - self._checked_at >= settings.knowledge_base_check_interval:
+                self._index = await asyncio.to_thread(self._refresh)
+                self._checked_at = time.monotonic()
+        return self._index
+    
+    async def search(self, query, max_results=5):
+        index = await self._current_index()
+        return [
+            SearchResult(
+                title=index.docs[doc_id]["title"],
+                url=index.docs[doc_id]["url"],
+                snippet=index.docs[doc_id]["text"][:400],
+                source="local_kb"
+            )
+            for _, doc_id, _ in index.search(query, max_results)
+        ]
+
+
+if __name__ == "__main__":
+    # python -m src.tools.local_search [query] — пересобрать индекс и (опционально) поискать
+    import sys
+    
+    provider = LocalKnowledgeBaseProvider()
+    provider._index = provider.load_or_build(force=True)
+    if len(sys.argv) > 1:
+        query = " ".join(sys.argv[1:])
+        for score, doc_id, matched in provider.index.search(query):
+            doc = provider.index.docs[doc_id]
+            print(f"{score:6.2f} [{matched}] {doc['url']}: {doc['text'][:120]!r}")
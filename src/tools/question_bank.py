@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""Банк проверенных вопросов по (позиция, грейд, тема, сложность)
+
+Заполняется офлайн батч-джобой через INTERVIEWER_PROMPT; в интервью попадают только
+вопросы, прошедшие ревью (QUESTION_REVIEW_PROMPT) или одобренные вручную:
+
+    python -m src.tools.question_bank fill --position "Backend Developer" --grade Junior \
+        --topics "Базы данных,Python,HTTP" --per-key 8
+    python -m src.tools.question_bank list [--position ...] [--topic ...] [--pending]
+    python -m src.tools.question_bank approve <id>
+    python -m src.tools.question_bank reject <id>
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from pathlib import Path
+
+from src.config import settings
+from src.tools.local_search import tokenize
+from src.tools.question_index import QuestionIndex, extract_question
+from src.utils.metrics import register_metrics
+
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+
+def _norm(text):
+    return " ".join((text or "").casefold().replace("ё", "е").split())
+
+
+def _topic_terms(topic):
+    return set(tokenize(topic))
+
+
+class QuestionBank:
+    """Вопросы в JSON на диске + индекс в памяти: (позиция, грейд) -> тема -> сложность -> [вопросы]"""
+    
+    def __init__(self, path=None):
+        self.path = Path(path or settings.question_bank_path)
+        self.questions = []
+        self._index = {}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+    
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.questions = data.get("questions", [])
+        except Exception as e:
+            print(f"Question bank load error: {e}")
+            self.questions = []
+        self._reindex()
+    
+    def _reindex(self):
+        self._index = {}
+        for q in self.questions:
+            if not q.get("vetted"):
+                continue
+            key = (_norm(q["position"]), _norm(q["grade"]))
+            self._index.setdefault(key, {}).setdefault(_norm(q["topic"]), {}) \
+                .setdefault(q["difficulty"], []).append(q)
+    
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": 1, "questions": self.questions}, ensure_ascii=False, indent=2),
+                       encoding="utf-8")
+        tmp.replace(self.path)
+    
+    def add(self, position, grade, topic, difficulty, text, vetted=False, source="llm_batch", review=""):
+        qid = hashlib.sha256(_norm(f"{position}|{grade}|{topic}|{text}").encode("utf-8")).hexdigest()[:12]
+        if any(q["id"] == qid for q in self.questions):
+            return None
+        entry = {
+            "id": qid,
+            "position": position,
+            "grade": grade,
+            "topic": topic,
+            "difficulty": difficulty,
+            "text": text,
+            "vetted": vetted,
+            "review": review,
+            "source": source,
+            "created_at": time.time(),
+        }
+        self.questions.append(entry)
+        self._reindex()
+        return entry
+    
+    def _set_vetted(self, qid, vetted, review):
+        for q in self.questions:
+            if q["id"] == qid:
+                q["vetted"] = vetted
+                q["review"] = review
+                self._reindex()
+                return True
+        return False
+    
+    def approve(self, qid):
+        return self._set_vetted(qid, True, "одобрен вручную")
+    
+    def reject(self, qid):
+        return self._set_vetted(qid, False, "снят вручную")
+    
+    def _match_topic(self, topics, topic):
+        """Тема из плана может называться иначе, чем в банке — сравниваем по стемам"""
+        norm = _norm(topic)
+        if norm in topics:
+            return topics[norm]
+        terms = _topic_terms(topic)
+        best, best_score = None, 0.0
+        for name, by_difficulty in topics.items():
+            other = _topic_terms(name)
+            if not terms or not other:
+                continue
+            score = len(terms & other) / len(terms | other)
+            if score > best_score:
+                best, best_score = by_difficulty, score
+        return best if best_score >= 0.5 else None
+    
+    def draw(self, position, grade, topic, difficulty, asked=None, record=True):
+        """Случайный вопрос ключа, не похожий на уже заданные в сессии, или None.
+        record=False — без учёта в hits/misses: вызывающий учтёт выдачу сам через record()"""
+        by_topic = self._index.get((_norm(position), _norm(grade)))
+        by_difficulty = self._match_topic(by_topic, topic) if by_topic else None
+        candidates = list(by_difficulty.get(difficulty, [])) if by_difficulty else []
+        
+        random.shuffle(candidates)
+        for q in candidates:
+            if asked is None or asked.most_similar(q["text"])[0] < settings.question_dedup_threshold:
+                if record:
+                    self.record(True)
+                return q["text"]
+        if record:
+            self.record(False)
+        return None
+    
+    def record(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+    
+    def stats(self):
+        draws = self.hits + self.misses
+        return {
+            "size": sum(1 for q in self.questions if q.get("vetted")),
+            "keys": sum(len(t) for t in self._index.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / draws, 3) if draws else 0.0,
+        }
+
+
+def well_formed(text):
+    """Проверка формы сгенерированного вопроса: не JSON, с "?", разумной длины, без placeholder"""
+    if not text or text.startswith("{") or text.startswith("```"):
+        return False
+    if not text.endswith("?") or not 15 <= len(text) <= 400:
+        return False
+    return "[" not in text  # placeholder вроде [Имя]
+
+
+async def review_question(agent, position, grade, topic, difficulty, text):
+    """LLM-ревью вопроса по теме, уровню и корректности: (одобрен, причина отказа)"""
+    from src.models.output_schemas import QuestionReviewOutput
+    from src.prompts.templates import QUESTION_REVIEW_PROMPT
+    
+    prompt = QUESTION_REVIEW_PROMPT.format(
+        position=position, target_grade=grade, topic=topic, difficulty=difficulty, question=text
+    )
+    try:
+        result = await agent._call_structured(QuestionReviewOutput, prompt)
+    except Exception as e:
+        return False, f"ревью не выполнено: {e}"
+    if result is None:
+        return False, "ревью не выполнено"
+    approved = result.on_topic and result.fits_level and result.self_contained and result.correct
+    return approved, "" if approved else (result.reason or "не прошёл ревью")
+
+
+async def fill(bank, position, grade, topics, difficulties=DIFFICULTIES, per_key=8, attempts_factor=2):
+    """Генерирует вопросы через INTERVIEWER_PROMPT (как обычный ход интервью) и кладёт в банк"""
+    from src.agents.interviewer import InterviewerAgent
+    from src.prompts.templates import INTERVIEWER_PROMPT
+    
+    agent = InterviewerAgent()
+    
+    async def fill_key(topic, difficulty):
+        # В индекс идут и отклонённые вопросы — чтобы модель не генерировала их снова
+        index = QuestionIndex()
+        vetted = 0
+        for q in bank.questions:
+            if (_norm(q["position"]), _norm(q["grade"]), _norm(q["topic"]), q["difficulty"]) == \
+                    (_norm(position), _norm(grade), _norm(topic), difficulty):
+                index.add(q["text"])
+                vetted += bool(q.get("vetted"))
+        
+        added = 0
+        for _ in range(per_key * attempts_factor):
+            if vetted >= per_key:
+                break
+            # Уже сгенерированные вопросы идут как история — модель уходит от повторов
+            history = "\n".join(f"Интервьюер: {q}" for q in index.questions[-10:])
+            prompt = INTERVIEWER_PROMPT.format(
+                candidate_name="Кандидат",
+                position=position,
+                target_grade=grade,
+                experience="не указан",
+                current_topic=topic,
+                difficulty=difficulty,
+                action="ask_question",
+                hint_section="",
+                conversation_history=history or "Диалог начинается."
+            )
+            try:
+                text = extract_question((await agent._call_llm(prompt)).strip())
+            except Exception as e:
+                print(f"Question bank generation error ({topic}/{difficulty}): {e}")
+                continue
+            if not well_formed(text) or index.most_similar(text)[0] >= settings.question_dedup_threshold:
+                continue
+            approved, reason = await review_question(agent, position, grade, topic, difficulty, text)
+            if bank.add(position, grade, topic, difficulty, text, vetted=approved, review=reason):
+                index.add(text)
+                vetted += approved
+                added += approved
+        print(f"{position} / {grade} / {topic} / {difficulty}: +{added} (одобрено {vetted}, всего {len(index)})")
+        return added
+    
+    results = await asyncio.gather(*[fill_key(t, d) for t in topics for d in difficulties])
+    bank.save()
+    return sum(results)
+
+
+_bank = None
+
+
+def get_question_bank():
+    global _bank
+    if _bank is None:
+        _bank = QuestionBank()
+        register_metrics("question_bank", _bank.stats)
+    return _bank
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Банк вопросов интервью")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    p_fill = sub.add_parser("fill", help="сгенерировать вопросы через LLM")
+    p_fill.add_argument("--position", required=True)
+    p_fill.add_argument("--grade", required=True, choices=["Junior", "Middle", "Senior"])
+    p_fill.add_argument("--topics", required=True, help="темы через запятую")
+    p_fill.add_argument("--difficulties", default=",".join(DIFFICULTIES))
+    p_fill.add_argument("--per-key", type=int, default=8)
+    
+    p_list = sub.add_parser("list", help="показать вопросы")
+    p_list.add_argument("--position")
+    p_list.add_argument("--topic")
+    p_list.add_argument("--pending", action="store_true", help="только не прошедшие ревью")
+    
+    p_approve = sub.add_parser("approve", help="одобрить вопрос вручную")
+    p_approve.add_argument("id")
+    
+    p_reject = sub.add_parser("reject", help="снять вопрос с использования")
+    p_reject.add_argument("id")
+    
+    args = parser.parse_args()
+    bank = QuestionBank()
+    
+    if args.command == "fill":
+        topics = [t.strip() for t in args.topics.split(",") if t.strip()]
+        difficulties = [d.strip() for d in args.difficulties.split(",") if d.strip()]
+        total = asyncio.run(fill(bank, args.position, args.grade, topics, difficulties, args.per_key))
+        print(f"Добавлено вопросов: {total}, в банке: {bank.stats()['size']}")
+    elif args.command == "list":
+        for q in bank.questions:
+            if args.position and _norm(args.position) != _norm(q["position"]):
+                continue
+            if args.topic and _norm(args.topic) != _norm(q["topic"]):
+                continue
+            if args.pending and q.get("vetted"):
+                continue
+            mark = " " if q.get("vetted") else "x"
+            review = f" ({q['review']})" if q.get("review") and not q.get("vetted") else ""
+            print(f"[{mark}] {q['id']} {q['grade']:<6} {q['topic']} / {q['difficulty']}: {q['text']}{review}")
+    elif args.command == "approve":
+        if bank.approve(args.id):
+            bank.save()
+            print(f"Вопрос {args.id} одобрен")
+        else:
+            print(f"Вопрос {args.id} не найден")
+    elif args.command == "reject":
+        if bank.reject(args.id):
+            bank.save()
+            print(f"Вопрос {args.id} снят")
+        else:
+            print(f"Вопрос {args.id} не найден")
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Индекс похожести заданных вопросов (MinHash по стемам и намерению вопроса, без сети)"""
+
+import hashlib
+import re
+from collections import OrderedDict
+
+from src.config import settings
+from src.tools.local_search import tokenize
+from src.utils.metrics import register_metrics
+
+
+_MERSENNE = (1 << 61) - 1
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+
+
+# Служебные слова вопросов интервьюера — не несут темы и шумят в похожести
+_FILLERS = set(tokenize(
+    "расскажи расскажите объясни объясните опиши опишите поясни скажи скажите приведи пример примеры "
+    "знаешь знаете можешь можете какие какой какая каких какими что как чем почему между для чего "
+    "существуют используется используются проблема проблему он она они его их "
+    "про о об давай теперь хорошо отлично спасибо ты вы твой ваш свой"
+))
+
+# Слова, задающие тип вопроса, сводятся к одному токену намерения: "разница между" и
+# "чем отличаются" — один вопрос, а "какие типы индексов" и "как работают индексы" — разные
+_INTENTS = {
+    "diff": ("разниц", "различ", "отлича", "отличи", "сравни", "differ"),
+    "how": ("работа", "устрое", "устрой", "внутри", "механи"),
+    "kinds": ("типы", "типов", "виды", "видов", "бывают", "разнов"),
+    "why": ("зачем", "нужен", "нужна", "нужно", "нужны", "назнач"),
+    "fix": ("решит", "решени", "борот", "избежа", "устран", "исправ"),
+    "when": ("когда", "ситуац"),
+    "what": ("такое", "опреде"),
+}
+_INTENT_PREFIXES = tuple((prefix, intent) for intent, prefixes in _INTENTS.items() for prefix in prefixes)
+
+_ENDINGS = sorted("ами ями ах ях ов ев ей ом ем ой ий ый ая ое ые ы и а я е о у ю ь й".split(), key=len, reverse=True)
+_CYRILLIC_RE = re.compile(r"[а-я]+")
+
+
+def _hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _permutations(n):
+    """Фиксированные (a, b) для h(x) = (a*x + b) mod p — сигнатуры сравнимы между процессами"""
+    perms = []
+    for i in range(n):
+        seed = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(seed[:8], "big") % (_MERSENNE - 1) + 1
+        b = int.from_bytes(seed[8:], "big") % _MERSENNE
+        perms.append((a, b))
+    return perms
+
+
+def extract_question(message):
+    """Сам вопрос из реплики интервьюера: предложения с "?", иначе последнее предложение"""
+    sentences = [s.strip() for s in _SENTENCE_RE.split(message or "") if s.strip()]
+    questions = [s for s in sentences if s.endswith("?")]
+    return " ".join(questions) if questions else (sentences[-1] if sentences else "")
+
+
+def _stem(token, length=4):
+    """Грубый стем русского слова: без окончания, первые length букв ("базе"/"базах", "сборщик"/"сборка")"""
+    if not _CYRILLIC_RE.fullmatch(token):
+        return token
+    for ending in _ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= 3:
+            token = token[:-len(ending)]
+            break
+    return token[:length]
+
+
+def last_sentence(text):
+    sentences = [s.strip() for s in _SENTENCE_RE.split(text or "") if s.strip()]
+    return sentences[-1] if sentences else ""
+
+
+def shingles(text):
+    """Токены намерения вопроса + стемы значимых слов"""
+    result = set()
+    for token in tokenize(text):
+        intent = next((name for prefix, name in _INTENT_PREFIXES if token.startswith(prefix)), None)
+        if intent:
+            result.add(f"i:{intent}")
+        elif token not in _FILLERS:
+            result.add(f"w:{_stem(token)}")
+    return result
+
+
+class QuestionIndex:
+    """MinHash-сигнатуры вопросов одной сессии; similarity — оценка Жаккара по шинглам"""
+    
+    _perms_cache = {}
+    
+    def __init__(self, num_perm=None):
+        self.num_perm = num_perm or settings.question_dedup_num_perm
+        if self.num_perm not in self._perms_cache:
+            self._perms_cache[self.num_perm] = _permutations(self.num_perm)
+        self.perms = self._perms_cache[self.num_perm]
+        self.questions = []
+        self.signatures = []
+    
+    def __len__(self):
+        return len(self.questions)
+    
+    def signature(self, text):
+        hashes = [_hash(s) for s in shingles(extract_question(text))]
+        if not hashes:
+            return None
+        return [min((a * h + b) % _MERSENNE for h in hashes) for a, b in self.perms]
+    
+    def add(self, question):
+        self.questions.append(question)
+        self.signatures.append(self.signature(question))
+    
+    def sync(self, asked_questions):
+        """Догоняет список asked_questions из состояния (индекс только растёт)"""
+        if len(asked_questions) < len(self.questions):
+            self.questions, self.signatures = [], []
+        for question in asked_questions[len(self.questions):]:
+            self.add(question)
+    
+    def most_similar(self, text):
+        """(similarity, question) самого похожего из уже заданных или (0.0, None)"""
+        sig = self.signature(text)
+        best, best_score = None, 0.0
+        if sig is None:
+            return best_score, best
+        for question, other in zip(self.questions, self.signatures):
+            if other is None:
+                continue
+            score = sum(x == y for x, y in zip(sig, other)) / self.num_perm
+            if score > best_score:
+                best, best_score = question, score
+        return best_score, best
+
+
+class QuestionIndexRegistry:
+    """Индексы по session_id с вытеснением самых старых сессий"""
+    
+    def __init__(self, max_sessions=256):
+        self.max_sessions = max_sessions
+        self._indexes = OrderedDict()
+        self.checks = 0
+        self.duplicates = 0
+        self.regenerated = 0
+        self.substituted = 0
+    
+    def get(self, session_id, asked_questions):
+        index = self._indexes.get(session_id)
+        if index is None:
+            index = self._indexes[session_id] = QuestionIndex()
+            while len(self._indexes) > self.max_sessions:
+                self._indexes.popitem(last=False)
+        self._indexes.move_to_end(session_id)
+        index.sync(asked_questions)
+        return index
+    
+    def record(self, counter):
+        """+1 к счётчику checks / duplicates / regenerated / substituted"""
+        setattr(self, counter, getattr(self, counter) + 1)
+    
+    def stats(self):
+        return {
+            "sessions": len(self._indexes),
+            "checks": self.checks,
+            "duplicates": self.duplicates,
+            "regenerated": self.regenerated,
+            "substituted": self.substituted,
+        }
+
+
+_registry = None
+
+
+def get_question_indexes():
+    global _registry
+    if _registry is None:
+        _registry = QuestionIndexRegistry()
+        register_metrics("question_dedup", _registry.stats)
+    return _registry
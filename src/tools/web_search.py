@@ -2,9 +2,17 @@
 """Веб-поиск через DuckDuckGo"""
 
 import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 
+from src.config import settings
+from src.utils.cache import TTLCache
+from src.utils.circuit_breaker import CircuitBreaker
+from src.utils.metrics import register_metrics
+
 
 @dataclass
 class SearchResult:
@@ -15,52 +23,313 @@ class SearchResult:
 
 
 class BaseSearchProvider(ABC):
+    """Провайдер поиска. Ошибки пробрасываются — их учитывает WebSearchTool"""
+    
     @abstractmethod
     async def search(self, query, max_results=5):
         pass
 
 
+class SearchExecutor:
+    """Пул потоков под блокирующий поиск со своими счётчиками занятости"""
+    
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-search")
+        self._lock = threading.Lock()
+        self.in_flight = 0  # отправлено в пул и не завершено (в очереди + выполняется)
+        self.running = 0
+    
+    def _call(self, fn, args):
+        with self._lock:
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+    
+    def _done(self, future):
+        # Срабатывает и для отменённых до старта задач
+        with self._lock:
+            self.in_flight -= 1
+    
+    async def run(self, fn, *args):
+        with self._lock:
+            self.in_flight += 1
+        future = self._executor.submit(self._call, fn, args)
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "running": self.running,
+                "queued": max(0, self.in_flight - self.running),
+            }
+
+
+_search_executor = None
+
+
+def get_search_executor():
+    """Отдельный ограниченный пул потоков под блокирующий поиск.
+    
+    Дефолтный executor общий для всего процесса — зависший DDG-запрос не должен его занимать.
+    """
+    global _search_executor
+    if _search_executor is None:
+        _search_executor = SearchExecutor(settings.search_max_workers)
+    return _search_executor
+
+
 class DuckDuckGoProvider(BaseSearchProvider):
+    def __init__(self, executor=None):
+        self.executor = executor
+    
     async def search(self, query, max_results=5):
-        try:
-            from duckduckgo_search import DDGS
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, lambda: self._sync(query, max_results))
-        except Exception as e:
-            print(f"DuckDuckGo error: {e}")
-            return []
+        executor = self.executor or get_search_executor()
+        return await executor.run(self._sync, query, max_results)
     
     def _sync(self, query, max_results):
         from duckduckgo_search import DDGS
         results = []
-        try:
-            with DDGS() as ddgs:
-                for r in ddgs.text(query, max_results=max_results):
-                    results.append(SearchResult(
-                        title=r.get("title", ""),
-                        url=r.get("href", r.get("link", "")),
-                        snippet=r.get("body", r.get("snippet", "")),
-                        source="duckduckgo"
-                    ))
-        except Exception as e:
-            print(f"DuckDuckGo sync error: {e}")
+        # Таймаут самого HTTP-клиента, чтобы поток пула не висел бесконечно
+        with DDGS(timeout=max(1, int(settings.search_timeout))) as ddgs:
+            for r in ddgs.text(query, max_results=max_results):
+                results.append(SearchResult(
+                    title=r.get("title", ""),
+                    url=r.get("href", r.get("link", "")),
+                    snippet=r.get("body", r.get("snippet", "")),
+                    source="duckduckgo"
+                ))
         return results
 
 
-class WebSearchTool:
-    """Поиск через DuckDuckGo"""
+def create_provider(name):
+    """Провайдер поиска по имени из settings.search_providers"""
+    if name == "duckduckgo":
+        return DuckDuckGoProvider()
+    if name == "local":
+        from src.tools.local_search import LocalKnowledgeBaseProvider
+        return LocalKnowledgeBaseProvider()
+    raise ValueError(f"Unknown search provider: {name}")
+
+
+class ProviderStats:
+    """Скользящие (EWMA) латентность и доля ошибок провайдера"""
+    
+    ALPHA = 0.3
     
     def __init__(self):
-        self.duckduckgo = DuckDuckGoProvider()
+        self.calls = 0
+        self.errors = 0
+        self.wins = 0
+        self.cancelled = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self.demoted_until = 0.0
+    
+    def record(self, latency, ok):
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+        # Быстрый отказ не делает провайдера «быстрым» — латентность учитываем без ошибок
+        if latency is not None:
+            self.latency = latency if self.latency is None else \
+                self.ALPHA * latency + (1 - self.ALPHA) * self.latency
+        self.error_rate = self.ALPHA * (0.0 if ok else 1.0) + (1 - self.ALPHA) * self.error_rate
+        
+        # Стабильно падающий провайдер выключается на время
+        if self.calls >= settings.search_demote_min_calls and self.error_rate > settings.search_demote_error_rate:
+            self.demoted_until = time.monotonic() + settings.search_demote_seconds
+    
+    @property
+    def demoted(self):
+        return time.monotonic() < self.demoted_until
+    
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "wins": self.wins,
+            "cancelled": self.cancelled,
+            "latency_ms": round(self.latency * 1000) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "demoted": self.demoted,
+        }
+
+
+class WebSearchTool:
+    """Поиск по провайдерам из настроек.
+    
+    search_strategy="tiered" — по очереди, пока не наберётся достаточно результатов;
+    "race" — все сразу, побеждает первый достаточный ответ, остальные отменяются.
+    """
+    
+    def __init__(self, providers=None):
+        if providers is None:
+            names = [n.strip() for n in settings.search_providers.split(",") if n.strip()]
+            providers = [(n, create_provider(n)) for n in names]
+        self.providers = providers
+        self.provider_stats = {name: ProviderStats() for name, _ in providers}
+        self.cache = TTLCache(maxsize=settings.search_cache_size, ttl=settings.search_cache_ttl)
+        self.timeouts = 0
+        # Отказ всех провайдеров подряд открывает breaker — дальше поиск не ждёт таймаутов
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.search_breaker_failures,
+            reset_timeout=settings.search_breaker_reset,
+            half_open_max_calls=settings.search_breaker_half_open_calls,
+        )
+        register_metrics("web_search", self.stats)
     
     async def search(self, query, max_results=5, context=""):
+        results, _ = await self._lookup(query, max_results, context)
+        return results
+    
+    async def _lookup(self, query, max_results, context=""):
+        """(results, error): error — None, circuit_open или search_failed"""
         full_query = f"{query} {context}".strip() if context else query
-        return await self.duckduckgo.search(full_query, max_results)
+        key = (" ".join(full_query.casefold().split()), max_results)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, None
+        
+        if not self.breaker.allow():
+            return [], "circuit_open"
+        
+        try:
+            if settings.search_strategy == "race" and len(self.providers) > 1:
+                results, ok = await self._race(full_query, max_results)
+            else:
+                results, ok = await self._tiered(full_query, max_results)
+        except asyncio.CancelledError:
+            # Внешний таймаут (например, FactChecker) — тоже отказ поиска
+            self.breaker.record_failure()
+            raise
+        
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        
+        # Пустой ответ часто означает ошибку/лимит — не кэшируем
+        if results:
+            self.cache.set(key, results)
+        return results, None if ok else "search_failed"
+    
+    @property
+    def available(self):
+        """False, пока breaker открыт — вызывающий может сразу идти в обход поиска"""
+        return not self.breaker.is_open
+    
+    async def _tiered(self, query, max_results):
+        """(results, ok): ok — хотя бы один провайдер ответил без ошибки"""
+        # Локальная база (если включена) идёт первым уровнем перед веб-поиском
+        results, ok = [], False
+        for name, provider in self.providers:
+            if self.provider_stats[name].demoted and name != self.providers[-1][0]:
+                continue
+            tier_results = await self._search_provider(name, provider, query, max_results)
+            if tier_results is None:
+                continue
+            ok = True
+            if len(tier_results) > len(results):
+                results = tier_results
+            if len(results) >= settings.search_min_results:
+                break
+        return results, ok
+    
+    def _race_plan(self):
+        """[(name, provider, delay)]: здоровые стартуют сразу, медленные — с задержкой (hedge).
+        
+        Провайдеры с высокой долей ошибок пропускаются, пока остаются другие.
+        """
+        healthy = [(n, p) for n, p in self.providers if not self.provider_stats[n].demoted]
+        if not healthy:
+            healthy = list(self.providers)
+        
+        latencies = [self.provider_stats[n].latency for n, _ in healthy
+                     if self.provider_stats[n].latency is not None]
+        fastest = min(latencies) if latencies else None
+        
+        plan = []
+        for name, provider in healthy:
+            latency = self.provider_stats[name].latency
+            slow = fastest is not None and latency is not None and \
+                latency > fastest * settings.search_slow_factor
+            plan.append((name, provider, settings.search_hedge_delay if slow else 0.0))
+        return sorted(plan, key=lambda x: x[2])
+    
+    async def _race(self, query, max_results):
+        async def run(name, provider, delay):
+            if delay:
+                await asyncio.sleep(delay)
+            return name, await self._search_provider(name, provider, query, max_results)
+        
+        tasks = [asyncio.create_task(run(*item)) for item in self._race_plan()]
+        best, ok = [], False
+        try:
+            for fut in asyncio.as_completed(tasks):
+                name, results = await fut
+                if results is None:
+                    continue
+                ok = True
+                if len(results) > len(best):
+                    best = results
+                if len(results) >= settings.search_min_results:
+                    self.provider_stats[name].wins += 1
+                    break
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        return best, ok
+    
+    async def _search_provider(self, name, provider, query, max_results):
+        """Результаты провайдера или None при ошибке/таймауте"""
+        stats = self.provider_stats[name]
+        started = time.monotonic()
+        try:
+            results = await asyncio.wait_for(
+                provider.search(query, max_results),
+                timeout=settings.search_timeout
+            )
+        except asyncio.TimeoutError:
+            # Поток в пуле доработает сам, ход его не ждёт
+            self.timeouts += 1
+            stats.record(time.monotonic() - started, ok=False)
+            print(f"Search timeout ({name}): {query}")
+            return None
+        except asyncio.CancelledError:
+            # Проиграл гонку — это не ошибка провайдера
+            stats.cancelled += 1
+            raise
+        except Exception as e:
+            stats.record(None, ok=False)
+            print(f"Search error ({name}): {e}")
+            return None
+        
+        stats.record(time.monotonic() - started, ok=True)
+        return results
     
     async def verify_fact(self, claim, context="programming"):
         query = f"fact check: {claim}"
-        results = await self.search(query, max_results=3, context=context)
-        return {"found": len(results) > 0, "results": results, "query_used": query}
+        if not self.available:
+            return {"found": False, "results": [], "query_used": query, "error": "circuit_open"}
+        results, error = await self._lookup(query, max_results=3, context=context)
+        found = {"found": len(results) > 0, "results": results, "query_used": query}
+        return {**found, "error": error} if error else found
+    
+    def stats(self):
+        return {
+            "cache": self.cache.stats(),
+            "timeouts": self.timeouts,
+            "breaker": self.breaker.stats(),
+            "providers": {name: st.as_dict() for name, st in self.provider_stats.items()},
+            "executor": get_search_executor().stats(),
+        }
 
 
 def create_web_search_tool():
@@ -1,5 +1,6 @@
 """Utility functions for the Interview Coach system."""
 
 from .logger import InterviewLogger
+from .llm_pool import LLMClientRegistry, llm_registry, get_llm, get_structured_llm
 
-__all__ = ["InterviewLogger"]
+__all__ = ["InterviewLogger", "LLMClientRegistry", "llm_registry", "get_llm", "get_structured_llm"]
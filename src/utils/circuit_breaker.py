@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Circuit breaker для внешних зависимостей (веб-поиск)"""
+
+import time
+
+
+class CircuitBreaker:
+    """closed -> open после failure_threshold отказов подряд;
+    open -> half_open через reset_timeout секунд;
+    half_open пропускает half_open_max_calls пробных вызовов: успех закрывает, отказ снова открывает.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0, half_open_max_calls=1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = self.CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.probes = 0
+
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self.probes = 0
+        return self._state
+
+    @property
+    def is_open(self):
+        """True, если вызов сейчас точно не пройдёт (open или пробы half_open исчерпаны)"""
+        state = self.state
+        return state == self.OPEN or (state == self.HALF_OPEN and self.probes >= self.half_open_max_calls)
+
+    def allow(self):
+        """Можно ли выполнить вызов. В half_open занимает слот пробного вызова"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and self.probes < self.half_open_max_calls:
+            self.probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._state = self.CLOSED
+        self.probes = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        if self._state != self.OPEN:
+            self.times_opened += 1
+        self._state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.probes = 0
+
+    def stats(self):
+        state = self.state
+        retry_in = self.reset_timeout - (time.monotonic() - self.opened_at) if state == self.OPEN else 0.0
+        return {
+            "state": state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_in_s": round(max(0.0, retry_in), 1),
+        }
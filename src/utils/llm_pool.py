@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Общий пул LLM-клиентов для всех агентов"""
+
+import asyncio
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from src.config import settings
+
+
+class LLMClientRegistry:
+    """Выдаёт ChatOpenAI поверх одного keep-alive пула соединений.
+
+    httpx.AsyncClient привязан к event loop, поэтому при смене цикла
+    (например, CLI-скрипты с несколькими asyncio.run) пул пересоздаётся.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._http_client = None
+        self._models = {}  # (model, temperature) -> ChatOpenAI
+        self._structured = {}  # (model, temperature, schema) -> Runnable
+        self._warmed = False
+
+    def _check_loop(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not self._loop:
+            self._release(self._http_client, self._loop, loop)
+            self._loop = loop
+            self._http_client = None
+            self._models = {}
+            self._structured = {}
+            self._warmed = False
+
+    def _release(self, client, old_loop, loop):
+        """Закрывает пул прежнего цикла, чтобы не оставлять открытые соединения"""
+        if client is None:
+            return
+        if old_loop is not None and old_loop.is_running() and old_loop is not loop:
+            # Прежний цикл жив (другой поток) — закрываем пул там, где он создан
+            asyncio.run_coroutine_threadsafe(_close_quietly(client), old_loop)
+        elif loop is not None:
+            loop.create_task(_close_quietly(client))
+        else:
+            asyncio.run(_close_quietly(client))
+
+    @property
+    def http_client(self):
+        self._check_loop()
+        if self._http_client is None:
+            limits = httpx.Limits(
+                max_connections=settings.llm_pool_size,
+                max_keepalive_connections=settings.llm_pool_size,
+                keepalive_expiry=settings.llm_keepalive_expiry,
+            )
+            self._http_client = httpx.AsyncClient(
+                limits=limits, timeout=settings.llm_request_timeout
+            )
+        return self._http_client
+
+    def get_llm(self, model=None, temperature=None):
+        model = model or settings.openai_model
+        temperature = settings.temperature if temperature is None else temperature
+
+        self._check_loop()
+        key = (model, temperature)
+        if key not in self._models:
+            llm_kwargs = {
+                "model": model,
+                "temperature": temperature,
+                "api_key": settings.openai_api_key,
+                "max_tokens": settings.max_tokens,
+                # Повторы при 429 делает общий лимитер, иначе он не видит перегрузку
+                "max_retries": 0,
+                "http_async_client": self.http_client,
+            }
+
+            # Прокси если настроен
+            if settings.openai_base_url:
+                llm_kwargs["base_url"] = settings.openai_base_url
+
+            self._models[key] = ChatOpenAI(**llm_kwargs)
+        return self._models[key]
+
+    def get_structured(self, schema, model=None, temperature=None):
+        """Runnable со structured output, собранный один раз на (model, temperature, schema)"""
+        llm = self.get_llm(model, temperature)
+        key = (llm.model_name, llm.temperature, schema)
+        runnable = self._structured.get(key)
+        if runnable is None:
+            runnable = llm.with_structured_output(schema)
+            self._structured[key] = runnable
+        return runnable
+
+    async def warmup(self):
+        """Открывает соединения заранее, чтобы первый ход не платил за TLS"""
+        self._check_loop()
+        if self._warmed:
+            return 0
+        self._warmed = True
+
+        base_url = (settings.openai_base_url or "https://api.openai.com/v1").rstrip("/")
+        headers = {"Authorization": f"Bearer {settings.openai_api_key}"}
+        client = self.http_client
+
+        n = max(1, min(settings.llm_warmup_connections, settings.llm_pool_size))
+        results = await asyncio.gather(
+            *[client.get(f"{base_url}/models", headers=headers) for _ in range(n)],
+            return_exceptions=True
+        )
+        ok = sum(1 for r in results if not isinstance(r, Exception))
+        print(f"LLM pool warmup: {ok}/{n} connections")
+        return ok
+
+    async def aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._models = {}
+        self._structured = {}
+        self._warmed = False
+
+
+async def _close_quietly(client):
+    try:
+        await client.aclose()
+    except Exception:
+        # Цикл, к которому были привязаны сокеты, уже закрыт — их соберёт GC
+        pass
+
+
+llm_registry = LLMClientRegistry()
+
+
+def get_llm(model=None, temperature=None):
+    return llm_registry.get_llm(model, temperature)
+
+
+def get_structured_llm(schema, model=None, temperature=None):
+    return llm_registry.get_structured(schema, model, temperature)
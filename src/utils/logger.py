@@ -68,10 +68,14 @@ class InterviewLogger:
         aa = _get('answer_analyzer')
         if aa:
             lines.append(f"[AnswerAnalyzer] качество: {aa.get('quality')}, off-topic: {aa.get('off_topic')}")
+            fast = aa.get('fast_path')
+            if fast and fast.get('label') != 'answer':
+                lines.append(f"[AnswerAnalyzer] локально: {fast.get('label')} ({fast.get('confidence')})")
         
         fc = _get('fact_checker')
         if fc:
-            lines.append(f"[FactChecker] проверено: {fc.get('claims_checked')}, верно: {fc.get('verified_true_count')}")
+            lines.append(f"[FactChecker] проверено: {fc.get('claims_checked')}, верно: {fc.get('verified_true')}, "
+                         f"неверно: {fc.get('verified_false')}, поиск: {fc.get('search_breaker', 'closed')}")
         
         ev = _get('evaluator')
         if ev:
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Реестр метрик компонентов (кэши, лимитеры и т.д.)"""
+
+_providers = {}  # name -> callable без аргументов, возвращающий dict
+
+
+def register_metrics(name, provider):
+    """Регистрирует источник метрик. Повторная регистрация заменяет старый"""
+    _providers[name] = provider
+
+
+def metrics_snapshot():
+    """Снимок всех метрик — для UI и внешнего сбора"""
+    snapshot = {}
+    for name, provider in list(_providers.items()):
+        try:
+            snapshot[name] = provider()
+        except Exception as e:
+            snapshot[name] = {"error": str(e)}
+    return snapshot
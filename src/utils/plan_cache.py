@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""Кэш планов интервью по нормализованному профилю кандидата
+
+На каждый отпечаток профиля хранится пул из нескольких вариантов плана:
+пока пул не заполнен, план генерируется и добавляется, дальше выдаётся
+случайный вариант. Прогрев для типовых вакансий:
+
+    python -m src.utils.plan_cache warm --position "Backend Developer" --grade Junior \
+        --experience "Python, Django, PostgreSQL"
+    python -m src.utils.plan_cache warm --file openings.json   # [{"position", "grade", "experience"}]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+
+from src.config import settings
+from src.utils.cache import TTLCache, SQLiteCache, TieredCache
+from src.utils.metrics import register_metrics
+
+
+_TOKEN_RE = re.compile(r"[a-zа-я][a-zа-я0-9+#.]*[a-zа-я0-9+#]|[a-zа-я]", re.UNICODE)
+_YEARS_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:\+\s*)?(?:год|года|лет|years?|yrs?)")
+
+# Синонимы в названии позиции
+_POSITION_SYNONYMS = {
+    "разработчик": "developer", "программист": "developer", "dev": "developer", "engineer": "developer",
+    "инженер": "developer", "бэкенд": "backend", "бекенд": "backend", "back-end": "backend",
+    "фронтенд": "frontend", "front-end": "frontend", "питон": "python",
+}
+# Слова опыта, не влияющие на план
+_EXPERIENCE_FILLERS = {
+    "опыт", "опыта", "работы", "работал", "работала", "разработка", "разработки", "коммерческой",
+    "коммерческий", "и", "в", "на", "с", "со", "по", "для", "год", "года", "лет", "years", "year",
+    "experience", "with", "and", "in", "of", "проекты", "проектах", "проект", "немного", "знаю",
+}
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall((text or "").casefold().replace("ё", "е"))
+
+
+def _years_bucket(experience):
+    match = _YEARS_RE.search((experience or "").casefold())
+    if not match:
+        return "unknown"
+    years = float(match.group(1).replace(",", "."))
+    if years < 1:
+        return "<1"
+    if years < 3:
+        return "1-3"
+    if years < 5:
+        return "3-5"
+    return "5+"
+
+
+def profile_fingerprint(profile):
+    """Отпечаток (позиция, грейд, опыт): порядок слов, регистр, синонимы и филлеры не важны"""
+    position = sorted({_POSITION_SYNONYMS.get(t, t) for t in _tokens(profile.position)})
+    stack = sorted({t for t in _tokens(profile.experience) if t not in _EXPERIENCE_FILLERS})
+    payload = {
+        "position": position,
+        "grade": profile.target_grade.casefold(),
+        "stack": stack,
+        "years": _years_bucket(profile.experience),
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+class PlanCache:
+    """Пул вариантов плана (dict InterviewPlan) на отпечаток профиля поверх TieredCache"""
+
+    def __init__(self, cache, variants):
+        self.cache = cache
+        self.variants = variants
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, profile):
+        return f"plan:{profile_fingerprint(profile)}"
+
+    async def pool(self, profile):
+        return await self.cache.aget(self._key(profile)) or []
+
+    async def get(self, profile):
+        """Случайный вариант из заполненного пула или None (нужна генерация)"""
+        pool = await self.pool(profile)
+        if len(pool) < self.variants:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return random.choice(pool)
+
+    async def add(self, profile, plan):
+        pool = await self.pool(profile)
+        if plan in pool:
+            return
+        await self.cache.aset(self._key(profile), (pool + [plan])[-self.variants:])
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "variants_per_profile": self.variants,
+            "storage": self.cache.stats(),
+        }
+
+
+_plan_cache = None
+
+
+def get_plan_cache():
+    global _plan_cache
+    if _plan_cache is None:
+        memory = TTLCache(maxsize=settings.plan_cache_memory_size, ttl=settings.plan_cache_ttl)
+        disk = None
+        if settings.plan_cache_path:
+            disk = SQLiteCache(settings.plan_cache_path, max_entries=settings.plan_cache_disk_max_entries,
+                               ttl=settings.plan_cache_ttl)
+        _plan_cache = PlanCache(TieredCache(memory, disk), variants=settings.plan_cache_variants)
+        register_metrics("plan_cache", _plan_cache.stats)
+    return _plan_cache
+
+
+async def warm(profiles):
+    """Догенерировать пулы вариантов для списка профилей"""
+    from src.agents.topic_planner import TopicPlannerAgent
+
+    planner = TopicPlannerAgent()
+    cache = get_plan_cache()
+
+    async def warm_one(profile):
+        missing = cache.variants - len(await cache.pool(profile))
+        plans = await asyncio.gather(*[planner.generate_plan(profile) for _ in range(max(0, missing))])
+        for plan in plans:
+            if plan is not None:
+                await cache.add(profile, plan.model_dump())
+        print(f"{profile.position} / {profile.target_grade} / {profile.experience}: "
+              f"{len(await cache.pool(profile))}/{cache.variants} вариантов")
+
+    await asyncio.gather(*[warm_one(p) for p in profiles])
+
+
+if __name__ == "__main__":
+    from src.models.schemas import CandidateProfile
+
+    parser = argparse.ArgumentParser(description="Кэш планов интервью")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_warm = sub.add_parser("warm", help="прогреть кэш для типовых вакансий")
+    p_warm.add_argument("--position")
+    p_warm.add_argument("--grade", choices=["Junior", "Middle", "Senior"])
+    p_warm.add_argument("--experience", default="")
+    p_warm.add_argument("--file", help='JSON: [{"position", "grade", "experience"}]')
+
+    sub.add_parser("stats", help="показать статистику")
+
+    args = parser.parse_args()
+    if args.command == "warm":
+        if args.file:
+            with open(args.file, encoding="utf-8") as f:
+                openings = json.load(f)
+        elif args.position and args.grade:
+            openings = [{"position": args.position, "grade": args.grade, "experience": args.experience}]
+        else:
+            parser.error("нужно --file или --position и --grade")
+        asyncio.run(warm([
+            CandidateProfile(name="-", position=o["position"], target_grade=o["grade"],
+                             experience=o.get("experience", ""))
+            for o in openings
+        ]))
+    print(json.dumps(get_plan_cache().stats(), ensure_ascii=False, indent=2))
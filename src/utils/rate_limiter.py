@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""Глобальный лимитер вызовов LLM: RPM/TPM бюджеты и адаптивная конкурентность (AIMD)"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+
+from src.config import settings
+from src.utils.metrics import register_metrics
+
+
+# Приоритеты очереди: ход пользователя обслуживается раньше фоновой работы
+PRIORITY_FOREGROUND = 0
+PRIORITY_BACKGROUND = 1
+
+_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_FOREGROUND)
+
+
+def create_background_task(coro):
+    """create_task для фоновой работы: её вызовы LLM уступают очередь ходу пользователя.
+
+    Задача получает копию контекста с фоновым приоритетом — вызывающий его не меняет.
+    """
+    context = contextvars.copy_context()
+    context.run(_priority.set, PRIORITY_BACKGROUND)
+    return context.run(asyncio.create_task, coro)
+
+
+class TokenBucket:
+    """Ведро токенов с равномерным пополнением (capacity в минуту)"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Сколько ждать, пока в ведре появится amount (0 — можно сразу)"""
+        self._refill()
+        amount = min(amount, self.capacity)  # запрос больше ёмкости не должен висеть вечно
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class AdaptiveRateLimiter:
+    """Общий для всех сессий лимитер перед BaseAgent.
+
+    Конкурентность регулируется по AIMD: +1/limit за каждый успешный вызов,
+    половина при 429. Retry-After ставит все новые вызовы на паузу.
+    Ожидающие стоят в очереди (приоритет, FIFO): бюджеты проверяет только
+    первый, остальные спят на своих future до его ухода.
+    """
+
+    def __init__(self, rpm, tpm, max_concurrency, min_concurrency=1):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.paused_until = 0.0
+        self._queue = []  # heap [priority, seq, tokens, future]
+        self._seq = itertools.count()
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.total_requests = 0
+        self.rate_limited = 0
+        self.total_wait_time = 0.0
+        self.waited_by_priority = {PRIORITY_FOREGROUND: 0.0, PRIORITY_BACKGROUND: 0.0}
+
+    def _delay(self, tokens):
+        """0 — можно идти, None — ждать освобождения слота, иначе секунды до бюджета"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.concurrency_limit):
+            return None
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def _wake(self):
+        # Проверять бюджеты снова должен только первый в очереди
+        if self._queue:
+            future = self._queue[0][3]
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    async def acquire(self, tokens, priority=None):
+        priority = _priority.get() if priority is None else priority
+        started = time.monotonic()
+        entry = [priority, next(self._seq), tokens, None]
+        heapq.heappush(self._queue, entry)
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            while True:
+                delay = None
+                if self._queue[0] is entry:
+                    delay = self._delay(tokens)
+                    if delay is not None and delay <= 0:
+                        break
+                entry[3] = asyncio.get_running_loop().create_future()
+                try:
+                    # Будят release/on_success/уход предыдущего; по бюджету — таймаут
+                    await asyncio.wait_for(entry[3], delay)
+                except asyncio.TimeoutError:
+                    pass
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            self.total_requests += 1
+        finally:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self.waiting -= 1
+            waited = time.monotonic() - started
+            self.total_wait_time += waited
+            self.waited_by_priority[priority] = self.waited_by_priority.get(priority, 0.0) + waited
+            self._wake()
+
+    def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+        self._wake()
+
+    def on_success(self):
+        # Additive increase
+        self.concurrency_limit = min(
+            float(self.max_concurrency), self.concurrency_limit + 1.0 / self.concurrency_limit
+        )
+        self._wake()
+
+    def on_rate_limited(self, retry_after=None):
+        # Multiplicative decrease
+        self.rate_limited += 1
+        self.concurrency_limit = max(float(self.min_concurrency), self.concurrency_limit / 2)
+        pause = retry_after if retry_after is not None else 1.0
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+    @asynccontextmanager
+    async def slot(self, tokens, priority=None):
+        await self.acquire(tokens, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        return {
+            "queue_depth": self.waiting,
+            "background_waiting": sum(1 for e in self._queue if e[0] == PRIORITY_BACKGROUND),
+            "max_queue_depth": self.max_waiting,
+            "in_flight": self.in_flight,
+            "concurrency_limit": round(self.concurrency_limit, 2),
+            "requests_total": self.total_requests,
+            "rate_limited_total": self.rate_limited,
+            "avg_wait_s": round(self.total_wait_time / self.total_requests, 3) if self.total_requests else 0.0,
+            "wait_s_foreground": round(self.waited_by_priority.get(PRIORITY_FOREGROUND, 0.0), 2),
+            "wait_s_background": round(self.waited_by_priority.get(PRIORITY_BACKGROUND, 0.0), 2),
+            "paused_for_s": round(max(0.0, self.paused_until - time.monotonic()), 2),
+            "rpm_available": int(self.requests.tokens),
+            "tpm_available": int(self.tokens.tokens),
+        }
+
+
+def estimate_tokens(messages):
+    """Грубая оценка токенов запроса: промпт (~3 символа на токен для кириллицы) + ожидаемый ответ"""
+    chars = sum(len(m.content) for m in messages if isinstance(m.content, str))
+    return chars // 3 + settings.llm_expected_output_tokens
+
+
+def is_rate_limit_error(error):
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_transient_error(error):
+    status = getattr(error, "status_code", None)
+    if status is not None and status >= 500:
+        return True
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after_seconds(error):
+    """Retry-After из ответа API (секунды или retry-after-ms)"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+_limiter = None
+
+
+def get_rate_limiter():
+    global _limiter
+    if _limiter is None:
+        _limiter = AdaptiveRateLimiter(
+            rpm=settings.llm_rpm_limit,
+            tpm=settings.llm_tpm_limit,
+            max_concurrency=settings.llm_max_concurrency,
+        )
+        register_metrics("llm_rate_limiter", _limiter.stats)
+    return _limiter
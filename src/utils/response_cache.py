@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Кэш ответов LLM для повторяющихся промптов"""
+
+import hashlib
+import json
+from functools import lru_cache
+
+from src.config import settings
+from src.utils.cache import TTLCache, SQLiteCache, TieredCache
+from src.utils.metrics import register_metrics
+
+
+@lru_cache(maxsize=None)
+def _schema_fingerprint(schema):
+    if schema is None:
+        return None
+    dump = json.dumps(schema.model_json_schema(), sort_keys=True, ensure_ascii=False)
+    return f"{schema.__name__}:{hashlib.sha256(dump.encode('utf-8')).hexdigest()[:16]}"
+
+
+def make_cache_key(model, temperature, schema, messages):
+    """Хэш от (model, temperature, schema, messages)"""
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "schema": _schema_fingerprint(schema),
+        "messages": [[m.type, m.content] for m in messages],
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+_cache = None
+
+
+def get_response_cache():
+    """Общий кэш ответов (создаётся при первом обращении)"""
+    global _cache
+    if _cache is None:
+        memory = TTLCache(maxsize=settings.llm_cache_memory_size, ttl=settings.llm_cache_ttl)
+        disk = None
+        if settings.llm_cache_path:
+            disk = SQLiteCache(settings.llm_cache_path,
+                               max_entries=settings.llm_cache_disk_max_entries,
+                               ttl=settings.llm_cache_ttl)
+        _cache = TieredCache(memory, disk)
+        register_metrics("llm_response_cache", _cache.stats)
+    return _cache
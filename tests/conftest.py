@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""Тесты запускаются без сети и без ключа API: python -m pytest -q"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Стоп-команды: обычный ответ со словами "хватит"/"закончить" не завершает интервью"""
+
+import math
+
+import pytest
+
+from src.tools.answer_classifier import AnswerClassifier
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return AnswerClassifier(log_path="")
+
+
+@pytest.mark.parametrize("message", [
+    "Думаю, памяти не хватит",
+    "Хочу закончить мысль",
+    "Давайте закончим",
+    "Сначала закончим с индексами, потом про транзакции",
+    "В GC бывают stop-the-world паузы",
+    "Я не хочу завершать интервью",
+    "Нет, не надо завершить интервью, я продолжу",
+    "Процесс завершится, когда поток закончит работу",
+])
+def test_answer_is_not_stop(classifier, message):
+    assert not classifier.detect_stop(message)
+
+
+@pytest.mark.parametrize("message", [
+    "Стоп",
+    "стоп!",
+    "Хватит",
+    "Пожалуйста, стоп",
+    "Завершить",
+    "Давайте закончим интервью",
+    "Давай завершим интервью, я устал",
+    "Let's end the interview",
+    "stop",
+])
+def test_stop_command(classifier, message):
+    assert classifier.detect_stop(message)
+
+
+def test_confidence_is_raw_score_without_calibration(classifier):
+    decision = classifier.classify("не знаю")
+    assert classifier.calibration == {}
+    assert decision.label == "dont_know"
+    assert decision.confidence == pytest.approx(1 / (1 + math.exp(-decision.scores["dont_know"])), abs=1e-3)
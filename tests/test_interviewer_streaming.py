@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Реплика интервьюера стримится по токенам и при включённой дедупликации вопросов"""
+
+import asyncio
+import itertools
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src.config import settings
+from src.models.schemas import AnswerAnalysis, CandidateProfile
+from src.models.output_schemas import InterviewPlanOutput
+
+GREETING = "Привет! Я Интервью-бот. Расскажи о своём опыте."
+QUESTION = "Хорошо. Расскажи, как работают индексы в PostgreSQL?"
+
+
+@pytest.fixture
+def graph(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    for name, value in {
+        "question_dedup_enabled": True,
+        "question_bank_enabled": False,
+        "plan_cache_enabled": False,
+        "answer_classifier_enabled": False,
+        "speculation_enabled": False,
+        "report_draft_enabled": False,
+        "llm_cache_enabled": False,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    
+    import src.agents.topic_planner as topic_planner
+    import src.agents.answer_analyzer as answer_analyzer
+    import src.agents.evaluator as evaluator
+    
+    async def plan(self, schema, prompt, user_prompt="", cache=None):
+        return InterviewPlanOutput.model_validate({
+            "position": "Backend", "target_grade": "Junior", "total_questions_limit": 8,
+            "topics": [{"name": "Базы данных", "priority": 1, "questions_budget": 3}],
+        })
+    
+    async def analyze(self, state):
+        analysis = AnswerAnalysis(quality="good", confidence_detected=0.7, completeness=0.7, reasoning="")
+        return {"answer_analysis": analysis, "internal_thoughts": {}}
+    
+    async def evaluate(self, state):
+        return {}
+    
+    monkeypatch.setattr(topic_planner.TopicPlannerAgent, "_call_structured", plan)
+    monkeypatch.setattr(answer_analyzer.AnswerAnalyzerAgent, "run", analyze)
+    monkeypatch.setattr(evaluator.EvaluatorAgent, "run", evaluate)
+    
+    from src.graph.interview_graph import InterviewGraph
+    return InterviewGraph()
+
+
+def use_replies(monkeypatch, replies):
+    """Фейковая LLM: каждый вызов отдаёт следующую реплику, стримя её по словам"""
+    import src.utils.llm_pool as llm_pool
+    replies = iter([AIMessage(content=r) for r in replies])
+    monkeypatch.setattr(llm_pool.llm_registry, "get_llm",
+                        lambda *a, **k: GenericFakeChatModel(messages=replies))
+
+
+async def run_turns(graph, session_id, *messages):
+    """События потока последнего хода и итоговое состояние"""
+    profile = CandidateProfile(name="Аня", position="Backend", target_grade="Junior", experience="Django")
+    state = await graph.start_interview(profile, session_id)
+    for message in messages:
+        events = [event async for event in graph.stream_user_message(state, message)]
+        state = events[-1][1]
+    return events, state
+
+
+def test_ask_question_streams_tokens_with_dedup(graph, monkeypatch):
+    reply = "Хорошо. Чем отличаются уровни изоляции транзакций?"
+    use_replies(monkeypatch, [GREETING, reply])
+    
+    events, state = asyncio.run(run_turns(graph, "stream-ok", "Писал на Django"))
+    
+    tokens = [payload for kind, payload in events if kind == "token"]
+    assert state["router_decision"] is None and state["current_agent_message"] == reply
+    assert len(tokens) > 1
+    assert "".join(tokens) == reply
+    assert ("retract", None) not in events
+
+
+def test_duplicate_question_is_retracted_and_regenerated(graph, monkeypatch):
+    duplicate = "Понятно. Расскажи, как работают индексы в PostgreSQL? И ещё одно"
+    retry = "Чем отличаются уровни изоляции транзакций?"
+    use_replies(monkeypatch, [GREETING, QUESTION, duplicate, retry])
+    
+    events, state = asyncio.run(run_turns(graph, "stream-dup", "Писал на Django", "B-tree и hash"))
+    
+    kinds = [kind for kind, _ in events]
+    retract_at = kinds.index("retract")
+    shown = "".join(payload for kind, payload in events[:retract_at] if kind == "token")
+    after = "".join(payload for kind, payload in events[retract_at:] if kind == "token")
+    # Генерация оборвана сразу после повторного вопроса, до "И ещё одно"
+    assert shown.endswith("PostgreSQL?") and "ещё" not in shown
+    assert after == retry
+    assert state["current_agent_message"] == retry
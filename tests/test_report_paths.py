@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Какой путь финального отчёта работает при настройках по умолчанию"""
+
+import asyncio
+
+import pytest
+
+from src.config import Settings, settings
+from src.models.schemas import (
+    CandidateProfile, EvaluationState, KnowledgeGap, ReportDraft, RoadmapItem, SkillGap
+)
+from src.models.output_schemas import (
+    DecisionOutput, ReportDraftOutput, SoftSkillsOutput, TechnicalReviewOutput,
+    RoadmapOutput, TopicFindingsOutput
+)
+
+OUTPUTS = {
+    "TopicFindingsOutput": TopicFindingsOutput(summary="Выжимка темы"),
+    "DecisionOutput": DecisionOutput(grade="Junior", recommendation="Hire", confidence=0.8),
+    "SoftSkillsOutput": SoftSkillsOutput(clarity=0.9, honesty=0.9, engagement=0.9),
+    "TechnicalReviewOutput": TechnicalReviewOutput(),
+    "RoadmapOutput": RoadmapOutput(),
+    "ReportDraftOutput": ReportDraftOutput.model_validate({
+        "knowledge_gaps": [{"topic": "GIL", "correct_answer": "Один поток исполняет байткод"}],
+        "roadmap": [{"gap": "GIL", "topic": "Потоки в CPython", "resources": []}],
+    }),
+}
+
+
+@pytest.fixture
+def calls(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    # Пути отчёта — как в настройках по умолчанию
+    defaults = Settings.model_fields
+    for name in ("report_draft_enabled", "hiring_map_reduce_min_messages", "hiring_report_sections"):
+        monkeypatch.setattr(settings, name, defaults[name].default)
+    
+    from src.agents.hiring_manager import HiringManagerAgent
+    calls = []
+    
+    async def structured(self, schema, system_prompt, user_prompt="", cache=None):
+        calls.append((schema.__name__, system_prompt))
+        return OUTPUTS[schema.__name__]
+    
+    monkeypatch.setattr(HiringManagerAgent, "_call_structured", structured)
+    return calls
+
+
+def interview_state(draft=None):
+    history = []
+    for topic in ("Python", "Базы данных"):
+        for i in range(settings.hiring_map_reduce_min_messages // 2):
+            history.append({"role": "interviewer", "content": f"Вопрос {i} про {topic}?", "topic": topic})
+            history.append({"role": "candidate", "content": f"Ответ {i}", "topic": topic})
+    evaluation = EvaluationState(skills_gaps=[
+        SkillGap(skill="Индексы", severity="medium", failed_at="1"),
+        SkillGap(skill="GIL", severity="high", failed_at="2"),
+    ])
+    return {
+        "candidate_profile": CandidateProfile(name="Аня", position="Backend", target_grade="Junior",
+                                              experience="Django"),
+        "evaluation": evaluation,
+        "conversation_history": history,
+        "current_user_message": "Не знаю",
+        "report_draft": draft,
+    }
+
+
+def run_report(state):
+    from src.agents.hiring_manager import HiringManagerAgent
+    return asyncio.run(HiringManagerAgent().run(state))["final_feedback"]
+
+
+def test_draft_finalization_reuses_map_reduce_and_sections(calls):
+    draft = ReportDraft(knowledge_gaps=[KnowledgeGap(topic="Индексы", correct_answer="B-tree")],
+                        roadmap={"индексы": [RoadmapItem(topic="EXPLAIN")]})
+    feedback = run_report(interview_state(draft))
+    
+    names = [name for name, _ in calls]
+    assert names.count("TopicFindingsOutput") == 2
+    assert sorted(names[2:]) == ["DecisionOutput", "ReportDraftOutput", "SoftSkillsOutput"]
+    decision_prompt = next(prompt for name, prompt in calls if name == "DecisionOutput")
+    assert "Выжимка темы" in decision_prompt and "EXPLAIN" in decision_prompt
+    
+    assert feedback.decision.recommendation == "Hire"
+    assert feedback.soft_skills.clarity == 0.9
+    assert [g.topic for g in feedback.technical_review.knowledge_gaps] == ["Индексы", "GIL"]
+    assert [r.topic for r in feedback.roadmap] == ["EXPLAIN", "Потоки в CPython"]
+
+
+def test_without_draft_full_sectioned_report(calls):
+    run_report(interview_state())
+    
+    names = [name for name, _ in calls]
+    assert names.count("TopicFindingsOutput") == 2
+    assert sorted(names[2:]) == ["DecisionOutput", "RoadmapOutput", "SoftSkillsOutput", "TechnicalReviewOutput"]
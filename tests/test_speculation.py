@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Отброшенная заготовка не трогает счётчики банка вопросов и дедупликации"""
+
+import asyncio
+
+import pytest
+
+from src.config import settings
+from src.models.schemas import CandidateProfile, RouterDecision
+
+BANKED = "Как устроен B-tree индекс в PostgreSQL?"
+
+
+@pytest.fixture
+def agent(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "question_bank_enabled", True)
+    monkeypatch.setattr(settings, "question_dedup_enabled", True)
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    
+    import src.tools.question_bank as question_bank
+    import src.tools.question_index as question_index
+    from src.agents.interviewer import InterviewerAgent
+    
+    bank = question_bank.QuestionBank(tmp_path / "bank.json")
+    bank.add("Backend", "Junior", "Базы данных", "medium", BANKED, vetted=True)
+    monkeypatch.setattr(question_bank, "_bank", bank)
+    monkeypatch.setattr(question_index, "_registry", question_index.QuestionIndexRegistry())
+    
+    async def call_llm(self, prompt, stream=True, cache=False):
+        return "Что такое нормальные формы?"
+    
+    monkeypatch.setattr(InterviewerAgent, "_call_llm", call_llm)
+    return InterviewerAgent()
+
+
+def snapshot(action="ask_question"):
+    profile = CandidateProfile(name="Аня", position="Backend", target_grade="Junior", experience="Django")
+    decision = RouterDecision(next_topic="Базы данных", action=action)
+    return {"session_id": "spec", "candidate_profile": profile, "router_decision": decision,
+            "asked_questions": [], "conversation_history": []}
+
+
+def counters():
+    from src.tools.question_bank import get_question_bank
+    from src.tools.question_index import get_question_indexes
+    bank = get_question_bank().stats()
+    return bank["hits"], bank["misses"], get_question_indexes().stats()["checks"]
+
+
+async def speculate(agent, decision, served_decision):
+    from src.graph.speculation import SpeculativeEngine
+    engine = SpeculativeEngine()
+    state = snapshot(decision.action)
+    engine.spawn("spec", [(decision, lambda: agent.run(state, speculative=True))], 0)
+    await asyncio.sleep(0.05)  # заготовка успевает досчитаться до решения роутера
+    return await engine.take("spec", served_decision, 0)
+
+
+@pytest.mark.parametrize("action", ["ask_question", "ask_followup"])
+def test_discarded_speculation_leaves_counters(agent, action):
+    decision = snapshot(action)["router_decision"]
+    other = RouterDecision(next_topic="Python", action="change_topic")
+    
+    assert asyncio.run(speculate(agent, decision, other)) is None
+    assert counters() == (0, 0, 0)
+
+
+def test_served_speculation_applies_counters(agent):
+    decision = snapshot()["router_decision"]
+    result = asyncio.run(speculate(agent, decision, decision))
+    
+    assert result["current_agent_message"] == BANKED
+    assert "deferred_effects" not in result
+    assert counters() == (1, 0, 0)
+
+
+def test_served_generated_speculation_counts_dedup_check(agent):
+    decision = snapshot("ask_followup")["router_decision"]
+    result = asyncio.run(speculate(agent, decision, decision))
+    
+    assert result["current_agent_message"] == "Что такое нормальные формы?"
+    assert counters() == (0, 0, 1)